@@ -1,6 +1,16 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, g, render_template, request, jsonify
+from canned_responses import canned, lookup_canned
+from circuit_breaker import CircuitBreaker
 from llm_chatbot import LLMHealthChatbot
+from metrics import CONTENT_TYPE, HTTP_LATENCY, HTTP_REQUESTS, IN_FLIGHT, REGISTRY
+from rate_limiter import RateLimitedError
+from tracing import default_tracer
+import json
+import math
 import os
+import re
+import time
+import uuid
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -12,6 +22,10 @@ app = Flask(__name__)
 # Choose your provider: "openai" or "gemini"
 API_PROVIDER = os.getenv("LLM_PROVIDER", "openai")  # Default to OpenAI
 
+# Limits for the /get_responses batch endpoint
+BATCH_MAX_MESSAGES = int(os.getenv("BATCH_MAX_MESSAGES", "100"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+
 try:
     chatbot = LLMHealthChatbot(api_provider=API_PROVIDER, use_fallback=True)
     if chatbot.api_available:
@@ -24,6 +38,95 @@ except Exception as e:
     print("Falling back to basic mode...")
     chatbot = None
 
+EMPTY_MESSAGE = canned('Please enter a message.').text
+UNAVAILABLE_MESSAGE = canned("Chatbot is currently unavailable. Please try again later.").text
+RATE_LIMITED_MESSAGE = "We are receiving a lot of questions right now. Please try again shortly."
+MESSAGE_TYPE_ERROR = "Expected a JSON body like {'message': '...'}."
+
+# Header naming the client for per-client rate limits when behind a proxy (e.g. X-Forwarded-For);
+# without it the peer address is used
+RATE_LIMIT_CLIENT_HEADER = os.getenv("RATE_LIMIT_CLIENT_HEADER")
+# Proxies in front of the app that append to that header; entries left of theirs come from the client
+RATE_LIMIT_TRUSTED_PROXIES = max(1, int(os.getenv("RATE_LIMIT_TRUSTED_PROXIES", "1")))
+
+def client_identity(header_value, remote_addr) -> str:
+    """
+    Rate limit key of a request: the address the outermost trusted proxy saw, else the peer address
+
+    Each proxy appends the address it received the request from, so with N
+    trusted proxies the client is the Nth entry from the right. Entries further
+    left are whatever the client sent and cannot be trusted.
+    """
+    if RATE_LIMIT_CLIENT_HEADER and header_value:
+        addresses = [address.strip() for address in header_value.split(',') if address.strip()]
+        if addresses:
+            return addresses[max(0, len(addresses) - RATE_LIMIT_TRUSTED_PROXIES)]
+    return remote_addr or 'unknown'
+
+def request_client_id() -> str:
+    header_value = request.headers.get(RATE_LIMIT_CLIENT_HEADER) if RATE_LIMIT_CLIENT_HEADER else None
+    return client_identity(header_value, request.remote_addr)
+
+def retry_after_seconds(error: RateLimitedError) -> int:
+    return max(1, math.ceil(error.retry_after))
+
+# Conversation id: the chat_session cookie, or "session_id" in the JSON body for API clients
+SESSION_COOKIE = 'chat_session'
+SESSION_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{8,64}$')
+
+def resolve_session_id(candidate) -> tuple:
+    """(session_id, is_new): the client's id if well-formed, else a fresh one (None if sessions are off)"""
+    if not chatbot or chatbot.session_store is None:
+        return None, False
+    if isinstance(candidate, str) and SESSION_ID_PATTERN.match(candidate):
+        return candidate, False
+    return uuid.uuid4().hex, True
+
+def json_body() -> dict:
+    """The JSON request body if it is an object, else {} (non-object bodies fail validation, not with a 500)"""
+    body = request.get_json(silent=True)
+    return body if isinstance(body, dict) else {}
+
+def request_session_id() -> tuple:
+    body = json_body()
+    return resolve_session_id(body.get('session_id') or request.cookies.get(SESSION_COOKIE))
+
+def with_session_cookie(http_response: Response, session_id, is_new: bool) -> Response:
+    if is_new:
+        http_response.set_cookie(SESSION_COOKIE, session_id, httponly=True, samesite='Lax',
+                                 max_age=int(chatbot.session_store.idle_seconds))
+    return http_response
+
+def answer_response(response: str) -> Response:
+    """JSON answer; canned answers are served from their pre-encoded (and pre-gzipped) bodies"""
+    precomputed = lookup_canned(response)
+    if precomputed is None:
+        return jsonify({'response': response})
+    if request.accept_encodings['gzip']:
+        http_response = Response(precomputed.gzip_body, mimetype='application/json')
+        http_response.headers['Content-Encoding'] = 'gzip'
+    else:
+        http_response = Response(precomputed.body, mimetype='application/json')
+    http_response.headers['Vary'] = 'Accept-Encoding'
+    return http_response
+
+@app.before_request
+def start_request_metrics():
+    g.metrics_started = time.perf_counter()
+    IN_FLIGHT.inc()
+
+@app.after_request
+def record_request_metrics(response: Response) -> Response:
+    # The route pattern, not the raw path, keeps the label set bounded
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    HTTP_REQUESTS.labels(route, request.method, response.status_code).inc()
+    HTTP_LATENCY.labels(route).observe(time.perf_counter() - g.metrics_started)
+    return response
+
+@app.teardown_request
+def finish_request_metrics(error=None):
+    IN_FLIGHT.dec()
+
 @app.route('/')
 def home():
     return render_template('index.html')
@@ -31,28 +134,154 @@ def home():
 @app.route('/get_response', methods=['POST'])
 def get_response():
     try:
-        user_message = request.json.get('message', '')
+        user_message = json_body().get('message', '')
+        if not isinstance(user_message, str):
+            return jsonify({'error': MESSAGE_TYPE_ERROR}), 400
         
         if not user_message.strip():
-            return jsonify({'response': 'Please enter a message.'})
+            return answer_response(EMPTY_MESSAGE)
         
+        session_id, is_new = request_session_id()
         if chatbot:
-            response = chatbot.get_bot_response(user_message)
+            response = chatbot.get_bot_response(user_message, session_id=session_id, client_id=request_client_id())
         else:
-            response = "Chatbot is currently unavailable. Please try again later."
+            response = UNAVAILABLE_MESSAGE
         
-        return jsonify({'response': response})
+        return with_session_cookie(answer_response(response), session_id, is_new)
     
+    except RateLimitedError as e:
+        retry_after = retry_after_seconds(e)
+        return jsonify({'response': RATE_LIMITED_MESSAGE, 'retry_after': retry_after}), 429, {'Retry-After': str(retry_after)}
     except Exception as e:
         return jsonify({
             'response': f"I apologize, but I encountered an error. Please try again. If the issue persists, contact support."
         }), 500
 
+@app.route('/get_responses', methods=['POST'])
+def get_responses():
+    """Answer a list of messages in one request; results keep the input order"""
+    messages = json_body().get('messages')
+    if not isinstance(messages, list):
+        return jsonify({'error': "Expected a JSON body like {'messages': [...]}."}), 400
+    if len(messages) > BATCH_MAX_MESSAGES:
+        return jsonify({'error': f"At most {BATCH_MAX_MESSAGES} messages per request."}), 400
+    
+    started = time.perf_counter()
+    if chatbot:
+        responses = chatbot.get_bot_responses(messages, max_concurrency=BATCH_CONCURRENCY, client_id=request_client_id())
+    else:
+        responses = [{'response': UNAVAILABLE_MESSAGE,
+                      'status': 'unavailable', 'route': 'none', 'latency_ms': 0.0} for _ in messages]
+    return jsonify({'responses': responses, 'latency_ms': round((time.perf_counter() - started) * 1000, 2)})
+
+def _sse_event(data: dict, event: str = None) -> str:
+    """Format one Server-Sent Event"""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+@app.route('/stream_response', methods=['POST'])
+def stream_response():
+    """Stream the answer as Server-Sent Events: chunk events, then a done event with timings"""
+    user_message = json_body().get('message', '')
+    if not isinstance(user_message, str):
+        return jsonify({'error': MESSAGE_TYPE_ERROR}), 400
+    session_id, is_new = request_session_id()
+    client_id = request_client_id()
+    started = time.perf_counter()
+    
+    def generate():
+        first_chunk_at = None
+        try:
+            if not user_message.strip():
+                chunks = iter([EMPTY_MESSAGE])
+            elif chatbot:
+                chunks = chatbot.stream_bot_response(user_message, session_id=session_id, client_id=client_id)
+            else:
+                chunks = iter([UNAVAILABLE_MESSAGE])
+            
+            for chunk in chunks:
+                if first_chunk_at is None:
+                    first_chunk_at = time.perf_counter()
+                yield _sse_event({'chunk': chunk})
+        except RateLimitedError as e:
+            yield _sse_event({'message': RATE_LIMITED_MESSAGE, 'retry_after': retry_after_seconds(e)}, event='error')
+        except Exception as e:
+            yield _sse_event({
+                'message': "I apologize, but I encountered an error. Please try again. If the issue persists, contact support."
+            }, event='error')
+        
+        finished = time.perf_counter()
+        ttfb_ms = round(((first_chunk_at or finished) - started) * 1000, 1)
+        total_ms = round((finished - started) * 1000, 1)
+        app.logger.info(f"stream_response ttfb={ttfb_ms}ms total={total_ms}ms")
+        yield _sse_event({'ttfb_ms': ttfb_ms, 'total_ms': total_ms}, event='done')
+    
+    return with_session_cookie(Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',  # Disable proxy buffering so chunks arrive immediately
+    }), session_id, is_new)
+
+def get_health_status(bot) -> dict:
+    """Service status, provider, router and cache statistics of the chatbot serving requests (None if it failed)"""
+    status = "healthy" if bot else "degraded"
+    health = {'status': status, 'provider': API_PROVIDER}
+    if bot:
+        health['response_cache'] = bot.response_cache.get_stats()
+        health['router'] = bot.router.get_stats()
+        health['tokens'] = bot.token_ledger.get_stats()
+        if bot.session_store is not None:
+            health['sessions'] = bot.session_store.get_stats()
+        if bot.semantic_cache is not None:
+            health['semantic_cache'] = bot.semantic_cache.get_stats()
+        if bot.admission is not None:
+            health['admission'] = bot.admission.get_stats()
+        if bot.single_flight is not None:
+            health['single_flight'] = bot.single_flight.get_stats()
+    health['circuit_breakers'] = CircuitBreaker.snapshot_all()
+    return health
+
 @app.route('/health')
 def health_check():
     """Health check endpoint"""
-    status = "healthy" if chatbot else "degraded"
-    return jsonify({'status': status, 'provider': API_PROVIDER})
+    return jsonify(get_health_status(chatbot))
+
+def component_metrics(bot):
+    """Collector of circuit breaker statistics and the given chatbot's cache and session statistics"""
+    def collect():
+        breakers = CircuitBreaker.snapshot_all()
+        yield ('healthchat_circuit_breaker_open', 'gauge', "1 while a provider's circuit breaker rejects calls",
+               [({'provider': name}, int(state['state'] != 'closed')) for name, state in breakers.items()])
+        yield ('healthchat_circuit_breaker_rejected_total', 'counter', "Calls rejected by an open circuit breaker",
+               [({'provider': name}, state['rejected']) for name, state in breakers.items()])
+        if bot:
+            stats = bot.response_cache.get_stats()
+            yield ('healthchat_response_cache_events_total', 'counter', "Response cache hits, misses and evictions",
+                   [({'event': event}, value) for event, value in stats.items() if event != 'memory_entries'])
+            if bot.session_store is not None:
+                yield ('healthchat_sessions', 'gauge', "Conversations held in memory",
+                       [({}, bot.session_store.get_stats()['sessions'])])
+    return collect
+
+# asgi.py registers its own chatbot under the same name, replacing this one
+REGISTRY.add_collector(component_metrics(chatbot), name='components')
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus metrics"""
+    return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
+
+@app.route('/debug/traces')
+def debug_traces():
+    """Slowest recent traces (?order=recent for the latest; ?limit=N, default 20)"""
+    buffer = default_tracer().buffer
+    if buffer is None:
+        return jsonify({'error': "Tracing is disabled. Set TRACING=memory (or jsonl:<path>, otlp) to record traces."}), 404
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 200)
+    if request.args.get('order') == 'recent':
+        traces = buffer.recent(limit)
+    else:
+        traces = buffer.slowest(limit)
+    return jsonify({'buffered': len(buffer.traces), 'sample_rate': default_tracer().sample_rate, 'traces': traces})
 
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
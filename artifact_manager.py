@@ -0,0 +1,289 @@
+"""
+Hot reload of the intent classifier's artifacts
+
+The classifier reads intents.json, words.pkl, classes.pkl and the model
+(chatbot_model.npz, or chatbot_model.h5 without it) as one immutable
+Artifacts snapshot. An ArtifactManager watches those files from a background
+thread. When they change and then stay unchanged for one poll interval, it
+loads the new version, checks that the pieces fit together, and publishes
+the new snapshot with a single reference swap. Requests hold on to the
+snapshot they started with, so they are never blocked and never see a mix
+of two versions. A version that fails validation is not published and the
+previous one keeps serving.
+"""
+import hashlib
+import io
+import json
+import os
+import pickle
+import threading
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+
+class ArtifactError(Exception):
+    """Raised when artifact files are missing, unreadable or inconsistent with each other"""
+
+
+def response_index(intents: dict) -> Dict[str, List[str]]:
+    """Responses of every intent tag (the first intent with a tag wins, as with a scan of the list)"""
+    index: Dict[str, List[str]] = {}
+    for intent in intents.get('intents', []):
+        index.setdefault(intent['tag'], list(intent.get('responses', [])))
+    return index
+
+
+class Artifacts(NamedTuple):
+    """One consistent version of the classifier's intents, vocabulary, classes and model"""
+    version: str
+    intents: dict
+    words: List[str]
+    classes: List[str]
+    model: Any
+    # Column of each vocabulary word in the bag-of-words vector
+    word_index: Dict[str, int]
+    # Tag -> responses, so replies are a dict lookup rather than a scan of the intents
+    responses: Dict[str, List[str]]
+    loaded_at: float
+
+    @classmethod
+    def build(cls, intents: dict, words: List[str], classes: List[str], model: Any,
+              version: str = 'memory') -> 'Artifacts':
+        """Snapshot with its lookup tables derived from intents and words"""
+        return cls(version, intents, list(words), list(classes), model,
+                   {word: i for i, word in enumerate(words)}, response_index(intents), time.time())
+
+    def with_changes(self, **changes) -> 'Artifacts':
+        """New snapshot with some of intents, words, classes or model replaced"""
+        fields = {'intents': self.intents, 'words': self.words, 'classes': self.classes, 'model': self.model,
+                  'version': self.version}
+        fields.update(changes)
+        return self.build(**fields)
+
+
+def validate(artifacts: Artifacts) -> None:
+    """
+    Check that the artifacts can serve requests together
+
+    Raises:
+        ArtifactError: The vocabulary or classes are malformed, a class has no
+            responses, or the model's input/output sizes do not match them
+    """
+    words, classes = artifacts.words, artifacts.classes
+    if not all(isinstance(word, str) for word in words) or len(set(words)) != len(words):
+        raise ArtifactError("words.pkl must be a list of distinct strings")
+    if not classes or not all(isinstance(tag, str) for tag in classes) or len(set(classes)) != len(classes):
+        raise ArtifactError("classes.pkl must be a non-empty list of distinct strings")
+    without_responses = [tag for tag in classes if not artifacts.responses.get(tag)]
+    if without_responses:
+        raise ArtifactError(f"Classes without responses in intents.json: {', '.join(without_responses)}")
+    try:
+        probabilities = np.asarray(artifacts.model.predict_on_batch(np.zeros((1, len(words)), dtype=np.float32)))
+    except Exception as e:
+        raise ArtifactError(f"Model rejects a {len(words)}-word bag of words: {e}") from e
+    if probabilities.shape != (1, len(classes)):
+        raise ArtifactError(f"Model outputs {probabilities.shape[-1]} classes, classes.pkl has {len(classes)}")
+    if not np.all(np.isfinite(probabilities)):
+        raise ArtifactError("Model outputs non-finite probabilities")
+
+
+class ArtifactManager:
+    """
+    Current artifacts of the classifier, reloaded in the background when the files change
+
+    Read `current` once per request and use that snapshot throughout.
+    """
+
+    def __init__(self, intents_path: str = 'intents.json', words_path: str = 'words.pkl',
+                 classes_path: str = 'classes.pkl', numpy_path: str = 'chatbot_model.npz',
+                 keras_path: str = 'chatbot_model.h5', reload_seconds: float = 5.0,
+                 artifacts: Optional[Artifacts] = None):
+        """
+        Initialize the manager and load the artifacts
+
+        Args:
+            intents_path: Intents with their patterns and responses
+            words_path: Pickled vocabulary
+            classes_path: Pickled class tags, in model output order
+            numpy_path: NumPy weights (preferred)
+            keras_path: Keras model, used when the NumPy weights are missing
+            reload_seconds: Interval between file checks (0 disables watching)
+            artifacts: Initial snapshot instead of loading the files
+
+        Raises:
+            ArtifactError: The files cannot be loaded at startup
+        """
+        self.intents_path = intents_path
+        self.words_path = words_path
+        self.classes_path = classes_path
+        self.numpy_path = numpy_path
+        self.keras_path = keras_path
+        self.reload_seconds = reload_seconds
+        self.stats = {'checks': 0, 'reloads': 0, 'failures': 0}
+        self.last_error: Optional[str] = None
+        self._load_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._watcher = None
+        self._watcher_pid = None
+        # Fingerprint of the files behind the current snapshot, and of the last check while they settle
+        self._loaded_fingerprint = self.fingerprint() if artifacts is None else None
+        self._pending_fingerprint = None
+        self._current = artifacts if artifacts is not None else self.load()
+
+    @classmethod
+    def from_env(cls) -> 'ArtifactManager':
+        """Manager for the default files, checking them every ARTIFACT_RELOAD_SECONDS (default 5, 0 = never)"""
+        return cls(reload_seconds=float(os.getenv("ARTIFACT_RELOAD_SECONDS", "5")))
+
+    @property
+    def current(self) -> Artifacts:
+        """The latest valid snapshot"""
+        # Threads do not survive fork, so pre-forking servers get a watcher per process
+        if self._watcher_pid != os.getpid() and self.reload_seconds > 0:
+            self._ensure_watcher()
+        return self._current
+
+    def swap(self, artifacts: Artifacts) -> None:
+        """Publish a snapshot (requests already holding the previous one finish with it)"""
+        self._current = artifacts
+
+    def _watched_paths(self) -> Tuple[str, ...]:
+        return self.intents_path, self.words_path, self.classes_path, self.numpy_path, self.keras_path
+
+    def fingerprint(self) -> tuple:
+        """Modification time and size of every watched file (None for missing files)"""
+        result = []
+        for path in self._watched_paths():
+            try:
+                stat = os.stat(path)
+                result.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                result.append(None)
+        return tuple(result)
+
+    def load(self) -> Artifacts:
+        """
+        Read and validate the artifact files (does not publish them)
+
+        Raises:
+            ArtifactError: A file is missing or unreadable, or the files are inconsistent
+        """
+        digest = hashlib.sha256()
+        try:
+            contents = {}
+            for path in (self.intents_path, self.words_path, self.classes_path):
+                with open(path, 'rb') as f:
+                    contents[path] = f.read()
+                digest.update(contents[path])
+            intents = json.loads(contents[self.intents_path])
+            words = pickle.loads(contents[self.words_path])
+            classes = pickle.loads(contents[self.classes_path])
+            model = self._load_model(digest)
+        except ArtifactError:
+            raise
+        except Exception as e:
+            raise ArtifactError(f"Cannot load artifacts: {e}") from e
+        artifacts = Artifacts.build(intents, words, classes, model, digest.hexdigest()[:12])
+        validate(artifacts)
+        return artifacts
+
+    def _load_model(self, digest) -> Any:
+        """Load the NumPy weights if present; only fall back to TensorFlow otherwise"""
+        if os.path.exists(self.numpy_path):
+            from numpy_model import NumpyMLP
+            with open(self.numpy_path, 'rb') as f:
+                data = f.read()
+            digest.update(data)
+            return NumpyMLP.load(io.BytesIO(data))
+        with open(self.keras_path, 'rb') as f:
+            digest.update(f.read())
+        from tensorflow.keras.models import load_model
+        return load_model(self.keras_path)
+
+    def reload(self) -> bool:
+        """
+        Load the files now and publish them if they are a new, valid version
+
+        Returns:
+            True if a new version was published
+
+        Raises:
+            ArtifactError: The files are invalid (the current snapshot is kept)
+        """
+        with self._load_lock:
+            fingerprint = self.fingerprint()
+            try:
+                artifacts = self.load()
+                if self.fingerprint() != fingerprint:
+                    raise ArtifactError("Artifact files changed while loading")
+            except ArtifactError as e:
+                self.stats['failures'] += 1
+                self.last_error = str(e)
+                raise
+            self._loaded_fingerprint = fingerprint
+            self.last_error = None
+            if artifacts.version == self._current.version:
+                return False
+            self.swap(artifacts)
+            self.stats['reloads'] += 1
+            return True
+
+    def check(self) -> bool:
+        """
+        Reload if the files changed and have not changed since the previous check
+
+        Waiting for the files to settle avoids loading a half-written set from a
+        training run that is still exporting.
+
+        Returns:
+            True if a new version was published
+        """
+        self.stats['checks'] += 1
+        fingerprint = self.fingerprint()
+        if fingerprint == self._loaded_fingerprint:
+            self._pending_fingerprint = None
+            return False
+        if fingerprint != self._pending_fingerprint:
+            self._pending_fingerprint = fingerprint
+            return False
+        try:
+            reloaded = self.reload()
+        except ArtifactError as e:
+            # Do not retry the same broken files on every check
+            self._loaded_fingerprint = fingerprint
+            print(f"⚠️  Keeping artifacts {self._current.version}: {e}")
+            return False
+        if reloaded:
+            print(f"🔄 Loaded artifacts {self._current.version} "
+                  f"({len(self._current.words)} words, {len(self._current.classes)} classes)")
+        return reloaded
+
+    def _ensure_watcher(self) -> None:
+        with self._start_lock:
+            if self._watcher is None or self._watcher_pid != os.getpid():
+                self._watcher = threading.Thread(target=self._watch, name='artifact-watcher', daemon=True)
+                self._watcher_pid = os.getpid()
+                self._watcher.start()
+
+    def _watch(self) -> None:
+        while True:
+            time.sleep(self.reload_seconds)
+            try:
+                self.check()
+            except Exception as e:
+                print(f"⚠️  Artifact check failed: {e}")
+
+    def get_stats(self) -> dict:
+        """Current version, reload counters and the last validation error"""
+        artifacts = self._current
+        return {
+            'version': artifacts.version,
+            'loaded_at': artifacts.loaded_at,
+            'words': len(artifacts.words),
+            'classes': len(artifacts.classes),
+            'reload_seconds': self.reload_seconds,
+            'last_error': self.last_error,
+            **self.stats,
+        }
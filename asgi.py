@@ -0,0 +1,298 @@
+"""
+ASGI entry point
+
+The chat endpoints are served natively by AsyncLLMHealthChatbot, so one process
+can keep hundreds of provider calls in flight. Every other route falls through
+to the Flask app in app.py.
+
+Run with:
+    uvicorn asgi:application --workers 2
+    gunicorn asgi:application -k uvicorn.workers.UvicornWorker
+"""
+import json
+import os
+import time
+import uuid
+from http.cookies import SimpleCookie
+
+from asgiref.wsgi import WsgiToAsgi
+from werkzeug.http import parse_accept_header
+
+from app import (API_PROVIDER, BATCH_CONCURRENCY, BATCH_MAX_MESSAGES, EMPTY_MESSAGE, MESSAGE_TYPE_ERROR,
+                 RATE_LIMIT_CLIENT_HEADER, RATE_LIMITED_MESSAGE, SESSION_COOKIE, SESSION_ID_PATTERN, UNAVAILABLE_MESSAGE,
+                 app as flask_app, client_identity, component_metrics, get_health_status, retry_after_seconds)
+from canned_responses import lookup_canned
+from async_llm_chatbot import AsyncLLMHealthChatbot
+from hedged_chatbot import HedgedLLMHealthChatbot
+from metrics import HTTP_LATENCY, HTTP_REQUESTS, IN_FLIGHT, REGISTRY
+from rate_limiter import RateLimitedError
+
+# Setting LLM_HEDGE_PROVIDER races a second provider against slow primary calls
+HEDGING_ENABLED = bool(os.getenv("LLM_HEDGE_PROVIDER"))
+
+try:
+    if HEDGING_ENABLED:
+        async_chatbot = HedgedLLMHealthChatbot.from_env(api_provider=API_PROVIDER, use_fallback=True)
+    else:
+        async_chatbot = AsyncLLMHealthChatbot(api_provider=API_PROVIDER, use_fallback=True)
+except Exception as e:
+    print(f"❌ Error initializing async chatbot: {e}")
+    async_chatbot = None
+
+# /metrics (served by Flask) reports the chatbot that handles the chat routes here
+REGISTRY.add_collector(component_metrics(async_chatbot), name='components')
+
+flask_asgi = WsgiToAsgi(flask_app)
+
+ERROR_MESSAGE = "I apologize, but I encountered an error. Please try again. If the issue persists, contact support."
+
+
+async def read_json(receive) -> dict:
+    """Read and decode the JSON request body ({} if it is not a JSON object)"""
+    body = b''
+    more_body = True
+    while more_body:
+        message = await receive()
+        body += message.get('body', b'')
+        more_body = message.get('more_body', False)
+    try:
+        data = json.loads(body or b'{}')
+    except ValueError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+async def send_json(send, data: dict, status: int = 200, extra_headers=()) -> None:
+    payload = json.dumps(data).encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(payload)).encode()),
+                    *extra_headers],
+    })
+    await send({'type': 'http.response.body', 'body': payload})
+
+
+def request_session(scope, body: dict) -> tuple:
+    """
+    Conversation id for a request
+
+    Returns:
+        (session_id, extra_headers): the client's id from the JSON body or the
+        chat_session cookie, else a new id with a Set-Cookie header for it
+        (None and no headers if sessions are off)
+    """
+    if not async_chatbot or async_chatbot.session_store is None:
+        return None, ()
+    candidate = body.get('session_id')
+    if not candidate:
+        for name, value in scope.get('headers', []):
+            if name == b'cookie':
+                morsel = SimpleCookie(value.decode('latin-1')).get(SESSION_COOKIE)
+                candidate = morsel.value if morsel else None
+    if isinstance(candidate, str) and SESSION_ID_PATTERN.match(candidate):
+        return candidate, ()
+    session_id = uuid.uuid4().hex
+    max_age = int(async_chatbot.session_store.idle_seconds)
+    cookie = f"{SESSION_COOKIE}={session_id}; Max-Age={max_age}; Path=/; HttpOnly; SameSite=Lax"
+    return session_id, ((b'set-cookie', cookie.encode('latin-1')),)
+
+
+def request_client_id(scope) -> str:
+    """Rate limit key of a request (see app.client_identity)"""
+    header_value = None
+    if RATE_LIMIT_CLIENT_HEADER:
+        wanted = RATE_LIMIT_CLIENT_HEADER.lower().encode('latin-1')
+        # Repeated headers form one list, in order
+        values = [value.decode('latin-1') for name, value in scope.get('headers', []) if name == wanted]
+        header_value = ', '.join(values) or None
+    client = scope.get('client')
+    return client_identity(header_value, client[0] if client else None)
+
+
+def accepts_gzip(scope) -> bool:
+    """True if Accept-Encoding allows gzip (q=0 refuses it; parsed as Flask does for the WSGI routes)"""
+    values = [value.decode('latin-1') for name, value in scope.get('headers', []) if name == b'accept-encoding']
+    return bool(values) and parse_accept_header(', '.join(values))['gzip'] > 0
+
+
+async def send_answer(scope, send, response: str, extra_headers=()) -> None:
+    """Send {"response": ...}; canned answers go out as their pre-encoded (and pre-gzipped) bodies"""
+    precomputed = lookup_canned(response)
+    if precomputed is None:
+        return await send_json(send, {'response': response}, extra_headers=extra_headers)
+
+    headers = [(b'content-type', b'application/json'), (b'vary', b'Accept-Encoding'), *extra_headers]
+    if accepts_gzip(scope):
+        body = precomputed.gzip_body
+        headers.append((b'content-encoding', b'gzip'))
+    else:
+        body = precomputed.body
+    headers.append((b'content-length', str(len(body)).encode()))
+    await send({'type': 'http.response.start', 'status': 200, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def sse_event(data: dict, event: str = None) -> bytes:
+    """Format one Server-Sent Event"""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n".encode('utf-8')
+
+
+async def get_response(scope, receive, send) -> None:
+    """Async equivalent of POST /get_response"""
+    body = await read_json(receive)
+    user_message = body.get('message', '')
+    if not isinstance(user_message, str):
+        return await send_json(send, {'error': MESSAGE_TYPE_ERROR}, status=400)
+
+    if not user_message.strip():
+        return await send_answer(scope, send, EMPTY_MESSAGE)
+
+    session_id, session_headers = request_session(scope, body)
+    try:
+        if async_chatbot:
+            response = await async_chatbot.get_bot_response(user_message, session_id=session_id,
+                                                             client_id=request_client_id(scope))
+        else:
+            response = UNAVAILABLE_MESSAGE
+        await send_answer(scope, send, response, session_headers)
+    except RateLimitedError as e:
+        retry_after = retry_after_seconds(e)
+        await send_json(send, {'response': RATE_LIMITED_MESSAGE, 'retry_after': retry_after}, status=429,
+                        extra_headers=((b'retry-after', str(retry_after).encode()),))
+    except Exception:
+        flask_app.logger.exception("get_response failed")
+        await send_json(send, {'response': ERROR_MESSAGE}, status=500)
+
+
+async def get_responses(scope, receive, send) -> None:
+    """Async equivalent of POST /get_responses"""
+    messages = (await read_json(receive)).get('messages')
+    if not isinstance(messages, list):
+        return await send_json(send, {'error': "Expected a JSON body like {'messages': [...]}."}, status=400)
+    if len(messages) > BATCH_MAX_MESSAGES:
+        return await send_json(send, {'error': f"At most {BATCH_MAX_MESSAGES} messages per request."}, status=400)
+
+    started = time.perf_counter()
+    if async_chatbot:
+        responses = await async_chatbot.get_bot_responses(messages, max_concurrency=BATCH_CONCURRENCY,
+                                                          client_id=request_client_id(scope))
+    else:
+        responses = [{'response': UNAVAILABLE_MESSAGE, 'status': 'unavailable', 'route': 'none', 'latency_ms': 0.0}
+                     for _ in messages]
+    await send_json(send, {'responses': responses, 'latency_ms': round((time.perf_counter() - started) * 1000, 2)})
+
+
+async def message_chunks(user_message: str, session_id: str = None, client_id: str = None):
+    """Chunks of the answer to stream for a message"""
+    if not user_message.strip():
+        yield EMPTY_MESSAGE
+    elif async_chatbot:
+        async for chunk in async_chatbot.stream_bot_response(user_message, session_id=session_id, client_id=client_id):
+            yield chunk
+    else:
+        yield UNAVAILABLE_MESSAGE
+
+
+async def stream_response(scope, receive, send) -> None:
+    """Async equivalent of POST /stream_response"""
+    body = await read_json(receive)
+    user_message = body.get('message', '')
+    if not isinstance(user_message, str):
+        return await send_json(send, {'error': MESSAGE_TYPE_ERROR}, status=400)
+    session_id, session_headers = request_session(scope, body)
+    started = time.perf_counter()
+    first_chunk_at = None
+
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [
+            (b'content-type', b'text/event-stream'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+            *session_headers,
+        ],
+    })
+
+    try:
+        async for chunk in message_chunks(user_message, session_id, request_client_id(scope)):
+            if first_chunk_at is None:
+                first_chunk_at = time.perf_counter()
+            await send({'type': 'http.response.body', 'body': sse_event({'chunk': chunk}), 'more_body': True})
+    except RateLimitedError as e:
+        event = sse_event({'message': RATE_LIMITED_MESSAGE, 'retry_after': retry_after_seconds(e)}, 'error')
+        await send({'type': 'http.response.body', 'body': event, 'more_body': True})
+    except Exception:
+        flask_app.logger.exception("stream_response failed")
+        await send({'type': 'http.response.body', 'body': sse_event({'message': ERROR_MESSAGE}, 'error'), 'more_body': True})
+
+    finished = time.perf_counter()
+    timings = {
+        'ttfb_ms': round(((first_chunk_at or finished) - started) * 1000, 1),
+        'total_ms': round((finished - started) * 1000, 1),
+    }
+    await send({'type': 'http.response.body', 'body': sse_event(timings, 'done')})
+
+
+async def health(scope, receive, send) -> None:
+    """GET /health for the async chatbot (the Flask app's chatbot serves no chat traffic here)"""
+    status = get_health_status(async_chatbot)
+    if HEDGING_ENABLED and async_chatbot:
+        status['hedging'] = async_chatbot.get_hedge_stats()
+    await send_json(send, status)
+
+
+async def lifespan(scope, receive, send) -> None:
+    """Close pooled provider connections on shutdown"""
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            if async_chatbot:
+                await async_chatbot.aclose()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+ROUTES = {
+    ('POST', '/get_response'): get_response,
+    ('POST', '/stream_response'): stream_response,
+    ('POST', '/get_responses'): get_responses,
+    ('GET', '/health'): health,
+}
+
+
+async def application(scope, receive, send):
+    """ASGI application: native async chat routes, Flask for everything else"""
+    if scope['type'] == 'lifespan':
+        return await lifespan(scope, receive, send)
+
+    handler = ROUTES.get((scope.get('method'), scope.get('path')))
+    if handler is None:
+        # Flask records its own request metrics
+        return await flask_asgi(scope, receive, send)
+    return await instrumented(handler, scope, receive, send)
+
+
+async def instrumented(handler, scope, receive, send) -> None:
+    """Run a native route, recording the same request metrics as the Flask routes"""
+    route, method = scope['path'], scope['method']
+    started = time.perf_counter()
+    status = 500
+
+    async def send_and_observe(message):
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+            HTTP_LATENCY.labels(route).observe(time.perf_counter() - started)
+        await send(message)
+
+    IN_FLIGHT.inc()
+    try:
+        await handler(scope, receive, send_and_observe)
+    finally:
+        IN_FLIGHT.dec()
+        HTTP_REQUESTS.labels(route, method, status).inc()
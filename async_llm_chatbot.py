@@ -0,0 +1,359 @@
+import asyncio
+import time
+from typing import AsyncIterator, Awaitable, List, Optional, Sequence, Tuple, Union
+
+from circuit_breaker import CircuitOpenError
+from llm_chatbot import LLMHealthChatbot
+from rate_limiter import Admission, RateLimitedError, SQLiteBucketStore
+from session_store import Turn
+from token_accounting import gemini_usage, openai_usage
+
+
+class AsyncLLMHealthChatbot(LLMHealthChatbot):
+    """
+    Non-blocking variant of LLMHealthChatbot for ASGI servers
+
+    Provider calls are awaited on shared async clients (one connection pool per
+    instance). The keyword, BMI, hospital and fallback handlers are plain CPU
+    work and still run inline.
+    """
+
+    def _initialize_client(self):
+        """Initialize the async API client; every request shares its connection pool"""
+        if self.api_provider == "openai":
+            import openai
+            self.client = openai.AsyncOpenAI(**self._openai_client_options())
+        elif self.api_provider == "gemini":
+            import google.generativeai as genai
+            self._configure_gemini(genai)
+            # The SDK's async transport keeps one shared gRPC channel per process
+            self.client = self._build_gemini_model(genai)
+
+    async def aclose(self) -> None:
+        """Release pooled connections"""
+        if self._client is not None and self.api_provider == "openai":
+            await self._client.close()
+
+    async def get_bot_response(self, user_input: str, session_id: Optional[str] = None,
+                               client_id: Optional[str] = None) -> str:
+        """
+        Main method to get chatbot response with safety checks
+
+        Args:
+            user_input: The user's message
+            session_id: Conversation id; earlier turns are remembered and sent to the LLM
+            client_id: Caller identity (e.g. IP address) for per-client rate limits
+
+        Returns:
+            Appropriate bot response
+        """
+        with self.tracer.span('get_bot_response', provider=self.api_provider) as span:
+            decision, local_response = self._route_locally(user_input, session_id)
+            if local_response:
+                span.set('route', decision.route)
+                self._remember(session_id, user_input, local_response, decision)
+                return local_response
+
+            span.set('route', 'llm')
+            history = self._session_history(user_input, session_id)
+            response = await self.get_llm_response(user_input, history, client_id)
+            self._remember(session_id, user_input, response)
+            return response
+
+    async def stream_bot_response(self, user_input: str, session_id: Optional[str] = None,
+                                  client_id: Optional[str] = None) -> AsyncIterator[str]:
+        """Async streaming variant of get_bot_response"""
+        with self.tracer.span('stream_bot_response', provider=self.api_provider) as span:
+            decision, local_response = self._route_locally(user_input, session_id)
+            if local_response:
+                span.set('route', decision.route)
+                self._remember(session_id, user_input, local_response, decision)
+                yield local_response
+                return
+
+            span.set('route', 'llm')
+            chunks = []
+            history = self._session_history(user_input, session_id)
+            async for chunk in self.stream_llm_response(user_input, history, client_id):
+                chunks.append(chunk)
+                yield chunk
+            self._remember(session_id, user_input, ''.join(chunks))
+
+    async def get_bot_responses(self, messages: List[str], max_concurrency: int = 8,
+                                client_id: Optional[str] = None) -> List[dict]:
+        """
+        Answer a batch of messages (see LLMHealthChatbot.get_bot_responses)
+
+        Args:
+            messages: The user's messages
+            max_concurrency: Maximum provider calls in flight
+            client_id: Caller identity for per-client rate limits
+
+        Returns:
+            One dict per message, in input order, with response, status, route and latency_ms
+        """
+        with self.tracer.span('get_bot_responses', provider=self.api_provider, messages=len(messages)) as span:
+            results, pending = self._answer_batch_locally(messages)
+            span.set('llm_calls', len(pending))
+            semaphore = asyncio.Semaphore(max_concurrency)
+
+            async def answer(indexes: List[int]) -> None:
+                async with semaphore:
+                    started = time.perf_counter()
+                    try:
+                        response, reason = await self._get_provider_answer(messages[indexes[0]], client_id=client_id)
+                        item = self._llm_batch_item(response, reason, time.perf_counter() - started)
+                    except RateLimitedError:
+                        item = self._batch_item(None, 'llm', 0.0, status='rate_limited')
+                    except Exception:
+                        item = self._batch_item(None, 'llm', time.perf_counter() - started, status='error')
+                for index in indexes:
+                    results[index] = dict(item)
+
+            # gather() wraps each call in a task that copies this context, so their spans join the batch's trace
+            await asyncio.gather(*(answer(indexes) for indexes in pending.values()))
+            return results
+
+    async def get_llm_response(self, user_input: str, history: Sequence[Turn] = (),
+                               client_id: Optional[str] = None) -> str:
+        """
+        Get response from LLM API without blocking the event loop
+
+        Args:
+            user_input: The user's health question
+            history: Earlier turns of the conversation to send along
+            client_id: Caller identity for per-client rate limits
+
+        Returns:
+            AI-generated response
+        """
+        precomputed = self._get_precomputed_response(user_input, history)
+        if precomputed is not None:
+            return precomputed
+
+        return await self._get_provider_response(user_input, history, client_id)
+
+    async def _get_provider_response(self, user_input: str, history: Sequence[Turn] = (),
+                                     client_id: Optional[str] = None, **options) -> str:
+        """Provider answer for one caller, or the local fallback (see LLMHealthChatbot._get_provider_answer)"""
+        return (await self._get_provider_answer(user_input, history, client_id, **options))[0]
+
+    async def _get_provider_answer(self, user_input: str, history: Sequence[Turn] = (),
+                                   client_id: Optional[str] = None, **options) -> Tuple[str, Optional[str]]:
+        """(response, fallback_reason) for one caller, shared with concurrent requests for the same question"""
+        admission = await self._admit_async(user_input, client_id)
+        if admission is not None:
+            if not admission.allowed:
+                return self._rate_limited_response(user_input, admission), 'rate_limited'
+            if admission.wait:
+                # Queued for a token: only this request waits, the event loop keeps serving
+                await asyncio.sleep(admission.wait)
+        try:
+            return await self._coalesced_provider_call(user_input, history, **options), None
+        except Exception as e:
+            reason = self._fallback_reason(e)
+            return self._get_fallback_response(user_input, reason), reason
+
+    async def _admit_async(self, user_input: str, client_id: Optional[str]) -> Optional[Admission]:
+        """_admit without blocking the event loop: the shared SQLite bucket store is queried on a thread"""
+        if self.admission is not None and isinstance(self.admission.store, SQLiteBucketStore):
+            return await asyncio.to_thread(self._admit, user_input, client_id)
+        return self._admit(user_input, client_id)
+
+    async def _coalesced_provider_call(self, user_input: str, history: Sequence[Turn] = (), **options) -> str:
+        """Provider answer, joining an identical call in flight (within one LLM_TIMEOUT budget)"""
+        if history or self.single_flight is None:
+            deadline = time.monotonic() + self.request_timeout
+            return await self._fetch_provider_response(user_input, history, deadline, **options)
+        response, shared = await self.single_flight.do_async(
+            self._cache_key(user_input),
+            lambda deadline: self._fetch_provider_response(user_input, history, deadline, **options),
+            timeout=self.request_timeout)
+        if shared:
+            self.tracer.annotate(coalesced=True)
+        return response
+
+    async def _fetch_provider_response(self, user_input: str, history: Sequence[Turn], deadline: float) -> str:
+        """Await the provider and cache the answer (failures propagate to every coalesced caller)"""
+        response = await self._call_provider(user_input, deadline=deadline, history=history)
+        self._store_response(user_input, response, history)
+        return response
+
+    async def _call_provider(self, user_input: str, deadline: float, history: Sequence[Turn] = ()) -> str:
+        """Await the provider within the remaining budget, guarded by the circuit breaker"""
+        timeout = self._remaining_budget(deadline)
+        if not self.circuit_breaker.allow_request():
+            raise CircuitOpenError(f"{self.api_provider} circuit breaker is open")
+
+        with self._llm_span() as span:
+            started = time.perf_counter()
+            try:
+                if self.api_provider == "openai":
+                    call = self._get_openai_response(user_input, timeout=timeout, history=history)
+                elif self.api_provider == "gemini":
+                    call = self._get_gemini_response(user_input, timeout=timeout, history=history)
+                response = await self._run_until_deadline(call, deadline)
+            except asyncio.CancelledError:
+                # Lost a hedge race: not the provider's fault
+                self.circuit_breaker.record_cancelled()
+                span.set('outcome', 'cancelled')
+                raise
+            except Exception:
+                self.circuit_breaker.record_failure()
+                self._llm_latency['error'].observe(time.perf_counter() - started)
+                span.set('outcome', 'error')
+                raise
+            elapsed = time.perf_counter() - started
+            self.circuit_breaker.record_success(elapsed)
+            self._llm_latency['success'].observe(elapsed)
+            span.set('outcome', 'success')
+            return response
+
+    async def _run_until_deadline(self, call: Awaitable, deadline: float):
+        """Await a provider call, cancelling it if the deadline passes first (raises TimeoutError)"""
+        try:
+            timeout = self._remaining_budget(deadline)
+        except TimeoutError:
+            call.close()
+            raise
+        try:
+            return await asyncio.wait_for(call, timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError("LLM request budget exhausted") from None
+
+    async def _until_deadline(self, stream: AsyncIterator[str], deadline: float) -> AsyncIterator[str]:
+        """Pass stream chunks through, giving up on the next chunk once the deadline passes"""
+        iterator = stream.__aiter__()
+        while True:
+            try:
+                chunk = await self._run_until_deadline(iterator.__anext__(), deadline)
+            except StopAsyncIteration:
+                return
+            yield chunk
+
+    async def stream_llm_response(self, user_input: str, history: Sequence[Turn] = (),
+                                  client_id: Optional[str] = None) -> AsyncIterator[str]:
+        """Stream the LLM response chunk by chunk without blocking the event loop"""
+        precomputed = self._get_precomputed_response(user_input, history)
+        if precomputed is not None:
+            yield precomputed
+            return
+
+        admission = await self._admit_async(user_input, client_id)
+        if admission is not None:
+            if not admission.allowed:
+                yield self._rate_limited_response(user_input, admission)
+                return
+            if admission.wait:
+                await asyncio.sleep(admission.wait)
+
+        if not self.circuit_breaker.allow_request():
+            yield self._get_fallback_response(user_input, 'circuit_open')
+            return
+
+        chunks = []
+        error = None
+        deadline = time.monotonic() + self.request_timeout
+        with self._llm_span() as span:
+            started = time.perf_counter()
+            try:
+                timeout = self._remaining_budget(deadline)
+                if self.api_provider == "openai":
+                    call = self._get_openai_response(user_input, stream=True, timeout=timeout, history=history)
+                elif self.api_provider == "gemini":
+                    call = self._get_gemini_response(user_input, stream=True, timeout=timeout, history=history)
+                stream = await self._run_until_deadline(call, deadline)
+                async for chunk in self._until_deadline(stream, deadline):
+                    if chunk:
+                        chunks.append(chunk)
+                        yield chunk
+            except (asyncio.CancelledError, GeneratorExit):
+                # Client went away mid-stream
+                self.circuit_breaker.record_cancelled()
+                span.set('outcome', 'cancelled')
+                raise
+            except Exception as e:
+                self.circuit_breaker.record_failure()
+                self._llm_latency['error'].observe(time.perf_counter() - started)
+                span.annotate(outcome='error', error=type(e).__name__, chunks=len(chunks))
+                error = e
+            else:
+                elapsed = time.perf_counter() - started
+                self.circuit_breaker.record_success(elapsed)
+                self._llm_latency['success'].observe(elapsed)
+                span.annotate(outcome='success', chunks=len(chunks))
+
+        if error is not None:
+            # Only fall back if nothing has been sent yet
+            if not chunks:
+                yield self._get_fallback_response(user_input, self._fallback_reason(error))
+            return
+        self._store_response(user_input, ''.join(chunks).strip(), history)
+
+    async def _get_openai_response(self, user_input: str, stream: bool = False, timeout: Optional[float] = None,
+                                   history: Sequence[Turn] = ()) -> Union[str, AsyncIterator[str]]:
+        """Get response from OpenAI API (an async chunk iterator if stream=True)"""
+        response = await self.client.chat.completions.create(
+            model=self.model_name,
+            messages=self._get_openai_messages(user_input, history),
+            stream=stream,
+            timeout=timeout or self.request_timeout,
+            **self.OPENAI_PARAMS,
+            **self.OPENAI_STREAM_OPTIONS if stream else {}
+        )
+        if stream:
+            async def chunks():
+                usage, parts = None, []
+                async for chunk in response:
+                    if chunk.usage is not None:
+                        usage = chunk.usage
+                    if chunk.choices:
+                        text = chunk.choices[0].delta.content or ''
+                        parts.append(text)
+                        yield text
+                self._record_usage(openai_usage(usage), user_input, ''.join(parts))
+            return chunks()
+        text = response.choices[0].message.content.strip()
+        self._record_usage(openai_usage(response.usage), user_input, text)
+        return text
+
+    async def _get_gemini_response(self, user_input: str, stream: bool = False, timeout: Optional[float] = None,
+                                   history: Sequence[Turn] = ()) -> Union[str, AsyncIterator[str]]:
+        """Get response from Google Gemini API (an async chunk iterator if stream=True)"""
+        if self._gemini_rest:
+            return await self._get_gemini_rest_response(user_input, stream, timeout, history)
+        await asyncio.to_thread(self._refresh_context_cache)
+        response = await self.client.generate_content_async(
+            self._get_gemini_prompt(user_input, history),
+            generation_config=self.GEMINI_GENERATION_CONFIG,
+            stream=stream,
+            request_options={'timeout': timeout or self.request_timeout}
+        )
+        if stream:
+            async def chunks():
+                usage, parts = None, []
+                async for chunk in response:
+                    usage = gemini_usage(chunk.usage_metadata) or usage
+                    parts.append(chunk.text)
+                    yield chunk.text
+                self._record_usage(usage, user_input, ''.join(parts))
+            return chunks()
+        text = response.text.strip()
+        self._record_usage(gemini_usage(response.usage_metadata), user_input, text)
+        return text
+
+    async def _get_gemini_rest_response(self, user_input: str, stream: bool, timeout: Optional[float],
+                                        history: Sequence[Turn]) -> Union[str, AsyncIterator[str]]:
+        """The blocking REST call of the sync chatbot, run in a worker thread (one thread per chunk read)"""
+        response = await asyncio.to_thread(super()._get_gemini_response, user_input, stream, timeout, history)
+        if not stream:
+            return response
+
+        async def chunks():
+            done = object()
+            while True:
+                chunk = await asyncio.to_thread(next, response, done)
+                if chunk is done:
+                    return
+                yield chunk
+        return chunks()
@@ -0,0 +1,496 @@
+"""
+Micro-benchmarks for the chatbot hot paths
+
+Usage:
+    python benchmarks.py                # run everything
+    python benchmarks.py keywords       # run selected benchmarks
+    python benchmarks.py pipeline --save baseline.json
+    python benchmarks.py pipeline --compare baseline.json --threshold 0.1
+"""
+import argparse
+import json
+import os
+import random
+import string
+import subprocess
+import sys
+import tempfile
+import time
+
+from keyword_matcher import KeywordMatcher
+
+SAMPLE_MESSAGES = [
+    "I have a headache and feel dizzy",
+    "My knee hurts after running, what should I do?",
+    "Can you recommend a photo editing app?",
+    "I've had a sore throat and a mild fever since yesterday",
+    "Where is the nearest hospital in London",
+    "How can I improve my sleep quality when I'm stressed at work?",
+]
+
+
+def _timeit(func, repeat: int = 2000) -> float:
+    """Return the mean time per call in microseconds"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def _random_keywords(count: int, seed: int = 42) -> list:
+    rng = random.Random(seed)
+    return [''.join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 12))) for _ in range(count)]
+
+
+def bench_keywords():
+    """Keyword classification cost vs. keyword list size (naive substring scan vs. automaton)"""
+    print(f"{'keywords':>10} {'naive (us/msg)':>16} {'automaton (us/msg)':>20}")
+    for size in (100, 1000, 5000, 20000):
+        keywords = _random_keywords(size)
+        matcher = KeywordMatcher()
+        matcher.add_many(keywords, 'symptom')
+        matcher.build()
+
+        def naive():
+            for message in SAMPLE_MESSAGES:
+                lowered = message.lower()
+                [keyword for keyword in keywords if keyword in lowered]
+
+        def automaton():
+            for message in SAMPLE_MESSAGES:
+                matcher.scan(message)
+
+        repeat = max(5, 20000 // size)
+        naive_us = _timeit(naive, repeat) / len(SAMPLE_MESSAGES)
+        automaton_us = _timeit(automaton, repeat) / len(SAMPLE_MESSAGES)
+        print(f"{size:>10} {naive_us:>16.1f} {automaton_us:>20.1f}")
+
+
+def _generated_questions(count: int, seed: int = 7) -> list:
+    """Synthetic health questions with a realistic vocabulary mix"""
+    rng = random.Random(seed)
+    parts = ['head', 'knee', 'back', 'eye', 'ear', 'stomach', 'throat', 'neck', 'wrist', 'ankle', 'chest', 'hip']
+    symptoms = ['pain', 'hurts', 'swelling', 'itching', 'burning', 'numbness', 'stiffness', 'cramps']
+    contexts = ['after running', 'at night', 'in the morning', 'when I sit', 'for a week', 'since yesterday',
+                'after eating', 'at work', 'when I walk', 'after sleeping']
+    extra = _random_keywords(5000, seed)
+    return [
+        f"my {rng.choice(parts)} {rng.choice(symptoms)} {rng.choice(contexts)} {rng.choice(extra)} {rng.choice(extra)}"
+        for _ in range(count)
+    ]
+
+
+def bench_semantic_cache():
+    """Semantic cache insert and lookup cost at 100k entries"""
+    try:
+        from semantic_cache import SemanticCache
+    except ImportError:
+        print("NumPy is not installed; skipping.")
+        return
+
+    size = 100000
+    cache = SemanticCache(capacity=size)
+    questions = _generated_questions(size)
+    start = time.perf_counter()
+    for i, question in enumerate(questions):
+        cache.add(question, f"answer {i}", 'bench')
+    insert_us = (time.perf_counter() - start) / size * 1e6
+
+    probes = questions[:1000] + _generated_questions(1000, seed=99)
+    start = time.perf_counter()
+    hits = sum(cache.get(question, 'bench') is not None for question in probes)
+    lookup_us = (time.perf_counter() - start) / len(probes) * 1e6
+
+    print(f"entries: {len(cache)}, matrix: {cache._matrix.nbytes / 2**20:.0f} MB")
+    print(f"insert: {insert_us:.1f} us/entry, lookup: {lookup_us:.1f} us/query, hits: {hits}/{len(probes)}")
+
+
+def _synthetic_classifier(vocab_size: int, n_classes: int = 20, with_model: bool = True):
+    """A HealthcareChatbot over a synthetic vocabulary (skips loading the artifacts from disk)"""
+    from nltk.stem import WordNetLemmatizer
+    from artifact_manager import ArtifactManager, Artifacts
+    from healthcare_chatbot import HealthcareChatbot
+
+    bot = HealthcareChatbot.__new__(HealthcareChatbot)
+    bot.artifact_manager = ArtifactManager(artifacts=Artifacts.build({'intents': []}, [], [], None), reload_seconds=0)
+    bot.lemmatizer = WordNetLemmatizer()
+    bot.words = sorted(set(_random_keywords(vocab_size)) | {'head', 'pain', 'fever', 'knee', 'hurt'})
+    bot.classes = [f"intent_{i}" for i in range(n_classes)]
+    bot.batcher = None
+    if with_model:
+        from tensorflow.keras.layers import Dense, Dropout
+        from tensorflow.keras.models import Sequential
+        bot.model = Sequential([
+            Dense(256, input_shape=(len(bot.words),), activation='relu'), Dropout(0.5),
+            Dense(128, activation='relu'), Dropout(0.5),
+            Dense(n_classes, activation='softmax'),
+        ])
+    return bot
+
+
+def bench_bag_of_words():
+    """Bag-of-words vectorization: vocabulary scan vs. indexed lookup"""
+    print(f"{'vocab':>8} {'scan (us/msg)':>15} {'indexed (us/msg)':>18} {'batch (us/msg)':>16}")
+    for vocab_size in (100, 10000, 100000):
+        bot = _synthetic_classifier(vocab_size, with_model=False)
+
+        def scan():
+            # The original O(tokens x vocab) implementation
+            for message in SAMPLE_MESSAGES:
+                bag = [0] * len(bot.words)
+                for w in bot.clean_up_sentence(message):
+                    for i, word in enumerate(bot.words):
+                        if word == w:
+                            bag[i] = 1
+
+        def indexed():
+            for message in SAMPLE_MESSAGES:
+                bot.bag_of_words(message)
+
+        def batch():
+            bot.bags_of_words(SAMPLE_MESSAGES)
+
+        repeat = max(2, 200000 // vocab_size)
+        results = [_timeit(func, repeat) / len(SAMPLE_MESSAGES) for func in (scan, indexed, batch)]
+        print(f"{vocab_size:>8} " + ' '.join(f"{value:>{width}.1f}" for value, width in zip(results, (15, 18, 16))))
+
+
+def bench_predict():
+    """Intent prediction throughput: one forward pass per message vs. batched"""
+    print(f"{'vocab':>8} {'single (msg/s)':>15} {'batch of 64 (msg/s)':>20}")
+    for vocab_size in (100, 10000, 100000):
+        bot = _synthetic_classifier(vocab_size)
+        sentences = (SAMPLE_MESSAGES * 11)[:64]
+        bot.predict_classes(sentences)  # warm up
+
+        start = time.perf_counter()
+        for sentence in sentences:
+            bot.predict_class(sentence)
+        single = len(sentences) / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for _ in range(5):
+            bot.predict_classes(sentences)
+        batched = 5 * len(sentences) / (time.perf_counter() - start)
+        print(f"{vocab_size:>8} {single:>15.0f} {batched:>20.0f}")
+
+
+def _attach_numpy_model(bot, seed: int = 0) -> None:
+    """Give a synthetic classifier a randomly initialised NumPy model of the trained model's shape"""
+    import numpy as np
+    from numpy_model import NumpyMLP
+
+    rng = np.random.default_rng(seed)
+    sizes = [len(bot.words), 256, 128, len(bot.classes)]
+    bot.model = NumpyMLP(
+        [rng.standard_normal((a, b)) * 0.05 for a, b in zip(sizes, sizes[1:])],
+        [np.zeros(b) for b in sizes[1:]],
+        ['relu', 'relu', 'softmax'],
+    )
+
+
+def bench_micro_batching():
+    """Concurrent predict_class throughput: a forward pass per call vs. the micro-batcher"""
+    import threading
+
+    bot = _synthetic_classifier(10000, with_model=False)
+    _attach_numpy_model(bot)
+    batcher = bot.create_batcher(32, 2.0)
+    calls_per_thread = 200
+
+    def throughput(threads):
+        def worker():
+            for i in range(calls_per_thread):
+                bot.predict_class(SAMPLE_MESSAGES[i % len(SAMPLE_MESSAGES)])
+
+        pool = [threading.Thread(target=worker) for _ in range(threads)]
+        start = time.perf_counter()
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+        return threads * calls_per_thread / (time.perf_counter() - start)
+
+    print(f"{'threads':>8} {'direct (msg/s)':>15} {'batched (msg/s)':>16} {'mean batch':>11} {'p95 wait (ms)':>14}")
+    for threads in (1, 4, 16, 64):
+        bot.batcher = None
+        direct = throughput(threads)
+        bot.batcher = batcher
+        batcher.batch_sizes.__init__(batcher.batch_sizes.buckets)
+        batcher.queue_wait.__init__(batcher.queue_wait.buckets)
+        batched = throughput(threads)
+        stats = batcher.get_stats()
+        print(f"{threads:>8} {direct:>15.0f} {batched:>16.0f} "
+              f"{stats['batch_size']['mean']:>11.1f} {stats['queue_wait']['p95'] * 1000:>14.2f}")
+
+
+# Peak RSS comes from /proc (ru_maxrss survives exec, so it would report the parent's peak)
+_STARTUP_SNIPPET = """
+import resource, time
+started = time.perf_counter()
+import numpy as np
+{load}
+model.predict_on_batch(np.zeros((1, {inputs}), dtype=np.float32))
+elapsed = time.perf_counter() - started
+try:
+    with open('/proc/self/status') as status:
+        peak_kb = next(int(line.split()[1]) for line in status if line.startswith('VmHWM'))
+except OSError:
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(elapsed, peak_kb)
+"""
+
+
+def bench_model_startup():
+    """Cold start and peak memory: Keras load_model vs. NumPy engine (fresh process each)"""
+    keras_path, numpy_path = 'chatbot_model.h5', 'chatbot_model.npz'
+    if not (os.path.exists(keras_path) and os.path.exists(numpy_path)):
+        # No trained artifacts: benchmark a synthetic model of the same shape
+        from numpy_model import export_keras_model
+        directory = tempfile.mkdtemp()
+        keras_path, numpy_path = os.path.join(directory, 'model.h5'), os.path.join(directory, 'model.npz')
+        bot = _synthetic_classifier(1000)
+        bot.model.save(keras_path)
+        export_keras_model(bot.model, numpy_path)
+
+    from numpy_model import NumpyMLP
+    inputs = NumpyMLP.load(numpy_path).input_size
+    loaders = {
+        'keras': f"from tensorflow.keras.models import load_model\nmodel = load_model({keras_path!r})",
+        'numpy': f"from numpy_model import NumpyMLP\nmodel = NumpyMLP.load({numpy_path!r})",
+    }
+    print(f"{'engine':>8} {'load + first predict (s)':>26} {'peak RSS (MB)':>15}")
+    for name, load in loaders.items():
+        output = subprocess.run(
+            [sys.executable, '-c', _STARTUP_SNIPPET.format(load=load, inputs=inputs)],
+            capture_output=True, text=True, check=True
+        ).stdout.split()
+        seconds, rss_kb = float(output[-2]), int(output[-1])
+        print(f"{name:>8} {seconds:>26.2f} {rss_kb / 1024:>15.0f}")
+
+
+def bench_provider_overhead():
+    """Client-side cost of a provider call (SDK + chatbot), against the zero-latency offline stub"""
+    from llm_chatbot import LLMHealthChatbot
+    from stub_llm_server import StubLLMServer, StubProfile, serve_in_background
+
+    base_url, stop = serve_in_background(StubLLMServer(StubProfile(latency_ms=0, tokens_per_second=0)))
+    previous = os.environ.get('LLM_BASE_URL')
+    os.environ['LLM_BASE_URL'] = base_url
+    try:
+        print(f"{'provider':>9} {'call (ms)':>10} {'stream (ms)':>12}")
+        for provider in ('openai', 'gemini'):
+            bot = LLMHealthChatbot(api_provider=provider, api_key='stub', use_fallback=False)
+            # Distinct questions, so the response caches never answer
+            questions = iter(f"My knee hurts after running {i} km" for i in range(10 ** 6))
+            bot._call_provider(next(questions), time.monotonic() + 10)  # warm up the connection
+            call = _timeit(lambda: bot._call_provider(next(questions), time.monotonic() + 10), repeat=100)
+            stream = _timeit(lambda: ''.join(bot.stream_llm_response(next(questions))), repeat=100)
+            print(f"{provider:>9} {call / 1000:>10.2f} {stream / 1000:>12.2f}")
+    finally:
+        if previous is None:
+            os.environ.pop('LLM_BASE_URL', None)
+        else:
+            os.environ['LLM_BASE_URL'] = previous
+        stop()
+
+
+# Fragments for the generated pipeline corpora, by intent
+_INTENT_FRAGMENTS = {
+    'symptom': ["I have a headache", "my throat is sore", "I've had a fever since yesterday",
+                "my stomach hurts after eating", "my back aches when I sit", "I feel dizzy when I stand up",
+                "my knee hurts after running", "I have a runny nose and keep sneezing", "I can't sleep at night"],
+    'emergency': ["I have severe chest pain", "my friend is unconscious", "I can't breathe properly"],
+    'bmi': ["calculate my BMI, I am 175 cm and 70 kg", "what is my bmi", "bmi for 1.62 m and 58 kg"],
+    'hospital': ["find a hospital near me", "where is the nearest clinic in Mumbai", "hospital near 226016"],
+    'off_topic': ["can you recommend a good laptop", "what's the weather tomorrow", "tell me a joke about cats"],
+}
+_INTENT_WEIGHTS = {'symptom': 50, 'emergency': 5, 'bmi': 15, 'hospital': 15, 'off_topic': 15}
+_FILLER_SENTENCES = [
+    "I work long hours at a desk", "it started a few days ago", "I am 34 years old",
+    "I drink a lot of coffee", "I usually sleep around six hours", "it gets worse in the evening",
+    "I tried resting but it didn't help", "I don't have any allergies that I know of",
+    "my job is quite stressful lately", "I walk to work most days", "nobody else at home is sick",
+    "I haven't changed my diet recently",
+]
+
+
+def _message_corpus(length: str, count: int = 400, seed: int = 11) -> list:
+    """
+    Generated user messages with a realistic intent mix
+
+    Args:
+        length: 'short' (one phrase) or 'long' (the phrase inside 6-15 sentences of context)
+        count: Number of messages
+        seed: Random seed (the corpus is identical across runs)
+    """
+    rng = random.Random(seed)
+    intents = list(_INTENT_WEIGHTS)
+    messages = []
+    for _ in range(count):
+        fragment = rng.choice(_INTENT_FRAGMENTS[rng.choices(intents, [_INTENT_WEIGHTS[i] for i in intents])[0]])
+        if length == 'short':
+            messages.append(fragment)
+            continue
+        sentences = rng.sample(_FILLER_SENTENCES, rng.randint(6, min(15, len(_FILLER_SENTENCES))))
+        sentences.insert(rng.randrange(len(sentences) + 1), fragment)
+        messages.append('. '.join(sentences) + '.')
+    return messages
+
+
+def _per_call_us(func, inputs: list, rounds: int = 15) -> float:
+    """
+    Mean time per call in microseconds, from the fastest of `rounds` passes over the inputs
+
+    The fastest pass is the least disturbed by other processes (as with timeit), which
+    keeps run-to-run noise well below the regression threshold.
+    """
+    for item in inputs:
+        func(item)
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for item in inputs:
+            func(item)
+        timings.append((time.perf_counter() - start) / len(inputs) * 1e6)
+    return min(timings)
+
+
+def _intents_classifier():
+    """A HealthcareChatbot with the vocabulary and tags of intents.json and a random NumPy model"""
+    import json
+
+    bot = _synthetic_classifier(0, with_model=False)
+    with open('intents.json', encoding='utf-8') as f:
+        intents = json.load(f)['intents']
+    words = set()
+    for intent in intents:
+        for pattern in intent['patterns']:
+            words.update(bot.clean_up_sentence(pattern))
+    bot.words = sorted(words - {'?', '!', '.', ','})
+    bot.classes = sorted({intent['tag'] for intent in intents})
+    _attach_numpy_model(bot)
+    return bot
+
+
+def bench_pipeline():
+    """Per-stage cost of the chatbot pipeline over generated short and long messages (us/call)"""
+    from llm_chatbot import LLMHealthChatbot
+    from response_cache import ResponseCache
+
+    bot = LLMHealthChatbot(api_provider='openai', use_fallback=True, response_cache=ResponseCache(max_entries=0))
+    # Fallback mode even if a key is configured: no provider calls in a micro-benchmark
+    bot.api_available = False
+    classifier = _intents_classifier()
+    stages = {
+        'detect_emergency': bot.detect_emergency,
+        'is_health_related': bot.is_health_related,
+        'detect_symptom': bot.detect_symptom,
+        'handle_bmi_request': bot.handle_bmi_request,
+        'handle_hospital_request': bot.handle_hospital_request,
+        'get_bot_response': bot.get_bot_response,
+        'bag_of_words': classifier.bag_of_words,
+        'predict_class': classifier.predict_class,
+    }
+    corpora = {length: _message_corpus(length) for length in ('short', 'long')}
+
+    results = {}
+    print(f"{'stage':>26} {'short (us)':>11} {'long (us)':>11}")
+    for stage, func in stages.items():
+        row = [_per_call_us(func, corpora[length]) for length in corpora]
+        for length, value in zip(corpora, row):
+            results[f"{stage}/{length}"] = value
+        print(f"{stage:>26} {row[0]:>11.2f} {row[1]:>11.2f}")
+    fallback_keys = list(bot.FALLBACK_RESPONSES) * 20
+    results['format_fallback_response/keys'] = _per_call_us(bot.format_fallback_response, fallback_keys)
+    print(f"{'format_fallback_response':>26} {results['format_fallback_response/keys']:>11.2f} {'-':>11}")
+    return results
+
+
+def compare_results(results: dict, baseline: dict, threshold: float) -> list:
+    """
+    Compare timings with a saved baseline
+
+    Args:
+        results: benchmark -> {measurement: microseconds}
+        baseline: Contents of a file written with --save
+        threshold: Relative slowdown that counts as a regression (0.1 = 10 %)
+
+    Returns:
+        Names of the regressed measurements
+    """
+    regressions = []
+    print(f"\nCompared with {baseline.get('commit') or 'baseline'} ({baseline.get('created', '?')}), "
+          f"threshold {threshold:.0%}:")
+    print(f"{'measurement':>36} {'baseline':>10} {'now':>10} {'change':>8}")
+    for name, measurements in results.items():
+        for key, value in measurements.items():
+            old = baseline.get('results', {}).get(name, {}).get(key)
+            if not old:
+                continue
+            change = value / old - 1
+            flag = ''
+            if change > threshold:
+                flag = '  REGRESSION'
+                regressions.append(f"{name}:{key}")
+            elif change < -threshold:
+                flag = '  faster'
+            print(f"{key:>36} {old:>10.2f} {value:>10.2f} {change:>+8.1%}{flag}")
+    return regressions
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+BENCHMARKS = {
+    'keywords': bench_keywords,
+    'semantic_cache': bench_semantic_cache,
+    'bag_of_words': bench_bag_of_words,
+    'predict': bench_predict,
+    'micro_batching': bench_micro_batching,
+    'model_startup': bench_model_startup,
+    'provider_overhead': bench_provider_overhead,
+    'pipeline': bench_pipeline,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for the chatbot hot paths.")
+    parser.add_argument('names', nargs='*', help=f"Benchmarks to run (default: all): {', '.join(BENCHMARKS)}")
+    parser.add_argument('--save', help="Write the results of benchmarks that report them (e.g. pipeline) to this file")
+    parser.add_argument('--compare', help="Baseline written by --save; exits with status 1 on regressions")
+    parser.add_argument('--threshold', type=float, default=0.15, help="Slowdown that counts as a regression")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for name in args.names or list(BENCHMARKS):
+        if name not in BENCHMARKS:
+            print(f"Unknown benchmark '{name}'. Available: {', '.join(BENCHMARKS)}")
+            continue
+        print(f"\n=== {name}: {BENCHMARKS[name].__doc__} ===")
+        measured = BENCHMARKS[name]()
+        if measured:
+            results[name] = measured
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({'commit': _git_commit(), 'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                       'python': sys.version.split()[0], 'results': results}, f, indent=2)
+        print(f"\n✅ Saved baseline to {args.save}")
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            regressions = compare_results(results, json.load(f), args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) beyond {args.threshold:.0%}: {', '.join(regressions)}")
+            return 1
+        print("\n✅ No regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
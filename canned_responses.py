@@ -0,0 +1,50 @@
+import gzip
+import json
+from types import MappingProxyType
+from typing import Dict, Mapping, NamedTuple, Optional
+
+
+class CannedResponse(NamedTuple):
+    """A fixed answer with its HTTP body pre-encoded"""
+    text: str
+    # {"response": text} as UTF-8 JSON, plain and gzip-compressed
+    body: bytes
+    gzip_body: bytes
+
+
+# Every canned answer by its text, so the HTTP layer can recognise them
+_BY_TEXT: Dict[str, CannedResponse] = {}
+
+
+def render_fallback_html(data: dict) -> str:
+    """Render a FALLBACK_RESPONSES entry as the three-part answer (direct answer, tips, remedies)"""
+    return ''.join([
+        f"<strong>Direct Answer:</strong><br>{data['answer']}<br><br>",
+        "<strong>Actionable Tips:</strong><ul>",
+        *[f"<li>{tip}</li>" for tip in data['tips']],
+        "</ul><strong>Home Remedies:</strong><ul>",
+        *[f"<li>{remedy}</li>" for remedy in data['remedies']],
+        "</ul><br><em>⚠️ I am an AI, not a doctor. Please consult a medical professional for proper diagnosis and treatment.</em>",
+    ])
+
+
+def canned(text: str) -> CannedResponse:
+    """Encode a fixed answer once and register it for lookup_canned()"""
+    existing = _BY_TEXT.get(text)
+    if existing is not None:
+        return existing
+    body = json.dumps({'response': text}).encode('utf-8')
+    # mtime=0 keeps the compressed bytes identical across processes
+    response = CannedResponse(text, body, gzip.compress(body, compresslevel=9, mtime=0))
+    _BY_TEXT[text] = response
+    return response
+
+
+def canned_table(texts: Dict[str, str]) -> Mapping[str, CannedResponse]:
+    """Read-only mapping of name -> CannedResponse"""
+    return MappingProxyType({name: canned(text) for name, text in texts.items()})
+
+
+def lookup_canned(text: str) -> Optional[CannedResponse]:
+    """The pre-encoded variant of an answer, or None if it is not a canned answer"""
+    return _BY_TEXT.get(text)
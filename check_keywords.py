@@ -0,0 +1,90 @@
+"""
+Check the keyword automaton against the original substring classifier
+
+LLMHealthChatbot used to classify messages with `keyword in message.lower()`
+for every keyword. The automaton must give the same emergency, health and
+symptom decisions on the bundled intents and on PHRASES, except where the old
+check matched inside another word (WORD_BOUNDARY_FIXES). A symptom phrase now
+also counts as health-related, which the old check missed for e.g. "migraine".
+
+Exits with status 1 on any difference:
+    python check_keywords.py
+"""
+import json
+import sys
+
+from llm_chatbot import LLMHealthChatbot
+
+# Questions whose keywords appear with derivational endings or inside phrases
+PHRASES = [
+    "How can I stay healthy?",
+    "painful swallowing",
+    "my feverish child",
+    "I feel feverish and achy",
+    "sneezing and a stuffy nose all week",
+    "my stomachache keeps coming back",
+    "coughing at night",
+    "is this medication safe with alcohol",
+    "my knees are stiff in the morning",
+    "he has chest pains and is sweating",
+    "tips for better sleeping habits",
+    "I get dizzy when I stand up",
+    "lower back pain after lifting",
+    "eye strain from screens",
+    "she had an allergic reaction to peanuts",
+    "my eyes feel tired and dry",
+    "what's the weather tomorrow",
+    "tell me a joke",
+    "recommend a good movie",
+]
+
+# Old matches inside another word, which the automaton no longer makes
+WORD_BOUNDARY_FIXES = {
+    "show me a photo of my dog": "'hot' matched inside 'photo'",
+    "will it rain today": "'ill' matched inside 'will'",
+    "happy new year": "'ear' matched inside 'year'",
+}
+
+
+def substring_classification(text: str) -> tuple:
+    """(emergency, health, symptom) as decided before the automaton"""
+    lowered = text.lower()
+    emergency = any(keyword in lowered for keyword in LLMHealthChatbot.EMERGENCY_KEYWORDS)
+    symptom = next((key for key, patterns in LLMHealthChatbot.SYMPTOM_PATTERNS.items()
+                    if any(pattern in lowered for pattern in patterns)), None)
+    health = any(keyword in lowered for keyword in LLMHealthChatbot.HEALTH_KEYWORDS) or symptom is not None
+    return emergency, health, symptom
+
+
+def automaton_classification(text: str) -> tuple:
+    """(emergency, health, symptom) from the keyword automaton"""
+    matches = LLMHealthChatbot.KEYWORD_MATCHER.scan(text)
+    found = matches.get('symptom', [])
+    symptom = next((key for key in LLMHealthChatbot.SYMPTOM_PATTERNS if key in found), None)
+    return 'emergency' in matches, 'health' in matches or 'symptom' in matches, symptom
+
+
+def main():
+    with open('intents.json') as f:
+        intents = json.load(f)
+    texts = [pattern for intent in intents['intents'] for pattern in intent['patterns']] + PHRASES
+
+    failures = []
+    for text in texts:
+        expected, actual = substring_classification(text), automaton_classification(text)
+        if expected != actual:
+            failures.append(f"{text!r}: substring {expected}, automaton {actual}")
+    for text, reason in WORD_BOUNDARY_FIXES.items():
+        if substring_classification(text) == automaton_classification(text):
+            failures.append(f"{text!r}: expected a different result ({reason})")
+
+    print(f"Checked {len(texts)} messages and {len(WORD_BOUNDARY_FIXES)} word-boundary fixes")
+    if failures:
+        for failure in failures:
+            print(f"❌ {failure}")
+        sys.exit(1)
+    print("✅ Keyword automaton matches the substring classifier")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,7 +7,13 @@ load_dotenv()
 api_key = os.getenv("GEMINI_API_KEY")
 print(f"Using API Key: {api_key[:5]}...{api_key[-5:]}")
 
-genai.configure(api_key=api_key)
+base_url = os.getenv("LLM_BASE_URL")
+if base_url:
+    # e.g. the offline stub: python stub_llm_server.py
+    print(f"Using endpoint: {base_url}")
+    genai.configure(api_key=api_key, transport='rest', client_options={'api_endpoint': base_url})
+else:
+    genai.configure(api_key=api_key)
 
 print("Listing available models...")
 try:
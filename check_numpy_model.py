@@ -0,0 +1,65 @@
+"""
+Check the exported NumPy classifier against the Keras model it came from
+
+Loads the artifacts the way the server does (chatbot_model.npz through
+ArtifactManager), vectorizes every pattern in intents.json, and compares the
+NumPy and Keras outputs. Both must agree within PARITY_TOLERANCE and rank
+the same intent first on every pattern. Random bag-of-words inputs are
+compared too, to cover words the patterns do not use.
+
+Exits with status 1 on any mismatch:
+    python check_numpy_model.py
+    python check_numpy_model.py chatbot_model.h5 chatbot_model.npz
+"""
+import sys
+
+import numpy as np
+
+from artifact_manager import ArtifactError, ArtifactManager
+from healthcare_chatbot import HealthcareChatbot
+from numpy_model import PARITY_TOLERANCE, NumpyMLP, check_parity
+
+
+def main():
+    keras_path = sys.argv[1] if len(sys.argv) > 1 else 'chatbot_model.h5'
+    numpy_path = sys.argv[2] if len(sys.argv) > 2 else 'chatbot_model.npz'
+
+    try:
+        manager = ArtifactManager(numpy_path=numpy_path, keras_path=keras_path, reload_seconds=0)
+    except ArtifactError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    artifacts = manager.current
+    if not isinstance(artifacts.model, NumpyMLP):
+        print(f"❌ {numpy_path} not found; the server would load the Keras model")
+        sys.exit(1)
+
+    from tensorflow.keras.models import load_model
+    keras_model = load_model(keras_path)
+
+    patterns = [pattern for intent in artifacts.intents['intents'] for pattern in intent['patterns']]
+    bags = HealthcareChatbot(artifacts=manager).bags_of_words(patterns, artifacts)
+    expected = np.asarray(keras_model.predict_on_batch(bags))
+    actual = artifacts.model.predict_on_batch(bags)
+
+    difference = float(np.abs(expected - actual).max())
+    random_difference = check_parity(keras_model, artifacts.model)
+    disagreements = [pattern for pattern, keras_row, numpy_row in zip(patterns, expected, actual)
+                     if keras_row.argmax() != numpy_row.argmax()]
+
+    print(f"Max |keras - numpy|: {difference:.2e} on {len(patterns)} patterns, "
+          f"{random_difference:.2e} on random inputs (tolerance {PARITY_TOLERANCE:.0e})")
+    failed = False
+    if max(difference, random_difference) > PARITY_TOLERANCE:
+        print("❌ Outputs differ more than the tolerance")
+        failed = True
+    for pattern in disagreements:
+        print(f"❌ Different top intent for {pattern!r}")
+        failed = True
+    if failed:
+        sys.exit(1)
+    print(f"✅ {numpy_path} matches {keras_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is rejected because the provider's breaker is open"""
+
+
+class CircuitBreaker:
+    """
+    Closed/open/half-open circuit breaker for one LLM provider
+
+    Outcomes of the last `window` calls are kept. A call counts as a failure if
+    it raised or took longer than `slow_call_seconds`. Once at least `min_calls`
+    are recorded and the failure rate reaches `error_rate`, the breaker opens
+    and rejects calls for `open_seconds`. After that it lets `half_open_probes`
+    calls through; success closes it again and any failure re-opens it.
+    """
+
+    # Process-wide breakers, one per provider
+    _registry: Dict[str, 'CircuitBreaker'] = {}
+    _registry_lock = threading.Lock()
+
+    def __init__(self, name: str, error_rate: float = 0.5, slow_call_seconds: float = 10.0,
+                 min_calls: int = 5, window: int = 20, open_seconds: float = 30.0, half_open_probes: int = 1):
+        """
+        Initialize a closed breaker
+
+        Args:
+            name: Provider name
+            error_rate: Failure ratio (0-1) that opens the breaker
+            slow_call_seconds: Calls slower than this count as failures
+            min_calls: Minimum calls in the window before the breaker can open
+            window: Number of recent calls considered
+            open_seconds: How long the breaker stays open before probing
+            half_open_probes: Concurrent trial calls allowed while half-open
+        """
+        self.name = name
+        self.error_rate = error_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self.state = CLOSED
+        self._outcomes = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._lock = threading.Lock()
+        self.transitions = {f"{CLOSED}->{OPEN}": 0, f"{OPEN}->{HALF_OPEN}": 0,
+                            f"{HALF_OPEN}->{CLOSED}": 0, f"{HALF_OPEN}->{OPEN}": 0}
+        self.rejected = 0
+
+    @classmethod
+    def for_provider(cls, name: str) -> 'CircuitBreaker':
+        """Shared breaker for a provider, configured from BREAKER_* environment variables"""
+        with cls._registry_lock:
+            breaker = cls._registry.get(name)
+            if breaker is None:
+                breaker = cls(
+                    name,
+                    error_rate=float(os.getenv("BREAKER_ERROR_RATE", "0.5")),
+                    slow_call_seconds=float(os.getenv("BREAKER_SLOW_CALL_SECONDS", "10")),
+                    min_calls=int(os.getenv("BREAKER_MIN_CALLS", "5")),
+                    window=int(os.getenv("BREAKER_WINDOW", "20")),
+                    open_seconds=float(os.getenv("BREAKER_OPEN_SECONDS", "30")),
+                    half_open_probes=int(os.getenv("BREAKER_HALF_OPEN_PROBES", "1")),
+                )
+                cls._registry[name] = breaker
+            return breaker
+
+    @classmethod
+    def snapshot_all(cls) -> Dict[str, dict]:
+        """State of every provider breaker in this process"""
+        with cls._registry_lock:
+            breakers = list(cls._registry.values())
+        return {breaker.name: breaker.snapshot() for breaker in breakers}
+
+    def _transition(self, new_state: str) -> None:
+        self.transitions[f"{self.state}->{new_state}"] += 1
+        self.state = new_state
+        if new_state == OPEN:
+            self._opened_at = time.monotonic()
+        elif new_state == CLOSED:
+            self._outcomes.clear()
+        self._probes_in_flight = 0
+
+    def allow_request(self) -> bool:
+        """Return True if a call may proceed (reserves a probe slot when half-open)"""
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+                self._transition(HALF_OPEN)
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and self._probes_in_flight < self.half_open_probes:
+                self._probes_in_flight += 1
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self, latency: float) -> None:
+        """Record a completed call; slow calls count as failures"""
+        if latency > self.slow_call_seconds:
+            self.record_failure()
+            return
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._transition(CLOSED)
+            else:
+                self._outcomes.append(False)
+
+    def record_failure(self) -> None:
+        """Record a failed (or too slow) call"""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._transition(OPEN)
+                return
+            self._outcomes.append(True)
+            if self.state == CLOSED and len(self._outcomes) >= self.min_calls:
+                if sum(self._outcomes) / len(self._outcomes) >= self.error_rate:
+                    self._transition(OPEN)
+
+    def record_cancelled(self) -> None:
+        """Release a half-open probe slot for a call abandoned without an outcome"""
+        with self._lock:
+            if self.state == HALF_OPEN and self._probes_in_flight:
+                self._probes_in_flight -= 1
+
+    def snapshot(self) -> dict:
+        """Current state, recent failure rate and transition counters"""
+        with self._lock:
+            calls = len(self._outcomes)
+            return {
+                'state': self.state,
+                'recent_calls': calls,
+                'failure_rate': round(sum(self._outcomes) / calls, 3) if calls else 0.0,
+                'rejected': self.rejected,
+                'transitions': dict(self.transitions),
+            }
@@ -1,19 +1,31 @@
 import random
-import json
-import pickle
-import nltk
-from nltk.stem import WordNetLemmatizer
-from tensorflow.keras.models import load_model
+import os
 import numpy as np
 import re
+from typing import Optional
+
+from artifact_manager import ArtifactManager, Artifacts, response_index
+from micro_batcher import MicroBatcher
 
 class HealthcareChatbot:
-    def __init__(self):
-        self.lemmatizer = WordNetLemmatizer()
-        self.intents = json.loads(open("intents.json").read())
-        self.words = pickle.load(open('words.pkl', 'rb'))
-        self.classes = pickle.load(open('classes.pkl', 'rb'))
-        self.model = load_model('chatbot_model.h5')
+    # Minimum probability for an intent to be returned
+    ERROR_THRESHOLD = 0.25
+
+    def __init__(self, artifacts: Optional[ArtifactManager] = None):
+        """
+        Initialize the chatbot
+
+        Args:
+            artifacts: Source of the intents, vocabulary, classes and model (default: the
+                       files in the working directory, reloaded when they change)
+        """
+        self._lemmatizer = None
+        self.artifact_manager = artifacts if artifacts is not None else ArtifactManager.from_env()
+        # Concurrent predict_class() calls share batched forward passes
+        self.batcher = self.create_batcher(
+            int(os.getenv("INTENT_BATCH_SIZE", "32")),
+            float(os.getenv("INTENT_BATCH_WAIT_MS", "2"))
+        )
         
         # Health-related keywords for filtering
         self.health_keywords = [
@@ -23,44 +35,138 @@ class HealthcareChatbot:
             'therapy', 'surgery', 'infection', 'allergy', 'wellness'
         ]
         
+    @property
+    def artifacts(self) -> Artifacts:
+        """Current artifacts snapshot; read it once per request so a reload never mixes versions"""
+        return self.artifact_manager.current
+    
+    def _artifact_field(field):
+        def get(self):
+            return getattr(self.artifacts, field)
+        
+        def set(self, value):
+            self.artifact_manager.swap(self.artifacts.with_changes(**{field: value}))
+        
+        return property(get, set, doc=f"{field} of the current artifacts (assigning publishes a new snapshot)")
+    
+    intents = _artifact_field('intents')
+    words = _artifact_field('words')
+    classes = _artifact_field('classes')
+    model = _artifact_field('model')
+    del _artifact_field
+    
+    @property
+    def word_index(self):
+        return self.artifacts.word_index
+    
+    def create_batcher(self, max_batch_size, max_wait_ms):
+        """Micro-batcher for single-sentence predictions, or None if max_batch_size <= 1"""
+        if max_batch_size <= 1:
+            return None
+        return MicroBatcher(self._predict_bags, max_batch_size, max_wait_ms, name='intent-batcher')
+    
+    @property
+    def lemmatizer(self):
+        # NLTK is imported on the first message rather than at startup
+        if self._lemmatizer is None:
+            from nltk.stem import WordNetLemmatizer
+            self._lemmatizer = WordNetLemmatizer()
+        return self._lemmatizer
+    
+    @lemmatizer.setter
+    def lemmatizer(self, value):
+        self._lemmatizer = value
+    
     def clean_up_sentence(self, sentence):
+        import nltk
         sentence_words = nltk.word_tokenize(sentence)
         sentence_words = [self.lemmatizer.lemmatize(word.lower()) for word in sentence_words]
         return sentence_words
     
-    def bag_of_words(self, sentence):
-        sentence_words = self.clean_up_sentence(sentence)
-        bag = [0] * len(self.words)
-        
-        for w in sentence_words:
-            for i, word in enumerate(self.words):
-                if word == w:
-                    bag[i] = 1
-        return np.array(bag)
-    
-    def predict_class(self, sentence):
-        bow = self.bag_of_words(sentence)
-        res = self.model.predict(np.array([bow]))[0]
-        
-        ERROR_THRESHOLD = 0.25
-        results = [[i, r] for i, r in enumerate(res) if r > ERROR_THRESHOLD]
+    def bag_of_words(self, sentence, artifacts=None):
+        artifacts = artifacts or self.artifacts
+        bag = np.zeros(len(artifacts.words), dtype=np.float32)
+        self._fill_bag(bag, sentence, artifacts)
+        return bag
+    
+    def bags_of_words(self, sentences, artifacts=None):
+        """Vectorize a batch of sentences into one (len(sentences), vocab) matrix"""
+        artifacts = artifacts or self.artifacts
+        bags = np.zeros((len(sentences), len(artifacts.words)), dtype=np.float32)
+        for row, sentence in enumerate(sentences):
+            self._fill_bag(bags[row], sentence, artifacts)
+        return bags
+    
+    def _fill_bag(self, bag, sentence, artifacts):
+        # O(tokens) dictionary lookups instead of scanning the whole vocabulary per token
+        word_index = artifacts.word_index
+        for w in self.clean_up_sentence(sentence):
+            index = word_index.get(w)
+            if index is not None:
+                bag[index] = 1
+    
+    def predict_class(self, sentence, artifacts=None):
+        artifacts = artifacts or self.artifacts
+        if self.batcher is None:
+            return self.predict_classes([sentence], artifacts)[0]
+        # Vectorize in the calling thread; only the forward pass is batched
+        probabilities = self.batcher.submit(
+            sentence, prepare=lambda text: (artifacts, self.bag_of_words(text, artifacts)))
+        return self._rank_intents(probabilities, artifacts)
+    
+    def predict_classes(self, sentences, artifacts=None):
+        """Score a batch of sentences in one forward pass; returns one intent list per sentence"""
+        if not sentences:
+            return []
+        artifacts = artifacts or self.artifacts
+        probabilities = artifacts.model.predict_on_batch(self.bags_of_words(sentences, artifacts))
+        return [self._rank_intents(res, artifacts) for res in np.asarray(probabilities)]
+    
+    def _predict_bags(self, items):
+        """Forward pass over (artifacts, bag) items; a batch spanning a reload runs once per version"""
+        results = [None] * len(items)
+        versions = {}
+        for position, (artifacts, _) in enumerate(items):
+            versions.setdefault(id(artifacts), (artifacts, []))[1].append(position)
+        for artifacts, positions in versions.values():
+            probabilities = np.asarray(artifacts.model.predict_on_batch(np.stack([items[i][1] for i in positions])))
+            for position, row in zip(positions, probabilities):
+                results[position] = row
+        return results
+    
+    def _rank_intents(self, res, artifacts=None):
+        classes = (artifacts or self.artifacts).classes
+        results = [[i, r] for i, r in enumerate(res) if r > self.ERROR_THRESHOLD]
         results.sort(key=lambda x: x[1], reverse=True)
         
         return_list = []
         for r in results:
-            return_list.append({'intent': self.classes[r[0]], 'probability': str(r[1])})
+            return_list.append({'intent': classes[r[0]], 'probability': str(r[1])})
         return return_list
     
-    def get_response(self, intents_list, intents_json):
+    def responses_for(self, intents_json=None):
+        """
+        Tag -> responses index
+
+        Args:
+            intents_json: The Artifacts snapshot the intent was predicted with, or a raw
+                          intents dict (default: the current snapshot)
+        """
+        if isinstance(intents_json, Artifacts):
+            return intents_json.responses
+        artifacts = self.artifacts
+        if intents_json is None or intents_json is artifacts.intents:
+            return artifacts.responses
+        return response_index(intents_json)
+    
+    def get_response(self, intents_list, intents_json=None):
         if not intents_list:
             return "I'm sorry, I can only help with health-related questions. Could you please ask about symptoms, diseases, medications, or other health topics?"
             
         tag = intents_list[0]['intent']
-        list_of_intents = intents_json['intents']
-        
-        for i in list_of_intents:
-            if i['tag'] == tag:
-                return random.choice(i['responses'])
+        responses = self.responses_for(intents_json).get(tag)
+        if responses:
+            return random.choice(responses)
         
         return "I'm sorry, I can only help with health-related questions."
     
@@ -73,9 +179,10 @@ class HealthcareChatbot:
         if not self.is_health_related(user_input):
             return "I'm a healthcare chatbot and can only assist with health-related questions. Please ask about symptoms, diseases, medications, treatments, or other health topics."
         
-        # Predict intent and get response
-        intents = self.predict_class(user_input)
-        response = self.get_response(intents, self.intents)
+        # Predict intent and get response from one artifacts version
+        artifacts = self.artifacts
+        intents = self.predict_class(user_input, artifacts)
+        response = self.get_response(intents, artifacts)
         return response
 
 def main():
@@ -0,0 +1,219 @@
+import asyncio
+import os
+import time
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+from async_llm_chatbot import AsyncLLMHealthChatbot
+from latency import LatencyHistogram
+from session_store import Turn
+
+
+class HedgedLLMHealthChatbot(AsyncLLMHealthChatbot):
+    """
+    Async chatbot that hedges slow provider calls with a second provider
+
+    The question goes to the primary provider first. If no answer has arrived
+    after the hedge delay (or immediately for premium traffic), the same
+    question is sent to the secondary provider. The first successful completion
+    wins and the other call is cancelled.
+
+    Streaming requests are not hedged and always use the primary provider.
+    """
+
+    # Samples needed before the hedge delay follows the primary's observed p95
+    MIN_ADAPTIVE_SAMPLES = 20
+
+    def __init__(self, api_provider: str = "openai", secondary_provider: str = "gemini",
+                 hedge_delay: float = 2.0, adaptive: bool = True,
+                 min_hedge_delay: float = 0.25, max_hedge_delay: float = 10.0,
+                 premium_clients: Iterable[str] = (), **kwargs):
+        """
+        Initialize the hedged chatbot
+
+        Args:
+            api_provider: Primary provider ("openai" or "gemini")
+            secondary_provider: Provider used for the hedge request
+            hedge_delay: Seconds to wait for the primary before hedging (until enough samples exist)
+            adaptive: If True, derive the hedge delay from the primary's observed p95 latency
+            min_hedge_delay: Lower bound for the adaptive delay
+            max_hedge_delay: Upper bound for the adaptive delay
+            premium_clients: Client identities whose requests query both providers immediately
+            **kwargs: Passed to AsyncLLMHealthChatbot
+        """
+        super().__init__(api_provider=api_provider, **kwargs)
+        self.secondary = AsyncLLMHealthChatbot(
+            api_provider=secondary_provider,
+            use_fallback=True,
+            response_cache=self.response_cache,
+            semantic_cache=self.semantic_cache,
+            prompt_variant=self.prompt_variant,
+            token_ledger=self.token_ledger,
+            session_store=self.session_store,
+            tracer=self.tracer,
+            admission=self.admission,
+            single_flight=self.single_flight,
+        )
+        self.hedge_delay = hedge_delay
+        self.adaptive = adaptive
+        self.min_hedge_delay = min_hedge_delay
+        self.max_hedge_delay = max_hedge_delay
+        self.premium_clients = frozenset(premium_clients)
+        self.latency: Dict[str, LatencyHistogram] = {
+            self.api_provider: LatencyHistogram(),
+            self.secondary.api_provider: LatencyHistogram(),
+        }
+        self.stats = {'requests': 0, 'hedged': 0, 'primary_wins': 0, 'secondary_wins': 0, 'cancelled': 0}
+
+    @classmethod
+    def from_env(cls, api_provider: str, **kwargs) -> 'HedgedLLMHealthChatbot':
+        """Build from LLM_HEDGE_PROVIDER, LLM_HEDGE_DELAY, LLM_HEDGE_ADAPTIVE and LLM_HEDGE_PREMIUM_CLIENTS"""
+        premium_clients = os.getenv("LLM_HEDGE_PREMIUM_CLIENTS", "")
+        return cls(
+            api_provider=api_provider,
+            secondary_provider=os.getenv("LLM_HEDGE_PROVIDER", "gemini"),
+            hedge_delay=float(os.getenv("LLM_HEDGE_DELAY", "2.0")),
+            adaptive=os.getenv("LLM_HEDGE_ADAPTIVE", "1").lower() in ("1", "true", "yes"),
+            premium_clients=[client.strip() for client in premium_clients.split(',') if client.strip()],
+            **kwargs
+        )
+
+    def current_hedge_delay(self) -> float:
+        """Hedge delay in seconds: the primary's p95 once enough samples exist, else the configured delay"""
+        histogram = self.latency[self.api_provider]
+        if not self.adaptive or histogram.count < self.MIN_ADAPTIVE_SAMPLES:
+            return self.hedge_delay
+        p95 = histogram.percentile(95)
+        return min(self.max_hedge_delay, max(self.min_hedge_delay, p95))
+
+    async def get_bot_response(self, user_input: str, session_id: Optional[str] = None,
+                               client_id: Optional[str] = None, premium: bool = False) -> str:
+        """
+        Main method to get chatbot response with safety checks
+
+        Args:
+            user_input: The user's message
+            session_id: Conversation id; earlier turns are remembered and sent to the LLM
+            client_id: Caller identity (e.g. IP address) for per-client rate limits
+            premium: If True, query both providers immediately (as for the configured premium clients)
+
+        Returns:
+            Appropriate bot response
+        """
+        premium = premium or client_id in self.premium_clients
+        with self.tracer.span('get_bot_response', provider=self.api_provider, premium=premium) as span:
+            decision, local_response = self._route_locally(user_input, session_id)
+            if local_response:
+                span.set('route', decision.route)
+                self._remember(session_id, user_input, local_response, decision)
+                return local_response
+
+            span.set('route', 'llm')
+            history = self._session_history(user_input, session_id)
+            response = await self.get_llm_response(user_input, history, client_id, premium=premium)
+            self._remember(session_id, user_input, response)
+            return response
+
+    async def get_llm_response(self, user_input: str, history: Sequence[Turn] = (), client_id: Optional[str] = None,
+                               premium: bool = False) -> str:
+        """
+        Get a hedged response from the providers
+
+        Args:
+            user_input: The user's health question
+            history: Earlier turns of the conversation to send along
+            client_id: Caller identity for per-client rate limits
+            premium: If True, skip the hedge delay
+
+        Returns:
+            AI-generated response
+        """
+        precomputed = self._get_precomputed_response(user_input, history)
+        if precomputed is not None:
+            return precomputed
+
+        return await self._get_provider_response(user_input, history, client_id, premium=premium)
+
+    async def _fetch_provider_response(self, user_input: str, history: Sequence[Turn], deadline: float,
+                                       premium: bool = False) -> str:
+        """Race the providers and cache the winning answer (a hedged request counts once against the rate limits)"""
+        response, provider = await self._hedged_call(user_input, premium, deadline, history)
+        self.tracer.annotate(winner=provider)
+        self._store_response(user_input, response, history)
+        return response
+
+    async def _timed_call(self, bot: AsyncLLMHealthChatbot, user_input: str, deadline: float,
+                          history: Sequence[Turn] = (), censor_at: float = 0.0) -> Tuple[str, str]:
+        """
+        Call one provider and record its latency
+
+        A call cancelled before it finished (it lost the race, or the request
+        went away) is recorded as lasting at least `censor_at`, since it would
+        have taken longer still. Leaving slow primaries out would bias the p95
+        behind the hedge delay low, and hedging would then fire more and more.
+        Failed calls are not recorded.
+        """
+        started = time.perf_counter()
+        try:
+            response = await bot._call_provider(user_input, deadline, history)
+        except asyncio.CancelledError:
+            self.latency[bot.api_provider].record(max(time.perf_counter() - started, censor_at))
+            raise
+        self.latency[bot.api_provider].record(time.perf_counter() - started)
+        return response, bot.api_provider
+
+    async def _hedged_call(self, user_input: str, premium: bool, deadline: float,
+                           history: Sequence[Turn] = ()) -> Tuple[str, str]:
+        """
+        Race the providers and return (response, provider) of the first success
+
+        Both calls share the request's deadline. A primary rejected by its circuit
+        breaker fails instantly, so the secondary is tried without waiting.
+        """
+        self.stats['requests'] += 1
+        hedge_delay = self.current_hedge_delay()
+        delay = 0.0 if premium else hedge_delay
+        primary = asyncio.ensure_future(self._timed_call(self, user_input, deadline, history, censor_at=hedge_delay))
+        if not self.secondary.api_available:
+            return await primary
+
+        pending = {primary}
+        error: Optional[BaseException] = None
+        try:
+            done, pending = await asyncio.wait(pending, timeout=delay)
+            if primary in done and primary.exception() is None:
+                self.stats['primary_wins'] += 1
+                return primary.result()
+
+            self.stats['hedged'] += 1
+            self.tracer.annotate(hedged=True)
+            pending = {primary, asyncio.ensure_future(self._timed_call(self.secondary, user_input, deadline, history))}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                        continue
+                    winner = 'primary_wins' if task is primary else 'secondary_wins'
+                    self.stats[winner] += 1
+                    return task.result()
+            raise error
+        finally:
+            # Also reached when the request itself is cancelled, even during the hedge delay
+            for task in pending:
+                task.cancel()
+                self.stats['cancelled'] += 1
+
+    def get_hedge_stats(self) -> dict:
+        """Hedging counters, per-provider latency and the current hedge delay"""
+        return {
+            'primary': self.api_provider,
+            'secondary': self.secondary.api_provider,
+            'secondary_available': self.secondary.api_available,
+            'hedge_delay': self.current_hedge_delay(),
+            'counters': dict(self.stats),
+            'latency': {provider: histogram.snapshot() for provider, histogram in self.latency.items()},
+        }
+
+    async def aclose(self) -> None:
+        await super().aclose()
+        await self.secondary.aclose()
@@ -0,0 +1,251 @@
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from latency import LatencyHistogram, default_buckets
+
+
+class Message(NamedTuple):
+    """A user message, lower-cased once for every rule, with its conversation context"""
+    text: str
+    lower: str
+    # Decision behind the bot's previous answer in this conversation
+    previous: Optional['RouteDecision'] = None
+    # True when the conversation is tracked, so `previous` is meaningful
+    stateful: bool = False
+
+    @classmethod
+    def from_text(cls, text: str, previous: Optional['RouteDecision'] = None, stateful: bool = False) -> 'Message':
+        return cls(text, text.lower(), previous, stateful)
+
+
+class RouteDecision(NamedTuple):
+    """The route chosen for a message and the slots its rule captured"""
+    route: str
+    slots: Dict[str, Any]
+
+
+# A rule returns the captured slots when it matches, or None
+Matcher = Callable[[Message], Optional[Dict[str, Any]]]
+Handler = Callable[[RouteDecision], str]
+
+
+class Route(NamedTuple):
+    name: str
+    priority: int
+    match: Matcher
+    handler: Handler
+
+
+BMI_PATTERN = re.compile(r'\b(bmi|body mass index)\b')
+# Patterns like "175 cm" or "1.75 m" and "70 kg"
+HEIGHT_PATTERN = re.compile(r'(\d+(?:\.\d+)?)\s*(cm|centimeters?|m|meters?)')
+WEIGHT_PATTERN = re.compile(r'(\d+(?:\.\d+)?)\s*(kg|kilograms?)')
+
+# 5 or 6 digit numbers (e.g., 226016, 90210)
+ZIP_PATTERN = re.compile(r'\b(\d{5,6})\b')
+LOCATION_PATTERN = re.compile(r'\b(?:in|at|near|my city is)\s+([a-zA-Z\s]+)')
+FACILITY_PATTERN = re.compile(r'\b(hospital|clinic|doctor|medical center|emergency room)\b')
+SEARCH_PATTERN = re.compile(r'\b(find|search|where|nearest|nearby)\b')
+# A bare place name (up to three words) answering "Which city?"
+PLACE_PATTERN = re.compile(r'^[a-z]{3,}(?: [a-z]+){0,2}$')
+# Words that show a short reply is not a place name ("I feel awful", "no thanks")
+NOT_PLACE_WORDS = frozenset(['i', 'im', 'my', 'me', 'you', 'it', 'is', 'am', 'are', 'feel', 'have', 'what', 'how',
+                             'why', 'no', 'yes', 'not', 'dont', 'thanks', 'thank', 'ok', 'okay', 'please', 'help'])
+# "in pain", "in bed", ... are not locations
+NOT_LOCATIONS = frozenset(['pain', 'trouble', 'danger', 'bed', 'hospital', 'clinic', 'emergency', 'need',
+                           'love', 'doubt', 'general', 'particular', 'mind', 'fact'])
+
+
+def _awaiting(message: Message, route: str, slots: Tuple[str, ...]) -> bool:
+    """True if the previous answer was `route` still asking for one of `slots`"""
+    previous = message.previous
+    return previous is not None and previous.route == route and any(previous.slots.get(slot) is None for slot in slots)
+
+
+def match_bmi(message: Message) -> Optional[Dict[str, Any]]:
+    """
+    BMI rule
+
+    A message without "BMI" still matches when it answers the bot's request for
+    height/weight; values given earlier in the conversation are kept.
+
+    Returns:
+        None if BMI is not mentioned, else slots 'height' (cm) and 'weight' (kg),
+        either of which is None when missing from the message
+    """
+    mentioned = BMI_PATTERN.search(message.lower) is not None
+    follow_up = _awaiting(message, 'bmi', ('height', 'weight'))
+    if not mentioned and not follow_up:
+        return None
+
+    height_match = HEIGHT_PATTERN.search(message.lower)
+    weight_match = WEIGHT_PATTERN.search(message.lower)
+    height = weight = None
+    if height_match:
+        height = float(height_match.group(1))
+        unit = height_match.group(2)
+        # Convert height to cm if in meters
+        if 'm' in unit and 'cm' not in unit:
+            height *= 100
+    if weight_match:
+        weight = float(weight_match.group(1))
+    if follow_up:
+        if not mentioned and height is None and weight is None:
+            return None
+        height = height if height is not None else message.previous.slots.get('height')
+        weight = weight if weight is not None else message.previous.slots.get('weight')
+    return {'height': height, 'weight': weight}
+
+
+def match_hospital(message: Message) -> Optional[Dict[str, Any]]:
+    """
+    Hospital finder rule
+
+    Returns:
+        None if the message is not about finding a facility, else slots 'zip' and
+        'city' (both None when the user still has to say where they are)
+    """
+    # A zip code is a strong signal, e.g. the answer to "which zip code?"
+    zip_match = ZIP_PATTERN.search(message.text)
+    if zip_match:
+        return {'zip': zip_match.group(1), 'city': None}
+
+    location_match = LOCATION_PATTERN.search(message.lower)
+    if FACILITY_PATTERN.search(message.lower):
+        # "Hospital in London"
+        if location_match:
+            return {'zip': None, 'city': location_match.group(1).strip()}
+        # "Find a hospital": ask for the location
+        if SEARCH_PATTERN.search(message.lower):
+            return {'zip': None, 'city': None}
+
+    # "I am in London" as the answer to "Which city?". Without conversation
+    # state any "in <place>" is taken as such an answer.
+    awaiting = _awaiting(message, 'hospital', ('zip', 'city'))
+    if message.stateful and not awaiting:
+        return None
+    if location_match:
+        location = location_match.group(1).strip()
+        if location not in NOT_LOCATIONS and len(location) > 2:
+            return {'zip': None, 'city': location}
+    elif awaiting:
+        place = ' '.join(message.lower.strip(' .!').split())
+        if PLACE_PATTERN.match(place) and place not in NOT_LOCATIONS and NOT_PLACE_WORDS.isdisjoint(place.split()):
+            return {'zip': None, 'city': place}
+    return None
+
+
+class IntentRouter:
+    """
+    Ordered table of local routes
+
+    The message is normalized once and each rule is tried in priority order
+    (lowest first). The first rule that matches decides the route and its
+    handler builds the answer. Hits and handling time are recorded per route;
+    with a recording tracer each rule tried also gets its own span.
+    """
+
+    def __init__(self, tracer=None):
+        self.tracer = tracer
+        self._routes: List[Route] = []
+        self._lock = threading.Lock()
+        self.hits: Dict[str, int] = {}
+        self.timings: Dict[str, LatencyHistogram] = {}
+        self.misses = 0
+        self.miss_timing = self._histogram()
+
+    @staticmethod
+    def _histogram() -> LatencyHistogram:
+        return LatencyHistogram(default_buckets(start=0.000001, stop=1.0))
+
+    def add_route(self, name: str, match: Matcher, handler: Handler, priority: int = 100) -> 'IntentRouter':
+        """
+        Register a route (replacing any route with the same name)
+
+        Args:
+            name: Route name used in decisions and statistics
+            match: Rule returning captured slots, or None if it does not apply
+            handler: Builds the response from the decision
+            priority: Lower values are tried first; ties keep registration order
+        """
+        with self._lock:
+            routes = [route for route in self._routes if route.name != name]
+            routes.append(Route(name, priority, match, handler))
+            routes.sort(key=lambda route: route.priority)
+            self._routes = routes
+            self.hits.setdefault(name, 0)
+            self.timings.setdefault(name, self._histogram())
+        return self
+
+    def remove_route(self, name: str) -> None:
+        with self._lock:
+            self._routes = [route for route in self._routes if route.name != name]
+
+    @property
+    def route_names(self) -> List[str]:
+        return [route.name for route in self._routes]
+
+    def _first_match(self, message: Message) -> Optional[Tuple[Route, RouteDecision]]:
+        if self.tracer is not None and self.tracer.recording:
+            return self._first_match_traced(message)
+        for route in self._routes:
+            slots = route.match(message)
+            if slots is not None:
+                return route, RouteDecision(route.name, slots)
+        return None
+
+    def _first_match_traced(self, message: Message) -> Optional[Tuple[Route, RouteDecision]]:
+        for route in self._routes:
+            with self.tracer.span(f"route.{route.name}") as span:
+                slots = route.match(message)
+                span.set('matched', slots is not None)
+            if slots is not None:
+                return route, RouteDecision(route.name, slots)
+        return None
+
+    def decide(self, user_input: str, previous: Optional[RouteDecision] = None,
+               stateful: bool = False) -> Optional[RouteDecision]:
+        """Routing decision for a message without running its handler (None if no route matches)"""
+        match = self._first_match(Message.from_text(user_input, previous, stateful))
+        return match[1] if match else None
+
+    def dispatch(self, user_input: str, previous: Optional[RouteDecision] = None,
+                 stateful: bool = False) -> Tuple[Optional[RouteDecision], Optional[str]]:
+        """
+        Route a message and run the matching handler
+
+        Args:
+            user_input: The user's message
+            previous: Decision behind the previous answer in the conversation
+            stateful: True if the conversation is tracked (see Message)
+
+        Returns:
+            (decision, response), or (None, None) if no route matches
+        """
+        started = time.perf_counter()
+        match = self._first_match(Message.from_text(user_input, previous, stateful))
+        if match is None:
+            self.miss_timing.record(time.perf_counter() - started)
+            self.misses += 1
+            return None, None
+
+        route, decision = match
+        if self.tracer is not None:
+            with self.tracer.span(f"handler.{route.name}"):
+                response = route.handler(decision)
+        else:
+            response = route.handler(decision)
+        self.timings[route.name].record(time.perf_counter() - started)
+        self.hits[route.name] += 1
+        return decision, response
+
+    def get_stats(self) -> dict:
+        """Hits and handling time (seconds) per route, plus unrouted messages"""
+        routes = {name: {'hits': self.hits[name], 'latency': self.timings[name].snapshot()}
+                  for name in self.route_names}
+        return {
+            'routes': routes,
+            'unrouted': {'count': self.misses, 'latency': self.miss_timing.snapshot()},
+        }
@@ -0,0 +1,127 @@
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Inflections a keyword may carry and still count as a whole-word match,
+# e.g. "hurt" -> "hurts", "cough" -> "coughing", "stomach" -> "stomachache"
+DEFAULT_SUFFIXES = ('s', 'es', 'd', 'ed', 'ing', 'ness', 'ache', 'aches')
+
+# Categories whose keywords also match as the start of a longer word
+# ("health" -> "healthy", "pain" -> "painful", "fever" -> "feverish")
+DEFAULT_PREFIX_CATEGORIES = ('emergency', 'health', 'symptom')
+
+
+class KeywordMatcher:
+    """Aho-Corasick automaton that finds every categorized keyword in one pass"""
+
+    def __init__(self, suffixes: Iterable[str] = DEFAULT_SUFFIXES,
+                 prefix_categories: Iterable[str] = DEFAULT_PREFIX_CATEGORIES):
+        """
+        Initialize an empty matcher
+
+        Args:
+            suffixes: Word endings allowed after a keyword before the word boundary
+            prefix_categories: Categories matched at the start of any word, whatever its ending
+        """
+        self.suffixes = frozenset(suffixes)
+        self.prefix_categories = frozenset(prefix_categories)
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[Tuple[int, str, str, bool]]] = [[]]
+        self._built = False
+        self.keyword_count = 0
+
+    def add(self, keyword: str, category: str, value: Optional[str] = None) -> None:
+        """
+        Register a keyword under a category
+
+        Args:
+            keyword: Phrase to look for (matched case-insensitively)
+            category: Group the match is reported under, e.g. "emergency"
+            value: Value reported for the match (defaults to the keyword itself)
+        """
+        keyword = keyword.lower()
+        state = 0
+        for char in keyword:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = next_state
+        whole_word = category not in self.prefix_categories
+        self._output[state].append((len(keyword), category, value or keyword, whole_word))
+        self.keyword_count += 1
+        self._built = False
+
+    def add_many(self, keywords: Iterable[str], category: str, value: Optional[str] = None) -> None:
+        """Register several keywords under the same category (and value)"""
+        for keyword in keywords:
+            self.add(keyword, category, value)
+
+    def build(self) -> 'KeywordMatcher':
+        """Compute failure links; must be called after the last add()"""
+        queue = deque()
+        for state in self._goto[0].values():
+            self._fail[state] = 0
+            queue.append(state)
+
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                # Inherit matches ending at the failure state (suffix keywords)
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+        self._built = True
+        return self
+
+    def _ends_word(self, text: str, end: int) -> bool:
+        """Check that a match ending at `end` finishes a word (optionally via a suffix)"""
+        if end == len(text) or not text[end].isalnum():
+            return True
+        word_end = end
+        while word_end < len(text) and text[word_end].isalnum():
+            word_end += 1
+        return text[end:word_end] in self.suffixes
+
+    def scan(self, text: str) -> Dict[str, List[str]]:
+        """
+        Find all keywords in a single pass over the lowercased text
+
+        Args:
+            text: Input text
+
+        Returns:
+            Mapping of category to matched values, in order of first appearance
+        """
+        if not self._built:
+            self.build()
+
+        text = text.lower()
+        goto, fail, output = self._goto, self._fail, self._output
+        matches: Dict[str, List[str]] = {}
+        state = 0
+
+        for i, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+
+            for length, category, value, whole_word in output[state]:
+                start = i - length + 1
+                # Word-boundary check: "hot" must not match inside "photo"
+                if start > 0 and text[start - 1].isalnum():
+                    continue
+                if whole_word and not self._ends_word(text, i + 1):
+                    continue
+                found = matches.setdefault(category, [])
+                if value not in found:
+                    found.append(value)
+
+        return matches
@@ -0,0 +1,76 @@
+import bisect
+import threading
+from typing import Dict, List, Optional
+
+
+def default_buckets(start: float = 0.005, stop: float = 60.0, factor: float = 1.25) -> List[float]:
+    """Geometric bucket upper bounds (seconds), fine enough for percentile estimates"""
+    buckets = []
+    bound = start
+    while bound < stop:
+        buckets.append(round(bound, 6))
+        bound *= factor
+    buckets.append(stop)
+    return buckets
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram with percentile estimation"""
+
+    def __init__(self, buckets: Optional[List[float]] = None):
+        """
+        Initialize an empty histogram
+
+        Args:
+            buckets: Sorted bucket upper bounds in seconds (an overflow bucket is added)
+        """
+        self.buckets = list(buckets or default_buckets())
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        """Add one observation"""
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += seconds
+
+    def percentile(self, q: float) -> Optional[float]:
+        """
+        Estimate a percentile by interpolating within the matching bucket
+
+        Args:
+            q: Percentile between 0 and 100
+
+        Returns:
+            Latency in seconds, or None if nothing was recorded
+        """
+        with self._lock:
+            counts = list(self.counts)
+            count = self.count
+        if not count:
+            return None
+
+        rank = q / 100 * count
+        seen = 0
+        for index, bucket_count in enumerate(counts):
+            if bucket_count and seen + bucket_count >= rank:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return self.buckets[-1]
+
+    def snapshot(self) -> Dict[str, Optional[float]]:
+        """Count, mean and common percentiles (seconds)"""
+        mean = self.total / self.count if self.count else None
+        return {
+            'count': self.count,
+            'mean': mean,
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+            'p99': self.percentile(99),
+        }
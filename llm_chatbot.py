@@ -1,8 +1,25 @@
+import importlib.util
 import os
 import re
-from typing import Dict, Optional
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from contextvars import copy_context
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
 import json
 
+from canned_responses import canned_table, render_fallback_html
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from intent_router import IntentRouter, Message, RouteDecision, match_bmi, match_hospital
+from keyword_matcher import KeywordMatcher
+from metrics import ADMISSIONS, EMERGENCIES, FALLBACKS, LLM_LATENCY, STAGE_LATENCY
+from rate_limiter import Admission, AdmissionController, RateLimitedError
+from response_cache import ResponseCache, make_cache_key, normalize_question, prompt_hash
+from session_store import SessionStore, Turn
+from single_flight import SingleFlight
+from token_accounting import TokenLedger, TokenUsage, estimate_tokens, gemini_usage, openai_usage
+from tracing import Tracer, default_tracer
+
 # Uncomment the API you want to use:
 # Option 1: OpenAI
 # import openai
@@ -10,6 +27,38 @@ import json
 # Option 2: Google Gemini
 # import google.generativeai as genai
 
+
+def build_keyword_matcher(emergency_keywords, health_keywords, symptom_patterns,
+                          body_parts, pain_words) -> KeywordMatcher:
+    """Compile every keyword list used for routing into one automaton"""
+    matcher = KeywordMatcher()
+    matcher.add_many(emergency_keywords, 'emergency')
+    matcher.add_many(health_keywords, 'health')
+    for symptom_key, patterns in symptom_patterns.items():
+        matcher.add_many(patterns, 'symptom', symptom_key)
+    matcher.add_many(body_parts, 'body_part')
+    matcher.add_many(pain_words, 'pain')
+    return matcher.build()
+
+
+# Threads that run blocking provider calls, so a caller can stop waiting at its deadline
+LLM_CALL_THREADS = int(os.getenv("LLM_CALL_THREADS", "64"))
+_provider_pool: Optional[ThreadPoolExecutor] = None
+_provider_pool_pid: Optional[int] = None
+_provider_pool_lock = threading.Lock()
+
+
+def provider_call_pool() -> ThreadPoolExecutor:
+    """Process-wide pool for provider calls (recreated after fork, since threads do not survive it)"""
+    global _provider_pool, _provider_pool_pid
+    if _provider_pool_pid != os.getpid():
+        with _provider_pool_lock:
+            if _provider_pool_pid != os.getpid():
+                _provider_pool = ThreadPoolExecutor(max_workers=LLM_CALL_THREADS, thread_name_prefix='llm-call')
+                _provider_pool_pid = os.getpid()
+    return _provider_pool
+
+
 class LLMHealthChatbot:
     """Enhanced Healthcare Chatbot with LLM Integration"""
     
@@ -22,6 +71,50 @@ class LLMHealthChatbot:
         'allergic reaction', 'anaphylaxis', 'broken bone', 'severe burn'
     ]
     
+    # Keywords that mark a message as health-related
+    HEALTH_KEYWORDS = [
+        # Symptoms
+        'pain', 'hurt', 'ache', 'sore', 'tired', 'fatigue', 'dizzy', 'nausea',
+        'fever', 'cough', 'cold', 'flu', 'sick', 'ill', 'symptom',
+        # Body parts
+        'head', 'eye', 'eyes', 'ear', 'nose', 'throat', 'chest', 'stomach',
+        'knee', 'back', 'hand', 'foot', 'neck', 'shoulder', 'arm', 'leg',
+        # Medical terms
+        'medicine', 'medication', 'doctor', 'hospital', 'health', 'medical',
+        'treatment', 'diagnosis', 'disease', 'condition', 'injury',
+        # Wellness
+        'sleep', 'diet', 'exercise', 'wellness', 'nutrition', 'mental', 'stress',
+        'anxiety', 'depression', 'weight', 'fitness',
+        # Sensations
+        'blurred', 'vision', 'strain', 'swelling', 'redness', 'numbness',
+        'tingling', 'burning', 'itching', 'bleeding'
+    ]
+    
+    # Phrases mapped to FALLBACK_RESPONSES keys, in priority order
+    SYMPTOM_PATTERNS = {
+        'headache': ['headache', 'head pain', 'head ache', 'head hurts', 'migraine'],
+        'cough': ['cough', 'coughing'],
+        'stomach': ['stomach', 'belly', 'tummy', 'abdominal', 'nausea', 'vomit'],
+        'dizzy': ['dizzy', 'dizziness', 'lightheaded', 'vertigo'],
+        'fever': ['fever', 'temperature', 'hot', 'chills'],
+        'cold': ['cold', 'flu', 'runny nose', 'sneezing', 'congestion'],
+        'sore throat': ['sore throat', 'throat hurt', 'throat pain', 'swallow hurt'],
+        'knee': ['knee'],
+        'tired eyes': ['tired eye', 'eye strain', 'eyes tired', 'eyes feel tired', 'eye fatigue'],
+        'dry eyes': ['dry eye', 'eyes dry', 'dryness in eye', 'keep eyes hydrated', 'hydrate eyes'],
+        'eye pain': ['eye pain', 'eye hurt', 'pain in eye', 'eyes hurt', 'hurting eyes'],
+        'back': ['back pain', 'back hurt', 'back ache', 'lower back', 'upper back']
+    }
+    
+    # Body parts without a fallback entry; these are left to the LLM
+    BODY_PARTS = ['hand', 'ear', 'neck', 'shoulder', 'ankle', 'wrist', 'hip', 'elbow', 'foot']
+    PAIN_WORDS = ['pain', 'hurt', 'ache', 'sore', 'tired', 'strain', 'stiff']
+    
+    # Single-pass automaton over all of the keyword lists above
+    KEYWORD_MATCHER = build_keyword_matcher(
+        EMERGENCY_KEYWORDS, HEALTH_KEYWORDS, SYMPTOM_PATTERNS, BODY_PARTS, PAIN_WORDS
+    )
+    
     # Common health symptoms with fallback responses
     FALLBACK_RESPONSES = {
         'headache': {
@@ -218,6 +311,32 @@ class LLMHealthChatbot:
         }
     }
     
+    # Follow-ups exempt from the health keyword check: short, and referring back to the conversation
+    FOLLOW_UP_MAX_WORDS = 8
+    FOLLOW_UP_PATTERN = re.compile(
+        r"^\s*(?:and|but|also|so|what about|how about|what if)\b|\b(?:it|its|it's|that|this|these|those|they|them)\b",
+        re.IGNORECASE
+    )
+    
+    # Fixed answers
+    EMERGENCY_RESPONSE = """🚨 <strong>MEDICAL EMERGENCY DETECTED</strong> 🚨<br><br>This sounds like a serious medical emergency. I cannot provide diagnosis or treatment advice for this situation.<br><br><strong>IMMEDIATE ACTION REQUIRED:</strong><ul><li>📞 Call 911 (or your local emergency number) RIGHT NOW</li><li>🏥 Or go to the nearest Emergency Room immediately</li></ul>Do not wait. Do not delay. Your safety is the top priority.<br><br>If you're having a medical emergency, please put down your device and call for help immediately."""
+    GENERIC_HEALTH_RESPONSE = """Thank you for your health question. While I can provide general information, I'd like to help you better.<br><br><strong>Could you tell me more about:</strong><ul><li>What specific symptoms are you experiencing?</li><li>When did they start?</li><li>How severe are they on a scale of 1-10?</li></ul><strong>Common topics I can help with:</strong><ul><li>Headaches, coughs, colds, and flu symptoms</li><li>Stomach issues and digestive health</li><li>Fever and sore throat</li><li>General wellness and prevention tips</li><li>Home remedies for minor ailments</li></ul>Please describe your symptoms in more detail, and I'll provide specific advice, actionable tips, and home remedies.<br><br><em>⚠️ I am an AI, not a doctor. For serious concerns or symptoms that persist, please consult a medical professional.</em>"""
+    OFF_TOPIC_RESPONSE = "I can only assist with health-related questions. Please ask about symptoms, wellness, medications, or medical topics."
+    ERROR_RESPONSE = "I apologize, but I encountered an error processing your request. Please try again or consult a healthcare professional."
+    BMI_PROMPT = "Sure, I can calculate your BMI. Please tell me your <strong>height</strong> (in cm or m) and <strong>weight</strong> (in kg).<br>Example: <em>'I am 175cm tall and weigh 70kg'</em>"
+    HOSPITAL_PROMPT = "I can help you find a nearby medical facility. <strong>Which city or zip code are you currently in?</strong>"
+    
+    # Rendered and encoded once at class load; fallback mode only does dictionary lookups
+    CANNED_RESPONSES = canned_table({
+        'emergency': EMERGENCY_RESPONSE,
+        'generic_health': GENERIC_HEALTH_RESPONSE,
+        'off_topic': OFF_TOPIC_RESPONSE,
+        'error': ERROR_RESPONSE,
+        'bmi_prompt': BMI_PROMPT,
+        'hospital_prompt': HOSPITAL_PROMPT,
+    })
+    FALLBACK_HTML = canned_table({key: render_fallback_html(data) for key, data in FALLBACK_RESPONSES.items()})
+    
     SYSTEM_PROMPT = """You are a knowledgeable, empathetic, and cautious AI health assistant specialized in providing symptom-specific advice. Your role is to provide general health information while prioritizing user safety and accuracy.
 
 CRITICAL INSTRUCTION - CONTEXTUAL ACCURACY:
@@ -288,7 +407,44 @@ MANDATORY SAFETY RULES:
 
 TEMPERATURE CONTROL: This prompt is designed to work with temperature=0.3 for focused, accurate responses."""
 
-    def __init__(self, api_provider: str = "openai", api_key: Optional[str] = None, use_fallback: bool = True):
+    # Same rules and answer format without the few-shot examples (about a third of the tokens)
+    COMPACT_SYSTEM_PROMPT = """You are a knowledgeable, empathetic and cautious AI health assistant giving general, symptom-specific health information. Prioritize user safety and accuracy.
+
+Answer ONLY about the exact symptom or body part the user mentions (for "knee pain", talk only about knees). Treat any pain, sensory, respiratory, digestive or general symptom as a valid health query.
+
+Use HTML: <strong> for headers, <ul>/<li> for lists, <br> for line breaks. Structure:
+1. "I understand you are experiencing [EXACT SYMPTOM]."
+2. <strong>Potential Causes:</strong> 2-4 common non-emergency causes for that symptom.
+3. <strong>Home Remedies:</strong> 2-3 remedies specific to it (e.g. R.I.C.E for knee pain, the 20-20-20 rule for tired eyes, ginger tea for stomach discomfort).
+4. <strong>When to See a Doctor:</strong> 2-3 red flags for that condition.
+
+Medication: only common over-the-counter remedies for mild symptoms (e.g. Paracetamol/Acetaminophen, Ibuprofen, Antacids). Every medication mention must end with: "Please read the label carefully and consult a pharmacist, especially if you have allergies or are on other medications."
+BMI: with height and weight, compute Weight(kg) / Height(m)^2 and give the category: Underweight (<18.5), Normal (18.5-24.9), Overweight (25-29.9), Obese (30+). Without them, ask: "Sure, please tell me your height (in cm or m) and weight (in kg)."
+Clinics: with a city, link https://www.google.com/maps/search/hospitals+near+[City]. Without one, ask: "Which city or zip code are you currently in?"
+
+MANDATORY SAFETY RULES:
+1. NEVER diagnose specific medical conditions
+2. NEVER recommend prescription medications or dosages
+3. ALWAYS end with disclaimer: "⚠️ I am an AI, not a doctor. Please consult a medical professional for proper diagnosis and treatment."
+4. For non-health questions, respond: "I can only assist with health-related questions. Please ask about symptoms, wellness, or medical topics.\""""
+
+    # Prompt variants selectable per deployment (LLM_PROMPT)
+    SYSTEM_PROMPTS = {
+        'full': SYSTEM_PROMPT,
+        'compact': COMPACT_SYSTEM_PROMPT,
+    }
+
+    # Default model per provider
+    DEFAULT_MODELS = {
+        "openai": "gpt-3.5-turbo",  # or "gpt-4" for better quality
+        "gemini": "gemini-flash-latest",  # latest flash model alias
+    }
+
+    def __init__(self, api_provider: str = "openai", api_key: Optional[str] = None, use_fallback: bool = True,
+                 response_cache: Optional[ResponseCache] = None, semantic_cache=None,
+                 prompt_variant: Optional[str] = None, token_ledger: Optional[TokenLedger] = None,
+                 session_store: Optional[SessionStore] = None, tracer: Optional[Tracer] = None,
+                 admission: Optional[AdmissionController] = None, single_flight: Optional[SingleFlight] = None):
         """
         Initialize the LLM Health Chatbot
         
@@ -296,10 +452,51 @@ TEMPERATURE CONTROL: This prompt is designed to work with temperature=0.3 for fo
             api_provider: Either "openai" or "gemini"
             api_key: API key for the chosen provider (or set via environment variable)
             use_fallback: If True, use fallback responses when API is unavailable
+            response_cache: Cache for LLM answers (defaults to one configured from environment)
+            semantic_cache: Optional SemanticCache for paraphrased questions (enabled via SEMANTIC_CACHE)
+            prompt_variant: Key of SYSTEM_PROMPTS (defaults to LLM_PROMPT, else "full")
+            token_ledger: Token and cost accounting (defaults to one configured from environment)
+            session_store: Conversation memory (defaults to one configured from environment)
+            tracer: Per-request tracing (defaults to the process tracer configured from TRACING)
+            admission: Rate limits for provider calls (defaults to one configured from RATE_LIMIT_*)
+            single_flight: Coalescing of identical in-flight questions (defaults to one configured from SINGLE_FLIGHT*)
         """
         self.api_provider = api_provider.lower()
         self.use_fallback = use_fallback
         self.api_available = False
+        self._client = None
+        self._client_lock = threading.Lock()
+        self._last_scan = (None, {})
+        self.tracer = tracer if tracer is not None else default_tracer()
+        self.router = self.build_router()
+        self.model_name = self.DEFAULT_MODELS.get(self.api_provider)
+        self.prompt_variant = prompt_variant or os.getenv("LLM_PROMPT", "full")
+        if self.prompt_variant not in self.SYSTEM_PROMPTS:
+            raise ValueError(f"Unknown prompt variant '{self.prompt_variant}'. Choose from: {', '.join(self.SYSTEM_PROMPTS)}")
+        self.system_prompt = self.SYSTEM_PROMPTS[self.prompt_variant]
+        self.token_ledger = token_ledger if token_ledger is not None else TokenLedger.from_env()
+        self.session_store = session_store if session_store is not None else SessionStore.from_env()
+        # Gemini context cache holding the system prompt (GEMINI_CONTEXT_CACHE)
+        self._context_cache = None
+        self._context_cache_refresh_at = 0.0
+        # True when Gemini is reached over REST (LLM_BASE_URL), which has no async transport
+        self._gemini_rest = False
+        # Total time budget for one LLM answer; the breaker short-circuits failing providers
+        self.request_timeout = float(os.getenv("LLM_TIMEOUT", "20"))
+        self.circuit_breaker = CircuitBreaker.for_provider(self.api_provider)
+        # Per-client and global token buckets in front of the provider (None when unlimited)
+        self.admission = admission if admission is not None else AdmissionController.from_env()
+        # Concurrent identical questions share one provider call (None when disabled)
+        self.single_flight = single_flight if single_flight is not None else SingleFlight.from_env()
+        # Metric children bound once, so recording is a plain addition
+        self._stage_latency = {stage: STAGE_LATENCY.labels(stage) for stage in ('local_routing', 'precheck', 'fallback')}
+        self._llm_latency = {outcome: LLM_LATENCY.labels(self.api_provider, outcome) for outcome in ('success', 'error')}
+        self.response_cache = response_cache if response_cache is not None else ResponseCache.from_env()
+        if semantic_cache is None and os.getenv("SEMANTIC_CACHE"):
+            # Imported lazily: NumPy is only needed when the semantic cache is enabled
+            from semantic_cache import SemanticCache
+            semantic_cache = SemanticCache.from_env()
+        self.semantic_cache = semantic_cache
         
         if api_key:
             self.api_key = api_key
@@ -319,7 +516,11 @@ TEMPERATURE CONTROL: This prompt is designed to work with temperature=0.3 for fo
                 self.api_available = False
         else:
             try:
-                self._initialize_client()
+                # The SDK import is the slowest part of startup, so the client is
+                # created on the first provider call (eagerly when fallback is off)
+                self._check_sdk_installed()
+                if not use_fallback:
+                    self._initialize_client()
                 self.api_available = True
             except Exception as e:
                 print(f"⚠️  Failed to initialize {api_provider} client: {e}")
@@ -329,17 +530,125 @@ TEMPERATURE CONTROL: This prompt is designed to work with temperature=0.3 for fo
                 else:
                     raise
     
+    # Module providing each provider's SDK
+    SDK_MODULES = {
+        "openai": "openai",
+        "gemini": "google.generativeai",
+    }
+    
+    def _check_sdk_installed(self):
+        """Raise ImportError if the provider SDK is missing, without importing it"""
+        module = self.SDK_MODULES[self.api_provider]
+        try:
+            spec = importlib.util.find_spec(module)
+        except ModuleNotFoundError:
+            spec = None
+        if spec is None:
+            raise ImportError(f"No module named '{module}'")
+    
+    @property
+    def client(self):
+        """Provider client, created on first use"""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._initialize_client()
+        return self._client
+    
+    @client.setter
+    def client(self, value):
+        self._client = value
+    
+    def _openai_client_options(self) -> dict:
+        """Keyword arguments for the OpenAI client (LLM_BASE_URL points it at another server)"""
+        # Retries would overrun the request budget; failures go to the fallback instead
+        options = {'api_key': self.api_key, 'max_retries': int(os.getenv("LLM_MAX_RETRIES", "0"))}
+        if os.getenv("LLM_BASE_URL"):
+            options['base_url'] = os.getenv("LLM_BASE_URL")
+        return options
+    
+    def _configure_gemini(self, genai) -> None:
+        """Configure the Gemini SDK; with LLM_BASE_URL it talks REST to that server (e.g. stub_llm_server.py)"""
+        self._gemini_rest = bool(os.getenv("LLM_BASE_URL"))
+        if self._gemini_rest:
+            genai.configure(api_key=self.api_key, transport='rest',
+                            client_options={'api_endpoint': os.getenv("LLM_BASE_URL")})
+        else:
+            genai.configure(api_key=self.api_key)
+    
     def _initialize_client(self):
         """Initialize the appropriate API client"""
         if self.api_provider == "openai":
             import openai
-            openai.api_key = self.api_key
-            self.client = openai
+            self.client = openai.OpenAI(**self._openai_client_options())
         elif self.api_provider == "gemini":
             import google.generativeai as genai
-            genai.configure(api_key=self.api_key)
-            # Use the latest flash model alias
-            self.client = genai.GenerativeModel('gemini-flash-latest')
+            self._configure_gemini(genai)
+            self.client = self._build_gemini_model(genai)
+    
+    def _build_gemini_model(self, genai):
+        """
+        Gemini model with the system prompt as a static prefix
+        
+        With GEMINI_CONTEXT_CACHE set, the prefix is stored once in a provider-side
+        context cache and billed at the cached rate; otherwise (or if the model or
+        prompt size does not qualify) it is sent as the system instruction.
+        """
+        if os.getenv("GEMINI_CONTEXT_CACHE"):
+            try:
+                import datetime
+                from google.generativeai import caching
+                ttl = float(os.getenv("GEMINI_CONTEXT_CACHE_TTL", "3600"))
+                self._context_cache = caching.CachedContent.create(
+                    model=f"models/{self.model_name}",
+                    display_name=f"health-chatbot-{self.prompt_variant}-{prompt_hash(self.system_prompt)}",
+                    system_instruction=self.system_prompt,
+                    ttl=datetime.timedelta(seconds=ttl),
+                )
+                self._context_cache_refresh_at = time.monotonic() + ttl / 2
+                return genai.GenerativeModel.from_cached_content(self._context_cache)
+            except Exception as e:
+                print(f"⚠️  Gemini context cache unavailable ({e}); sending the system prompt with each request.")
+                self._context_cache = None
+        return genai.GenerativeModel(self.model_name, system_instruction=self.system_prompt)
+    
+    def _refresh_context_cache(self) -> None:
+        """Extend the Gemini context cache's TTL once half of it has elapsed"""
+        if self._context_cache is None or time.monotonic() < self._context_cache_refresh_at:
+            return
+        import datetime
+        ttl = float(os.getenv("GEMINI_CONTEXT_CACHE_TTL", "3600"))
+        self._context_cache_refresh_at = time.monotonic() + ttl / 2
+        self._context_cache.update(ttl=datetime.timedelta(seconds=ttl))
+    
+    def _record_usage(self, usage: Optional[TokenUsage], user_input: str, response: str) -> dict:
+        """Account for one provider call, estimating the tokens if the provider reported none"""
+        if usage is None:
+            usage = TokenUsage(estimate_tokens(self.system_prompt) + estimate_tokens(user_input),
+                               estimate_tokens(response), 0, True)
+        return self.token_ledger.record(self.api_provider, self.model_name, usage, self.prompt_variant)
+    
+    def classify_keywords(self, user_input: str) -> Dict[str, list]:
+        """
+        Scan the message once for every keyword category
+        
+        The most recent result is kept so that detect_emergency, is_health_related
+        and detect_symptom share a single pass over the same message.
+        
+        Args:
+            user_input: The user's message
+            
+        Returns:
+            Mapping of category ("emergency", "health", "symptom", "body_part", "pain")
+            to the matched values
+        """
+        last_input, last_matches = self._last_scan
+        if last_input == user_input:
+            return last_matches
+        
+        matches = self.KEYWORD_MATCHER.scan(user_input)
+        self._last_scan = (user_input, matches)
+        return matches
     
     def detect_emergency(self, user_input: str) -> bool:
         """
@@ -351,8 +660,7 @@ TEMPERATURE CONTROL: This prompt is designed to work with temperature=0.3 for fo
         Returns:
             True if emergency keywords detected, False otherwise
         """
-        user_input_lower = user_input.lower()
-        return any(keyword in user_input_lower for keyword in self.EMERGENCY_KEYWORDS)
+        return 'emergency' in self.classify_keywords(user_input)
     
     def get_emergency_response(self) -> str:
         """
@@ -361,7 +669,7 @@ TEMPERATURE CONTROL: This prompt is designed to work with temperature=0.3 for fo
         Returns:
             Emergency response string
         """
-        return """🚨 <strong>MEDICAL EMERGENCY DETECTED</strong> 🚨<br><br>This sounds like a serious medical emergency. I cannot provide diagnosis or treatment advice for this situation.<br><br><strong>IMMEDIATE ACTION REQUIRED:</strong><ul><li>📞 Call 911 (or your local emergency number) RIGHT NOW</li><li>🏥 Or go to the nearest Emergency Room immediately</li></ul>Do not wait. Do not delay. Your safety is the top priority.<br><br>If you're having a medical emergency, please put down your device and call for help immediately."""
+        return self.EMERGENCY_RESPONSE
     
     def is_health_related(self, user_input: str) -> bool:
         """
@@ -373,63 +681,365 @@ TEMPERATURE CONTROL: This prompt is designed to work with temperature=0.3 for fo
         Returns:
             True if health-related, False otherwise
         """
-        health_keywords = [
-            # Symptoms
-            'pain', 'hurt', 'ache', 'sore', 'tired', 'fatigue', 'dizzy', 'nausea',
-            'fever', 'cough', 'cold', 'flu', 'sick', 'ill', 'symptom',
-            # Body parts
-            'head', 'eye', 'eyes', 'ear', 'nose', 'throat', 'chest', 'stomach',
-            'knee', 'back', 'hand', 'foot', 'neck', 'shoulder', 'arm', 'leg',
-            # Medical terms
-            'medicine', 'medication', 'doctor', 'hospital', 'health', 'medical',
-            'treatment', 'diagnosis', 'disease', 'condition', 'injury',
-            # Wellness
-            'sleep', 'diet', 'exercise', 'wellness', 'nutrition', 'mental', 'stress',
-            'anxiety', 'depression', 'weight', 'fitness',
-            # Sensations
-            'blurred', 'vision', 'strain', 'swelling', 'redness', 'numbness',
-            'tingling', 'burning', 'itching', 'bleeding'
-        ]
+        matches = self.classify_keywords(user_input)
+        # Symptom phrases such as "migraine" count even if no generic keyword matched
+        return 'health' in matches or 'symptom' in matches
+    
+    def is_follow_up(self, user_input: str, history: Sequence[Turn]) -> bool:
+        """
+        Determine if a message without health keywords continues a health conversation
         
-        user_input_lower = user_input.lower()
-        return any(keyword in user_input_lower for keyword in health_keywords)
+        Only short messages that refer back to the conversation ("what about at
+        night?", "is that serious?") qualify, and only when they read as a health
+        question together with the earlier user turns. The LLM then answers them
+        with the conversation as context, so fallback mode never exempts them.
+        
+        Args:
+            user_input: The user's message
+            history: Earlier turns of the conversation
+            
+        Returns:
+            True if the message may be answered as a follow-up
+        """
+        if not history or not self.api_available:
+            return False
+        if len(user_input.split()) > self.FOLLOW_UP_MAX_WORDS or not self.FOLLOW_UP_PATTERN.search(user_input):
+            return False
+        earlier = ' '.join(text for role, text in history if role == 'user')
+        return bool(earlier) and self.is_health_related(f"{earlier} {user_input}")
     
-    def get_llm_response(self, user_input: str) -> str:
+    def get_llm_response(self, user_input: str, history: Sequence[Turn] = (), client_id: Optional[str] = None) -> str:
         """
         Get response from LLM API with health validation
         
         Args:
             user_input: The user's health question
+            history: Earlier turns of the conversation to send along
+            client_id: Caller identity for per-client rate limits
             
         Returns:
             AI-generated response
         """
-        # Check if question is health-related
-        if not self.is_health_related(user_input):
-            return "I can only assist with health-related questions. Please ask about symptoms, wellness, medications, or medical topics."
+        precomputed = self._get_precomputed_response(user_input, history)
+        if precomputed is not None:
+            return precomputed
         
-        # If API is not available, use fallback
-        if not self.api_available and self.use_fallback:
-            symptom = self.detect_symptom(user_input)
-            if symptom:
-                return self.format_fallback_response(symptom)
-            else:
-                return self._get_generic_health_response(user_input)
+        return self._get_provider_response(user_input, history, client_id)
+    
+    def _get_provider_response(self, user_input: str, history: Sequence[Turn] = (),
+                               client_id: Optional[str] = None) -> str:
+        """Provider answer for one caller, or the local fallback (see _get_provider_answer)"""
+        return self._get_provider_answer(user_input, history, client_id)[0]
+    
+    def _get_provider_answer(self, user_input: str, history: Sequence[Turn] = (),
+                             client_id: Optional[str] = None) -> Tuple[str, Optional[str]]:
+        """
+        Provider answer for one caller, shared with concurrent requests for the same question
+        
+        The caller passes its own admission check first; only then may it join a
+        call already in flight. Questions are coalesced on their cache key
+        (normalized question, provider, model and prompt version); follow-ups
+        depend on their conversation and are never coalesced. Only the provider's
+        answer or failure is shared: each caller falls back on its own.
         
+        Returns:
+            (response, fallback_reason): fallback_reason is None for a provider
+            answer, else why the local fallback was served ('rate_limited',
+            'timeout', 'circuit_open' or 'error')
+        """
+        admission = self._admit(user_input, client_id)
+        if admission is not None:
+            if not admission.allowed:
+                return self._rate_limited_response(user_input, admission), 'rate_limited'
+            if admission.wait:
+                time.sleep(admission.wait)
         try:
-            if self.api_provider == "openai":
-                return self._get_openai_response(user_input)
-            elif self.api_provider == "gemini":
-                return self._get_gemini_response(user_input)
+            return self._coalesced_provider_call(user_input, history), None
         except Exception as e:
-            # Fallback to intelligent response on API error
+            # Fallback to intelligent response on API error, timeout or open breaker
+            reason = self._fallback_reason(e)
+            return self._get_fallback_response(user_input, reason), reason
+    
+    def _coalesced_provider_call(self, user_input: str, history: Sequence[Turn] = ()) -> str:
+        """
+        Provider answer, joining an identical call in flight
+        
+        Waiting for another call and making one's own share one LLM_TIMEOUT
+        budget (raises TimeoutError once it is spent).
+        """
+        if history or self.single_flight is None:
+            return self._fetch_provider_response(user_input, history, time.monotonic() + self.request_timeout)
+        response, shared = self.single_flight.do(
+            self._cache_key(user_input), lambda deadline: self._fetch_provider_response(user_input, history, deadline),
+            timeout=self.request_timeout)
+        if shared:
+            self.tracer.annotate(coalesced=True)
+        return response
+    
+    def _fetch_provider_response(self, user_input: str, history: Sequence[Turn], deadline: float) -> str:
+        """Ask the provider and cache the answer (failures propagate to every coalesced caller)"""
+        response = self._call_provider(user_input, deadline=deadline, history=history)
+        self._store_response(user_input, response, history)
+        return response
+    
+    def _admit(self, user_input: str, client_id: Optional[str]) -> Optional[Admission]:
+        """
+        Admission decision for a provider call
+        
+        Returns:
+            None if the call is not rate limited (no limits configured, or an
+            emergency, which always goes through); else the controller's decision
+        """
+        if self.admission is None or self.detect_emergency(user_input):
+            return None
+        with self.tracer.span('admission') as span:
+            admission = self.admission.admit(client_id)
+            span.annotate(outcome=admission.reason, wait_ms=round(admission.wait * 1000, 1))
+        ADMISSIONS.labels(admission.reason).inc()
+        return admission
+    
+    def _rate_limited_response(self, user_input: str, admission: Admission) -> str:
+        """Local answer for a refused request; in reject mode raise RateLimitedError (HTTP 429) instead"""
+        if self.admission.reject:
+            raise RateLimitedError(admission.wait, admission.reason)
+        return self._get_fallback_response(user_input, 'rate_limited')
+    
+    def _remaining_budget(self, deadline: float) -> float:
+        """Seconds left before the deadline; raises TimeoutError once it has passed"""
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError("LLM request budget exhausted")
+        return remaining
+    
+    def _call_provider(self, user_input: str, deadline: float, history: Sequence[Turn] = ()) -> str:
+        """
+        Call the configured provider within the remaining budget, guarded by the circuit breaker
+        
+        Args:
+            user_input: The user's health question
+            deadline: time.monotonic() value by which the answer is needed
+            history: Earlier turns of the conversation
+            
+        Returns:
+            AI-generated response
+        """
+        timeout = self._remaining_budget(deadline)
+        if not self.circuit_breaker.allow_request():
+            raise CircuitOpenError(f"{self.api_provider} circuit breaker is open")
+        
+        if self.api_provider == "openai":
+            call = lambda: self._get_openai_response(user_input, timeout=timeout, history=history)
+        elif self.api_provider == "gemini":
+            call = lambda: self._get_gemini_response(user_input, timeout=timeout, history=history)
+        
+        with self._llm_span() as span:
+            started = time.perf_counter()
+            try:
+                response = self._run_until_deadline(call, deadline)
+            except Exception:
+                self.circuit_breaker.record_failure()
+                self._llm_latency['error'].observe(time.perf_counter() - started)
+                span.set('outcome', 'error')
+                raise
+            elapsed = time.perf_counter() - started
+            self.circuit_breaker.record_success(elapsed)
+            self._llm_latency['success'].observe(elapsed)
+            span.set('outcome', 'success')
+            return response
+    
+    def _run_until_deadline(self, call, deadline: float):
+        """
+        Run a blocking provider call, waiting for it no later than the deadline
+        
+        The client timeout only bounds connecting and each read, so a slowly
+        trickling answer could outlast it. The call runs on a pool thread
+        instead, and the caller stops waiting when the budget is spent.
+        
+        Raises:
+            TimeoutError: The deadline passed first (the abandoned call ends on its client timeout)
+        """
+        future = provider_call_pool().submit(copy_context().run, call)
+        try:
+            return future.result(timeout=self._remaining_budget(deadline))
+        except FutureTimeoutError:
+            if future.done():
+                raise
+            future.cancel()
+            raise TimeoutError("LLM request budget exhausted") from None
+    
+    def _until_deadline(self, stream: Iterator[str], deadline: float) -> Iterator[str]:
+        """Pass stream chunks through, raising TimeoutError once the deadline has passed"""
+        for chunk in stream:
+            self._remaining_budget(deadline)
+            yield chunk
+    
+    def _llm_span(self):
+        """Span around one provider call"""
+        return self.tracer.span('llm_call', provider=self.api_provider, model=self.model_name)
+    
+    def stream_llm_response(self, user_input: str, history: Sequence[Turn] = (),
+                            client_id: Optional[str] = None) -> Iterator[str]:
+        """
+        Stream the LLM response chunk by chunk
+        
+        Answers that need no provider call (off-topic, fallback mode, cache hit,
+        rate limited) are yielded as a single chunk.
+        
+        Args:
+            user_input: The user's health question
+            history: Earlier turns of the conversation
+            client_id: Caller identity for per-client rate limits
+            
+        Yields:
+            Response text chunks
+        """
+        precomputed = self._get_precomputed_response(user_input, history)
+        if precomputed is not None:
+            yield precomputed
+            return
+        
+        admission = self._admit(user_input, client_id)
+        if admission is not None:
+            if not admission.allowed:
+                yield self._rate_limited_response(user_input, admission)
+                return
+            if admission.wait:
+                time.sleep(admission.wait)
+        
+        if not self.circuit_breaker.allow_request():
+            yield self._get_fallback_response(user_input, 'circuit_open')
+            return
+        
+        chunks = []
+        error = None
+        deadline = time.monotonic() + self.request_timeout
+        with self._llm_span() as span:
+            started = time.perf_counter()
+            try:
+                timeout = self._remaining_budget(deadline)
+                if self.api_provider == "openai":
+                    call = lambda: self._get_openai_response(user_input, stream=True, timeout=timeout, history=history)
+                elif self.api_provider == "gemini":
+                    call = lambda: self._get_gemini_response(user_input, stream=True, timeout=timeout, history=history)
+                stream = self._run_until_deadline(call, deadline)
+                for chunk in self._until_deadline(stream, deadline):
+                    if chunk:
+                        chunks.append(chunk)
+                        yield chunk
+            except GeneratorExit:
+                # Client went away mid-stream
+                self.circuit_breaker.record_cancelled()
+                span.set('outcome', 'cancelled')
+                raise
+            except Exception as e:
+                self.circuit_breaker.record_failure()
+                self._llm_latency['error'].observe(time.perf_counter() - started)
+                span.annotate(outcome='error', error=type(e).__name__, chunks=len(chunks))
+                error = e
+            else:
+                elapsed = time.perf_counter() - started
+                self.circuit_breaker.record_success(elapsed)
+                self._llm_latency['success'].observe(elapsed)
+                span.annotate(outcome='success', chunks=len(chunks))
+        
+        if error is not None:
+            # Only fall back if nothing has been sent yet
+            if not chunks:
+                yield self._get_fallback_response(user_input, self._fallback_reason(error))
+            return
+        self._store_response(user_input, ''.join(chunks).strip(), history)
+    
+    def _get_precomputed_response(self, user_input: str, history: Sequence[Turn] = ()) -> Optional[str]:
+        """
+        Answer without calling the provider when possible
+        
+        Args:
+            user_input: The user's health question
+            history: Earlier turns of the conversation
+            
+        Returns:
+            Off-topic notice, fallback answer or cached answer; None if the LLM is needed
+        """
+        with self.tracer.span('precheck'):
+            started = time.perf_counter()
+            response = self._lookup_precomputed(user_input, history)
+            self._stage_latency['precheck'].observe(time.perf_counter() - started)
+        return response
+    
+    def _lookup_precomputed(self, user_input: str, history: Sequence[Turn]) -> Optional[str]:
+        # Check if question is health-related (on every turn of a conversation)
+        if not self.is_health_related(user_input) and not self.is_follow_up(user_input, history):
+            self.tracer.annotate(outcome='off_topic')
+            return self.OFF_TOPIC_RESPONSE
+        
+        # If API is not available, use fallback
+        if not self.api_available and self.use_fallback:
+            self.tracer.annotate(outcome='fallback')
+            return self._get_fallback_response(user_input, 'no_api')
+        
+        # Emergencies and follow-ups are never answered from the cache
+        if history or self.detect_emergency(user_input):
+            self.tracer.annotate(outcome='uncacheable')
+            return None
+        
+        cached = self.response_cache.get(self._cache_key(user_input))
+        outcome = 'cache_hit'
+        if cached is None and self.semantic_cache is not None:
+            cached = self.semantic_cache.get(user_input, self._cache_namespace())
+            outcome = 'semantic_hit'
+        self.tracer.annotate(outcome=outcome if cached is not None else 'miss')
+        return cached
+    
+    def _cache_namespace(self) -> str:
+        """Partition for cached answers: provider, model and prompt version"""
+        return f"{self.api_provider}:{self.model_name}:{prompt_hash(self.system_prompt)}"
+    
+    def _cache_key(self, user_input: str) -> str:
+        return make_cache_key(user_input, self.api_provider, self.model_name, self.system_prompt)
+    
+    def _store_response(self, user_input: str, response: str, history: Sequence[Turn] = ()) -> None:
+        """Cache a provider answer (emergencies, follow-ups and empty answers are never stored)"""
+        if not response or history or self.detect_emergency(user_input):
+            return
+        self.response_cache.set(self._cache_key(user_input), response)
+        if self.semantic_cache is not None:
+            self.semantic_cache.add(user_input, response, self._cache_namespace())
+    
+    def _get_fallback_response(self, user_input: str, reason: str = 'error') -> str:
+        """
+        Local answer used when the provider is unavailable or fails
+        
+        Args:
+            user_input: The user's message
+            reason: Why the LLM was not used ('no_api', 'circuit_open', 'rate_limited', 'timeout' or 'error')
+            
+        Returns:
+            Fallback symptom advice, generic guidance, or an error notice if fallback is disabled
+        """
+        with self.tracer.span('fallback', reason=reason) as span:
+            started = time.perf_counter()
+            FALLBACKS.labels(reason).inc()
             if self.use_fallback:
                 symptom = self.detect_symptom(user_input)
+                span.set('symptom', symptom or 'generic')
                 if symptom:
-                    return self.format_fallback_response(symptom)
+                    response = self.format_fallback_response(symptom)
                 else:
-                    return self._get_generic_health_response(user_input)
-            return f"I apologize, but I encountered an error processing your request. Please try again or consult a healthcare professional."
+                    response = self._get_generic_health_response(user_input)
+            else:
+                response = self.ERROR_RESPONSE
+            self._stage_latency['fallback'].observe(time.perf_counter() - started)
+        return response
+    
+    @staticmethod
+    def _fallback_reason(error: BaseException) -> str:
+        """Fallback reason label for a failed provider call"""
+        if isinstance(error, CircuitOpenError):
+            return 'circuit_open'
+        name = type(error).__name__
+        if isinstance(error, TimeoutError) or 'Timeout' in name or name == 'DeadlineExceeded':
+            return 'timeout'
+        return 'error'
     
     def _get_generic_health_response(self, user_input: str) -> str:
         """
@@ -441,39 +1051,91 @@ TEMPERATURE CONTROL: This prompt is designed to work with temperature=0.3 for fo
         Returns:
             Generic health response
         """
-        return """Thank you for your health question. While I can provide general information, I'd like to help you better.<br><br><strong>Could you tell me more about:</strong><ul><li>What specific symptoms are you experiencing?</li><li>When did they start?</li><li>How severe are they on a scale of 1-10?</li></ul><strong>Common topics I can help with:</strong><ul><li>Headaches, coughs, colds, and flu symptoms</li><li>Stomach issues and digestive health</li><li>Fever and sore throat</li><li>General wellness and prevention tips</li><li>Home remedies for minor ailments</li></ul>Please describe your symptoms in more detail, and I'll provide specific advice, actionable tips, and home remedies.<br><br><em>⚠️ I am an AI, not a doctor. For serious concerns or symptoms that persist, please consult a medical professional.</em>"""
+        return self.GENERIC_HEALTH_RESPONSE
     
-    def _get_openai_response(self, user_input: str) -> str:
-        """Get response from OpenAI API with optimized parameters"""
-        response = self.client.ChatCompletion.create(
-            model="gpt-3.5-turbo",  # or "gpt-4" for better quality
-            messages=[
-                {"role": "system", "content": self.SYSTEM_PROMPT},
-                {"role": "user", "content": user_input}
-            ],
-            temperature=0.3,  # LOW temperature for focused, accurate responses
-            max_tokens=800,
-            top_p=0.9  # Additional control for deterministic outputs
+    # Sampling parameters shared by the sync and async clients
+    OPENAI_PARAMS = {
+        'temperature': 0.3,  # LOW temperature for focused, accurate responses
+        'max_tokens': 800,
+        'top_p': 0.9,  # Additional control for deterministic outputs
+    }
+    # Ask for token usage in the final chunk of streamed answers
+    OPENAI_STREAM_OPTIONS = {'stream_options': {'include_usage': True}}
+    GEMINI_GENERATION_CONFIG = {
+        'temperature': 0.3,  # LOW temperature for focused responses
+        'top_p': 0.9,
+        'top_k': 40,
+        'max_output_tokens': 800,
+    }
+    
+    def _get_openai_messages(self, user_input: str, history: Sequence[Turn] = ()) -> list:
+        """Chat messages sent to OpenAI"""
+        return [
+            {"role": "system", "content": self.system_prompt},
+            *({"role": role, "content": text} for role, text in history),
+            {"role": "user", "content": user_input}
+        ]
+    
+    def _get_gemini_prompt(self, user_input: str, history: Sequence[Turn] = ()) -> str:
+        """Prompt sent to Gemini (the system prompt goes in as the system instruction or context cache)"""
+        if not history:
+            return f"User Question: {user_input}"
+        conversation = '\n'.join(f"{'User' if role == 'user' else 'Assistant'}: {text}" for role, text in history)
+        return f"Conversation so far:\n{conversation}\n\nUser Question: {user_input}"
+    
+    def _get_openai_response(self, user_input: str, stream: bool = False, timeout: Optional[float] = None,
+                             history: Sequence[Turn] = ()) -> Union[str, Iterator[str]]:
+        """Get response from OpenAI API with optimized parameters (a chunk iterator if stream=True)"""
+        response = self.client.chat.completions.create(
+            model=self.model_name,
+            messages=self._get_openai_messages(user_input, history),
+            stream=stream,
+            timeout=timeout or self.request_timeout,
+            **self.OPENAI_PARAMS,
+            **self.OPENAI_STREAM_OPTIONS if stream else {}
         )
-        return response.choices[0].message.content.strip()
-    
-    def _get_gemini_response(self, user_input: str) -> str:
-        """Get response from Google Gemini API with optimized parameters"""
-        full_prompt = f"{self.SYSTEM_PROMPT}\n\nUser Question: {user_input}"
-        
-        # Configure generation with low temperature
-        generation_config = {
-            'temperature': 0.3,  # LOW temperature for focused responses
-            'top_p': 0.9,
-            'top_k': 40,
-            'max_output_tokens': 800,
-        }
-        
+        if stream:
+            return self._openai_chunks(response, user_input)
+        text = response.choices[0].message.content.strip()
+        self._record_usage(openai_usage(response.usage), user_input, text)
+        return text
+    
+    def _openai_chunks(self, response, user_input: str) -> Iterator[str]:
+        """Text chunks of an OpenAI stream; usage arrives in the final chunk"""
+        usage, parts = None, []
+        for chunk in response:
+            if chunk.usage is not None:
+                usage = chunk.usage
+            if chunk.choices:
+                text = chunk.choices[0].delta.content or ''
+                parts.append(text)
+                yield text
+        self._record_usage(openai_usage(usage), user_input, ''.join(parts))
+    
+    def _get_gemini_response(self, user_input: str, stream: bool = False, timeout: Optional[float] = None,
+                             history: Sequence[Turn] = ()) -> Union[str, Iterator[str]]:
+        """Get response from Google Gemini API with optimized parameters (a chunk iterator if stream=True)"""
+        self._refresh_context_cache()
         response = self.client.generate_content(
-            full_prompt,
-            generation_config=generation_config
+            self._get_gemini_prompt(user_input, history),
+            generation_config=self.GEMINI_GENERATION_CONFIG,
+            stream=stream,
+            request_options={'timeout': timeout or self.request_timeout}
         )
-        return response.text.strip()
+        if stream:
+            return self._gemini_chunks(response, user_input)
+        text = response.text.strip()
+        self._record_usage(gemini_usage(response.usage_metadata), user_input, text)
+        return text
+    
+    def _gemini_chunks(self, response, user_input: str) -> Iterator[str]:
+        """Text chunks of a Gemini stream; the last chunk carries the usage"""
+        usage, parts = None, []
+        for chunk in response:
+            usage = gemini_usage(chunk.usage_metadata) or usage
+            parts.append(chunk.text)
+            yield chunk.text
+        self._record_usage(usage, user_input, ''.join(parts))
     
     def calculate_bmi(self, height_cm: float, weight_kg: float) -> str:
         """Calculate BMI and return formatted response"""
@@ -499,95 +1161,223 @@ TEMPERATURE CONTROL: This prompt is designed to work with temperature=0.3 for fo
         except Exception:
             return "I couldn't calculate your BMI. Please ensure you provided valid numbers."
 
+    def _emergency_response(self, decision: RouteDecision) -> str:
+        EMERGENCIES.inc()
+        return self.get_emergency_response()
+
     def handle_bmi_request(self, user_input: str) -> Optional[str]:
         """Check if user wants BMI calculation and process it"""
-        # Check for explicit BMI intent
-        if re.search(r'\b(bmi|body mass index)\b', user_input.lower()):
-            # Try to extract numbers
-            # Look for patterns like "175 cm" or "1.75 m" and "70 kg"
-            height_match = re.search(r'(\d+(?:\.\d+)?)\s*(cm|centimeters?|m|meters?)', user_input.lower())
-            weight_match = re.search(r'(\d+(?:\.\d+)?)\s*(kg|kilograms?)', user_input.lower())
-            
-            if height_match and weight_match:
-                height_val = float(height_match.group(1))
-                height_unit = height_match.group(2)
-                weight_val = float(weight_match.group(1))
-                
-                # Convert height to cm if in meters
-                if 'm' in height_unit and 'cm' not in height_unit:
-                    height_val *= 100
-                    
-                return self.calculate_bmi(height_val, weight_val)
-            else:
-                return "Sure, I can calculate your BMI. Please tell me your <strong>height</strong> (in cm or m) and <strong>weight</strong> (in kg).<br>Example: <em>'I am 175cm tall and weigh 70kg'</em>"
-        return None
+        slots = match_bmi(Message.from_text(user_input))
+        return None if slots is None else self._bmi_response(RouteDecision('bmi', slots))
+
+    def _bmi_response(self, decision: RouteDecision) -> str:
+        height, weight = decision.slots['height'], decision.slots['weight']
+        if height is not None and weight is not None:
+            return self.calculate_bmi(height, weight)
+        return self.BMI_PROMPT
 
     def handle_hospital_request(self, user_input: str) -> Optional[str]:
         """Check if user wants to find nearby hospitals"""
-        user_input_lower = user_input.lower()
-        
-        # Helper to generate link
-        def generate_link(loc):
-            search_query = f"hospitals+near+{loc.replace(' ', '+')}"
-            link = f"https://www.google.com/maps/search/{search_query}"
-            return f"Here is a list of medical facilities near <strong>{loc}</strong>:<br><br><a href='{link}' target='_blank' style='color: #00bfa5; font-weight: bold; text-decoration: none;'>📍 Click here to view Hospitals in {loc} on Google Maps</a><br><br><em>Please call ahead to confirm availability.</em>"
-
-        # 1. Check for Zip Codes (Strong signal for follow-up)
-        # Matches 5 or 6 digit numbers (e.g., 226016, 90210)
-        zip_match = re.search(r'\b(\d{5,6})\b', user_input)
-        if zip_match:
-            return generate_link(zip_match.group(1))
-
-        # 2. Check for explicit location context "in [City]" or "at [City]"
-        # This helps catch "I am in London" even if they don't say "hospital" again
-        location_match = re.search(r'\b(?:in|at|near|my city is)\s+([a-zA-Z\s]+)', user_input_lower)
-        
-        # 3. Standard Intent Check (User explicitly asks for hospital)
-        if re.search(r'\b(hospital|clinic|doctor|medical center|emergency room)\b', user_input_lower):
-            # If they provided location in the same sentence: "Hospital in London"
-            if location_match:
-                return generate_link(location_match.group(1).strip())
-            
-            # If intent is clear but no location found: "Find a hospital"
-            if re.search(r'\b(find|search|where|nearest|nearby)\b', user_input_lower):
-                return "I can help you find a nearby medical facility. <strong>Which city or zip code are you currently in?</strong>"
-        
-        # 4. Catch-all for "in [City]" if it looks like a location answer to a previous question
-        # We filter out common non-location words to avoid false positives like "in pain"
-        if location_match:
-            location = location_match.group(1).strip()
-            ignored_words = ['pain', 'trouble', 'danger', 'bed', 'hospital', 'clinic', 'emergency', 'need', 'love', 'doubt', 'general', 'particular', 'mind', 'fact']
-            if location not in ignored_words and len(location) > 2:
-                return generate_link(location)
+        slots = match_hospital(Message.from_text(user_input))
+        return None if slots is None else self._hospital_response(RouteDecision('hospital', slots))
 
-        return None
+    def _hospital_response(self, decision: RouteDecision) -> str:
+        location = decision.slots['zip'] or decision.slots['city']
+        if not location:
+            return self.HOSPITAL_PROMPT
+        search_query = f"hospitals+near+{location.replace(' ', '+')}"
+        link = f"https://www.google.com/maps/search/{search_query}"
+        return f"Here is a list of medical facilities near <strong>{location}</strong>:<br><br><a href='{link}' target='_blank' style='color: #00bfa5; font-weight: bold; text-decoration: none;'>📍 Click here to view Hospitals in {location} on Google Maps</a><br><br><em>Please call ahead to confirm availability.</em>"
 
-    def get_bot_response(self, user_input: str) -> str:
+    def build_router(self) -> IntentRouter:
+        """
+        Local routes answered without the LLM, in priority order
+        
+        Register more with self.router.add_route() (or override this method).
+        """
+        router = IntentRouter(tracer=self.tracer)
+        router.add_route('emergency', lambda message: {} if self.detect_emergency(message.text) else None,
+                         self._emergency_response, priority=0)
+        router.add_route('bmi', match_bmi, self._bmi_response, priority=10)
+        router.add_route('hospital', match_hospital, self._hospital_response, priority=20)
+        return router
+
+    def get_bot_response(self, user_input: str, session_id: Optional[str] = None,
+                         client_id: Optional[str] = None) -> str:
         """
         Main method to get chatbot response with safety checks
         
         Args:
             user_input: The user's message
+            session_id: Conversation id; earlier turns are remembered and sent to the LLM
+            client_id: Caller identity (e.g. IP address) for per-client rate limits
             
         Returns:
             Appropriate bot response
         """
-        # First, check for emergencies
-        if self.detect_emergency(user_input):
-            return self.get_emergency_response()
+        with self.tracer.span('get_bot_response', provider=self.api_provider) as span:
+            decision, local_response = self._route_locally(user_input, session_id)
+            if local_response:
+                span.set('route', decision.route)
+                self._remember(session_id, user_input, local_response, decision)
+                return local_response
             
-        # Check for BMI request
-        bmi_response = self.handle_bmi_request(user_input)
-        if bmi_response:
-            return bmi_response
+            # If not emergency or special feature, get LLM response
+            span.set('route', 'llm')
+            history = self._session_history(user_input, session_id)
+            response = self.get_llm_response(user_input, history, client_id)
+            self._remember(session_id, user_input, response)
+            return response
+    
+    def stream_bot_response(self, user_input: str, session_id: Optional[str] = None,
+                            client_id: Optional[str] = None) -> Iterator[str]:
+        """
+        Streaming variant of get_bot_response
+        
+        Emergency, BMI and hospital answers are yielded as a single chunk.
+        
+        Args:
+            user_input: The user's message
+            session_id: Conversation id (see get_bot_response)
+            client_id: Caller identity for per-client rate limits
+            
+        Yields:
+            Response text chunks
+        """
+        with self.tracer.span('stream_bot_response', provider=self.api_provider) as span:
+            decision, local_response = self._route_locally(user_input, session_id)
+            if local_response:
+                span.set('route', decision.route)
+                self._remember(session_id, user_input, local_response, decision)
+                yield local_response
+                return
+            
+            span.set('route', 'llm')
+            chunks = []
+            history = self._session_history(user_input, session_id)
+            for chunk in self.stream_llm_response(user_input, history, client_id):
+                chunks.append(chunk)
+                yield chunk
+            self._remember(session_id, user_input, ''.join(chunks))
+    
+    def _route_locally(self, user_input: str,
+                       session_id: Optional[str] = None) -> Tuple[Optional[RouteDecision], Optional[str]]:
+        """Run the local routes, letting them see the previous decision in the conversation"""
+        with self.tracer.span('local_routing') as span:
+            started = time.perf_counter()
+            if not session_id or self.session_store is None:
+                result = self.router.dispatch(user_input)
+            else:
+                session = self.session_store.get(session_id)
+                previous = session.last_decision if session is not None else None
+                result = self.router.dispatch(user_input, previous=previous, stateful=True)
+            self._stage_latency['local_routing'].observe(time.perf_counter() - started)
+            span.set('route', result[0].route if result[0] is not None else 'none')
+        return result
+    
+    def _session_history(self, user_input: str, session_id: Optional[str]) -> List[Turn]:
+        """
+        Earlier turns to forward to the LLM, within the history token budget
+        
+        Only follow-ups get them. A standalone question is sent on its own, so it
+        is answered from and stored in the response caches and joins identical
+        calls in flight, even in the middle of a conversation.
+        """
+        if not session_id or self.session_store is None:
+            return []
+        history = self.session_store.history(session_id)
+        return history if self.is_follow_up(user_input, history) else []
+    
+    def _remember(self, session_id: Optional[str], user_input: str, response: str,
+                  decision: Optional[RouteDecision] = None) -> None:
+        if session_id and self.session_store is not None and response:
+            self.session_store.append(session_id, user_input, response, decision)
+    
+    def get_bot_responses(self, messages: List[str], max_concurrency: int = 8,
+                          client_id: Optional[str] = None) -> List[dict]:
+        """
+        Answer a batch of messages
+        
+        Local stages run for the whole batch first; only the messages that need
+        the LLM are sent, concurrently and at most max_concurrency at a time.
+        Identical questions in a batch share one provider call, and each call
+        counts against the caller's rate limits.
+        
+        Args:
+            messages: The user's messages
+            max_concurrency: Maximum provider calls in flight
+            client_id: Caller identity for per-client rate limits
             
-        # Check for Hospital/Clinic request
-        hospital_response = self.handle_hospital_request(user_input)
-        if hospital_response:
-            return hospital_response
+        Returns:
+            One dict per message, in input order, with response, status, route and latency_ms
+        """
+        with self.tracer.span('get_bot_responses', provider=self.api_provider, messages=len(messages)) as span:
+            results, pending = self._answer_batch_locally(messages)
+            span.set('llm_calls', len(pending))
+            if pending:
+                def answer(indexes: List[int]) -> Tuple[str, Optional[str], float]:
+                    started = time.perf_counter()
+                    response, reason = self._get_provider_answer(messages[indexes[0]], client_id=client_id)
+                    return response, reason, time.perf_counter() - started
+                
+                with ThreadPoolExecutor(max_workers=min(max_concurrency, len(pending))) as pool:
+                    # Each worker runs in a copy of this context, so its spans join the batch's trace
+                    futures = [pool.submit(copy_context().run, answer, indexes) for indexes in pending.values()]
+                    for future, indexes in zip(futures, pending.values()):
+                        try:
+                            response, reason, elapsed = future.result()
+                            item = self._llm_batch_item(response, reason, elapsed)
+                        except RateLimitedError:
+                            item = self._batch_item(None, 'llm', 0.0, status='rate_limited')
+                        except Exception:
+                            item = self._batch_item(None, 'llm', 0.0, status='error')
+                        for index in indexes:
+                            results[index] = dict(item)
+            return results
+    
+    def _answer_batch_locally(self, messages: List[str]) -> Tuple[List[Optional[dict]], Dict[str, List[int]]]:
+        """
+        Run the local stages over a batch
         
-        # If not emergency or special feature, get LLM response
-        return self.get_llm_response(user_input)
+        Returns:
+            Results with None for messages that still need the LLM, and a mapping
+            of normalized question to the indexes waiting on it
+        """
+        results: List[Optional[dict]] = [None] * len(messages)
+        pending: Dict[str, List[int]] = {}
+        for index, message in enumerate(messages):
+            started = time.perf_counter()
+            if not isinstance(message, str) or not message.strip():
+                results[index] = self._batch_item('Please enter a message.', 'empty', 0.0, status='invalid')
+                continue
+            response = self._get_local_response(message)
+            route = 'local'
+            if response is None:
+                response = self._get_precomputed_response(message)
+                route = 'precomputed'
+            if response is not None:
+                results[index] = self._batch_item(response, route, time.perf_counter() - started)
+            else:
+                pending.setdefault(normalize_question(message), []).append(index)
+        return results, pending
+    
+    @staticmethod
+    def _batch_item(response: Optional[str], route: str, elapsed: float, status: str = 'ok') -> dict:
+        return {'response': response, 'status': status, 'route': route, 'latency_ms': round(elapsed * 1000, 2)}
+    
+    @classmethod
+    def _llm_batch_item(cls, response: str, fallback_reason: Optional[str], elapsed: float) -> dict:
+        """Batch result of an LLM-bound message: status 'fallback' with its reason if the provider was not used"""
+        if fallback_reason is None:
+            return cls._batch_item(response, 'llm', elapsed)
+        item = cls._batch_item(response, 'llm', elapsed, status='fallback')
+        item['reason'] = fallback_reason
+        return item
+    
+    def _get_local_response(self, user_input: str) -> Optional[str]:
+        """Emergency, BMI, hospital and any other registered routes that never need the LLM"""
+        decision, response = self.router.dispatch(user_input)
+        return response
     
     def detect_symptom(self, user_input: str) -> Optional[str]:
         """
@@ -599,38 +1389,19 @@ TEMPERATURE CONTROL: This prompt is designed to work with temperature=0.3 for fo
         Returns:
             Detected symptom key or None
         """
-        user_input_lower = user_input.lower()
-        
-        # PRIORITY 1: Check exact symptom keywords first
-        symptom_patterns = {
-            'headache': ['headache', 'head pain', 'head ache', 'head hurts', 'migraine'],
-            'cough': ['cough', 'coughing'],
-            'stomach': ['stomach', 'belly', 'tummy', 'abdominal', 'nausea', 'vomit'],
-            'dizzy': ['dizzy', 'dizziness', 'lightheaded', 'vertigo'],
-            'fever': ['fever', 'temperature', 'hot', 'chills'],
-            'cold': ['cold', 'flu', 'runny nose', 'sneezing', 'congestion'],
-            'sore throat': ['sore throat', 'throat hurt', 'throat pain', 'swallow hurt'],
-            'knee': ['knee'],
-            'tired eyes': ['tired eye', 'eye strain', 'eyes tired', 'eyes feel tired', 'eye fatigue'],
-            'dry eyes': ['dry eye', 'eyes dry', 'dryness in eye', 'keep eyes hydrated', 'hydrate eyes'],
-            'eye pain': ['eye pain', 'eye hurt', 'pain in eye', 'eyes hurt', 'hurting eyes'],
-            'back': ['back pain', 'back hurt', 'back ache', 'lower back', 'upper back']
-        }
+        matches = self.classify_keywords(user_input)
         
-        # Check each symptom pattern
-        for symptom_key, patterns in symptom_patterns.items():
-            if any(pattern in user_input_lower for pattern in patterns):
+        # PRIORITY 1: Check exact symptom keywords first (in SYMPTOM_PATTERNS order)
+        found_symptoms = matches.get('symptom', [])
+        for symptom_key in self.SYMPTOM_PATTERNS:
+            if symptom_key in found_symptoms:
                 return symptom_key
         
         # PRIORITY 2: Check for other body part mentions that aren't in fallback
         # These will be handled by LLM with specific guidance
-        body_parts = ['hand', 'ear', 'neck', 'shoulder', 'ankle', 'wrist', 'hip', 'elbow', 'foot']
-        
-        for part in body_parts:
-            if part in user_input_lower and any(word in user_input_lower for word in 
-                ['pain', 'hurt', 'ache', 'sore', 'tired', 'strain', 'stiff']):
-                # Return None to force LLM response with specific guidance
-                return None
+        if 'body_part' in matches and 'pain' in matches:
+            # Return None to force LLM response with specific guidance
+            return None
         
         return None
     
@@ -644,18 +1415,7 @@ TEMPERATURE CONTROL: This prompt is designed to work with temperature=0.3 for fo
         Returns:
             Formatted response string
         """
-        data = self.FALLBACK_RESPONSES[symptom_key]
-        
-        response = f"<strong>Direct Answer:</strong><br>{data['answer']}<br><br>"
-        response += "<strong>Actionable Tips:</strong><ul>"
-        for tip in data['tips']:
-            response += f"<li>{tip}</li>"
-        response += "</ul><strong>Home Remedies:</strong><ul>"
-        for remedy in data['remedies']:
-            response += f"<li>{remedy}</li>"
-        response += "</ul><br><em>⚠️ I am an AI, not a doctor. Please consult a medical professional for proper diagnosis and treatment.</em>"
-        
-        return response
+        return self.FALLBACK_HTML[symptom_key].text
 
 
 # Example usage function
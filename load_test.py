@@ -0,0 +1,373 @@
+"""
+End-to-end load test for a running chatbot server
+
+Replays a weighted mix of message types (emergency, BMI, hospital, fallback
+symptom, LLM-bound, off-topic) against POST /get_response and reports
+throughput, error rate and p50/p95/p99 latency per message type.
+
+Without --rate every worker sends its next request as soon as the previous one
+is answered (closed loop, --concurrency users). With --rate requests arrive at
+that many per second (Poisson arrivals) and latency is measured from the
+scheduled arrival, so time spent waiting for a free worker counts too.
+
+Usage:
+    python load_test.py --url http://127.0.0.1:5000 --concurrency 32 --duration 60
+    python load_test.py --rate 50 --duration 120 --mix llm=5,emergency=1 --json results/run.json
+    python load_test.py --duration 60 --compare results/run.json
+
+Run against the offline provider stub (see stub_llm_server.py) to measure the
+service itself without provider cost or rate limits.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import subprocess
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+from latency import LatencyHistogram, default_buckets
+
+# Message type -> (default weight, messages)
+MESSAGE_MIX: Dict[str, tuple] = {
+    'emergency': (1, [
+        "I have severe chest pain and can't breathe",
+        "My father is unconscious and not responding",
+        "I think I'm having a heart attack",
+    ]),
+    'bmi': (2, [
+        "Calculate my BMI, I am 175 cm and 70 kg",
+        "What is my BMI? Height 1.62 m, weight 58 kg",
+        "bmi for 180cm 95kg",
+    ]),
+    'hospital': (2, [
+        "Find a hospital near me",
+        "Where is the nearest hospital in London",
+        "Clinic near 90210",
+    ]),
+    'fallback': (3, [
+        "I have a headache",
+        "My throat is sore",
+        "I have a fever",
+        "My back hurts",
+    ]),
+    # Made unique per request so the response caches cannot answer them
+    'llm': (3, [
+        "My knee hurts after running {n} km, what should I do?",
+        "I've had a dry cough for {n} days, is that normal?",
+        "My eyes feel tired after {n} hours at the computer",
+    ]),
+    'off_topic': (1, [
+        "Can you recommend a photo editing app?",
+        "Who won the football match yesterday?",
+    ]),
+}
+
+
+def parse_mix(spec: Optional[str]) -> Dict[str, float]:
+    """
+    Message type weights from "type=weight,..." (unlisted types get weight 0)
+
+    Raises:
+        ValueError: For unknown types or malformed weights
+    """
+    if not spec:
+        return {kind: float(weight) for kind, (weight, _) in MESSAGE_MIX.items()}
+    weights = {}
+    for item in spec.split(','):
+        kind, _, weight = item.partition('=')
+        kind = kind.strip()
+        if kind not in MESSAGE_MIX:
+            raise ValueError(f"Unknown message type '{kind}'. Choose from: {', '.join(MESSAGE_MIX)}")
+        weights[kind] = float(weight) if weight else 1.0
+    if not any(weights.values()):
+        raise ValueError("The message mix needs at least one positive weight")
+    return weights
+
+
+class MessagePicker:
+    """Draws (type, message) pairs according to the weights (thread-safe, reproducible with a seed)"""
+
+    def __init__(self, weights: Dict[str, float], seed: Optional[int] = None):
+        self.kinds = [kind for kind, weight in weights.items() if weight > 0]
+        self.weights = [weights[kind] for kind in self.kinds]
+        self.random = random.Random(seed)
+        self._counter = 0
+        self._lock = threading.Lock()
+
+    def pick(self) -> tuple:
+        with self._lock:
+            kind = self.random.choices(self.kinds, self.weights)[0]
+            template = self.random.choice(MESSAGE_MIX[kind][1])
+            self._counter += 1
+            counter = self._counter
+        return kind, template.format(n=counter)
+
+
+class LoadStats:
+    """Latency histograms and error counts per message type"""
+
+    def __init__(self):
+        self.latency: Dict[str, LatencyHistogram] = {}
+        self.requests: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+        self.error_kinds: Dict[str, int] = {}
+        self.max_latency: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _histogram() -> LatencyHistogram:
+        return LatencyHistogram(default_buckets(start=0.0005, stop=120.0, factor=1.1))
+
+    def record(self, kind: str, seconds: float, error: Optional[str] = None) -> None:
+        with self._lock:
+            for key in (kind, 'all'):
+                if key not in self.latency:
+                    self.latency[key] = self._histogram()
+                    self.requests[key] = self.errors[key] = 0
+                    self.max_latency[key] = 0.0
+                self.requests[key] += 1
+                self.max_latency[key] = max(self.max_latency[key], seconds)
+                if error:
+                    self.errors[key] += 1
+                else:
+                    self.latency[key].record(seconds)
+            if error:
+                self.error_kinds[error] = self.error_kinds.get(error, 0) + 1
+
+    def summary(self, elapsed: float) -> Dict[str, dict]:
+        """Per message type (and 'all'): requests, throughput, error rate and latency in ms"""
+        summary = {}
+        with self._lock:
+            keys = sorted(self.latency, key=lambda key: (key == 'all', key))
+            for key in keys:
+                snapshot = self.latency[key].snapshot()
+                requests = self.requests[key]
+
+                def ms(value):
+                    # Bucket interpolation can overshoot the largest observation
+                    return round(min(value, self.max_latency[key]) * 1000, 2) if value is not None else None
+
+                summary[key] = {
+                    'requests': requests,
+                    'errors': self.errors[key],
+                    'error_rate': round(self.errors[key] / requests, 4) if requests else 0.0,
+                    'throughput_rps': round(requests / elapsed, 2) if elapsed else None,
+                    'latency_ms': {
+                        'mean': ms(snapshot['mean']),
+                        'p50': ms(snapshot['p50']),
+                        'p95': ms(snapshot['p95']),
+                        'p99': ms(snapshot['p99']),
+                        'max': ms(self.max_latency[key]),
+                    },
+                }
+        return summary
+
+
+class LoadGenerator:
+    """Sends the message mix to one server from a pool of keep-alive connections"""
+
+    def __init__(self, url: str, picker: MessagePicker, stats: LoadStats, timeout: float = 60.0,
+                 endpoint: str = '/get_response'):
+        parts = urlsplit(url)
+        self.host = parts.hostname or '127.0.0.1'
+        self.port = parts.port or (443 if parts.scheme == 'https' else 80)
+        self.https = parts.scheme == 'https'
+        self.endpoint = endpoint
+        self.picker = picker
+        self.stats = stats
+        self.timeout = timeout
+        self.run_id = uuid.uuid4().hex[:8]
+        self._local = threading.local()
+
+    def _connection(self) -> http.client.HTTPConnection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+            connection = cls(self.host, self.port, timeout=self.timeout)
+            self._local.connection = connection
+            # One conversation per connection, like a user in a browser tab
+            self._local.session_id = f"load-{self.run_id}-{threading.get_ident()}"
+        return connection
+
+    def _reset_connection(self) -> None:
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+        self._local.connection = None
+
+    def send_one(self, scheduled: Optional[float] = None) -> None:
+        """
+        Send one request and record it
+
+        Args:
+            scheduled: perf_counter() time the request was due (open loop); latency is measured from it
+        """
+        kind, message = self.picker.pick()
+        started = scheduled if scheduled is not None else time.perf_counter()
+        error = None
+        try:
+            connection = self._connection()
+            body = json.dumps({'message': message, 'session_id': self._local.session_id})
+            connection.request('POST', self.endpoint, body=body, headers={'Content-Type': 'application/json'})
+            response = connection.getresponse()
+            payload = response.read()
+            if response.status != 200:
+                error = f"HTTP {response.status}"
+            elif not json.loads(payload).get('response'):
+                error = 'empty response'
+        except (OSError, http.client.HTTPException, ValueError) as e:
+            error = type(e).__name__
+            self._reset_connection()
+        self.stats.record(kind, time.perf_counter() - started, error)
+
+    def run_closed(self, concurrency: int, duration: Optional[float], requests: Optional[int]) -> float:
+        """Each of `concurrency` workers sends back-to-back requests; returns the elapsed seconds"""
+        deadline = time.perf_counter() + duration if duration else None
+        remaining = [requests] if requests else None
+        lock = threading.Lock()
+
+        def worker():
+            while deadline is None or time.perf_counter() < deadline:
+                if remaining is not None:
+                    with lock:
+                        if remaining[0] <= 0:
+                            break
+                        remaining[0] -= 1
+                self.send_one()
+            self._reset_connection()
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - started
+
+    def run_open(self, rate: float, concurrency: int, duration: Optional[float], requests: Optional[int],
+                 seed: Optional[int] = None) -> float:
+        """Poisson arrivals at `rate` per second served by up to `concurrency` workers; returns the elapsed seconds"""
+        arrivals = random.Random(seed)
+        started = time.perf_counter()
+        due = started
+        sent = 0
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='load') as pool:
+            while (requests is None or sent < requests) and (duration is None or due - started < duration):
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                pool.submit(self.send_one, due)
+                sent += 1
+                due += arrivals.expovariate(rate)
+        return time.perf_counter() - started
+
+
+def git_commit() -> Optional[str]:
+    """Short hash of the checked-out commit (None outside a git repository)"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _fmt(value, spec: str) -> str:
+    return format(value, spec) if value is not None else '-'
+
+
+def print_report(result: dict) -> None:
+    print(f"{'type':>10} {'requests':>9} {'req/s':>8} {'errors':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for kind, row in result['routes'].items():
+        latency = row['latency_ms']
+        print(f"{kind:>10} {row['requests']:>9} {_fmt(row['throughput_rps'], '8.1f')} {row['error_rate']:>7.1%} "
+              f"{_fmt(latency['p50'], '9.1f')} {_fmt(latency['p95'], '9.1f')} {_fmt(latency['p99'], '9.1f')} "
+              f"{_fmt(latency['max'], '9.1f')}")
+    if result['error_kinds']:
+        print("Errors: " + ', '.join(f"{kind} x{count}" for kind, count in result['error_kinds'].items()))
+
+
+def print_comparison(result: dict, baseline: dict) -> None:
+    """Throughput and latency change per message type against an earlier run"""
+    print(f"\nCompared with {baseline.get('commit') or 'baseline'} ({baseline.get('started_at', '?')}):")
+    print(f"{'type':>10} {'req/s':>16} {'p50 ms':>18} {'p95 ms':>18} {'p99 ms':>18}")
+
+    def change(new, old, spec):
+        if new is None or old is None:
+            return f"{_fmt(new, spec):>18}"
+        delta = (new - old) / old * 100 if old else 0.0
+        return f"{format(new, spec):>9} ({delta:+6.1f}%)"
+
+    for kind, row in result['routes'].items():
+        old = baseline.get('routes', {}).get(kind)
+        if old is None:
+            continue
+        print(f"{kind:>10} {change(row['throughput_rps'], old['throughput_rps'], '.1f'):>16} "
+              f"{change(row['latency_ms']['p50'], old['latency_ms']['p50'], '.1f')} "
+              f"{change(row['latency_ms']['p95'], old['latency_ms']['p95'], '.1f')} "
+              f"{change(row['latency_ms']['p99'], old['latency_ms']['p99'], '.1f')}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test POST /get_response with a weighted message mix.")
+    parser.add_argument('--url', default=os.getenv("LOAD_TEST_URL", "http://127.0.0.1:5000"), help="Server base URL")
+    parser.add_argument('--endpoint', default='/get_response')
+    parser.add_argument('--concurrency', type=int, default=16, help="Workers (open connections)")
+    parser.add_argument('--rate', type=float, help="Arrival rate in requests/s (open loop); default is closed loop")
+    parser.add_argument('--duration', type=float, help="Seconds to run (default 30 unless --requests is given)")
+    parser.add_argument('--requests', type=int, help="Stop after this many requests")
+    parser.add_argument('--mix', help=f"Weights, e.g. llm=5,bmi=1 (types: {', '.join(MESSAGE_MIX)})")
+    parser.add_argument('--timeout', type=float, default=60.0, help="Seconds before a request counts as failed")
+    parser.add_argument('--seed', type=int, help="Random seed for a reproducible message sequence")
+    parser.add_argument('--json', help="Write the results to this file")
+    parser.add_argument('--compare', help="Earlier --json results to compare against")
+    args = parser.parse_args(argv)
+    if args.duration is None and args.requests is None:
+        args.duration = 30.0
+
+    weights = parse_mix(args.mix)
+    stats = LoadStats()
+    generator = LoadGenerator(args.url, MessagePicker(weights, args.seed), stats, args.timeout, args.endpoint)
+    mode = f"{args.rate:g} req/s open loop" if args.rate else "closed loop"
+    limit = f"{args.duration:g} s" if args.duration else f"{args.requests} requests"
+    print(f"🚀 Load testing {args.url}{args.endpoint}: {args.concurrency} workers, {mode}, {limit}")
+
+    started_at = time.strftime('%Y-%m-%dT%H:%M:%S')
+    if args.rate:
+        elapsed = generator.run_open(args.rate, args.concurrency, args.duration, args.requests, args.seed)
+    else:
+        elapsed = generator.run_closed(args.concurrency, args.duration, args.requests)
+
+    result = {
+        'commit': git_commit(),
+        'started_at': started_at,
+        'config': {
+            'url': args.url, 'endpoint': args.endpoint, 'concurrency': args.concurrency, 'rate': args.rate,
+            'duration': args.duration, 'requests': args.requests, 'mix': weights, 'seed': args.seed,
+        },
+        'elapsed_s': round(elapsed, 3),
+        'routes': stats.summary(elapsed),
+        'error_kinds': dict(stats.error_kinds),
+    }
+    print()
+    print_report(result)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            print_comparison(result, json.load(f))
+    if args.json:
+        directory = os.path.dirname(args.json)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
+        print(f"\n✅ Wrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
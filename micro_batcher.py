@@ -0,0 +1,155 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional, Sequence
+
+from latency import LatencyHistogram, default_buckets
+
+
+def batch_size_buckets(max_batch_size: int) -> List[float]:
+    """Powers of two up to max_batch_size, used as histogram buckets for batch sizes"""
+    buckets = []
+    size = 1
+    while size < max_batch_size:
+        buckets.append(size)
+        size *= 2
+    buckets.append(max_batch_size)
+    return buckets
+
+
+class MicroBatcher:
+    """
+    Collects concurrent single-item calls into batched calls
+
+    Callers block in submit() while a background thread gathers their items and
+    runs `process_batch` once over all of them, handing each caller its own
+    result. A batch is dispatched when it holds `max_batch_size` items, when
+    `max_wait_ms` has passed since its first item arrived, or as soon as every
+    caller currently inside submit() has joined it, so a lone caller never
+    waits for company that is not coming.
+    """
+
+    def __init__(self, process_batch: Callable[[List[Any]], Sequence[Any]],
+                 max_batch_size: int = 32, max_wait_ms: float = 2.0, name: str = 'micro-batcher'):
+        """
+        Initialize the batcher (the worker thread starts on first use)
+
+        Args:
+            process_batch: Maps a list of items to a sequence of results in the same order
+            max_batch_size: Most items processed in one call
+            max_wait_ms: Longest time the first item of a batch waits for others
+            name: Worker thread name
+        """
+        self.process_batch = process_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.name = name
+        self.batch_sizes = LatencyHistogram(batch_size_buckets(self.max_batch_size))
+        self.queue_wait = LatencyHistogram(default_buckets(start=0.00005, stop=1.0))
+        self.stats = {'items': 0, 'batches': 0, 'errors': 0}
+        self._worker = None
+        self._worker_pid = None
+        self._start_lock = threading.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self._pending = deque()
+        # Callers inside submit() whose item has not been taken into a batch yet
+        self._arriving = 0
+        self._condition = threading.Condition()
+
+    def submit(self, item: Any, prepare: Optional[Callable[[Any], Any]] = None) -> Any:
+        """
+        Process one item as part of the next batch
+
+        Args:
+            item: Input passed to process_batch together with other callers' items
+            prepare: Optional function applied to item in the calling thread first
+                     (the worker waits for callers that are still preparing)
+
+        Returns:
+            This item's result (exceptions from process_batch are re-raised)
+        """
+        self._ensure_worker()
+        with self._condition:
+            self._arriving += 1
+        try:
+            if prepare is not None:
+                item = prepare(item)
+        except Exception:
+            with self._condition:
+                self._arriving -= 1
+                self._condition.notify()
+            raise
+
+        future = Future()
+        with self._condition:
+            self._pending.append((item, future, time.perf_counter()))
+            self._condition.notify()
+        return future.result()
+
+    def _ensure_worker(self) -> None:
+        # Threads do not survive fork, so pre-forking servers get a worker per process
+        if self._worker is not None and self._worker_pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._worker is None or self._worker_pid != os.getpid():
+                if self._worker_pid is not None:
+                    self._reset()
+                self._worker = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._worker_pid = os.getpid()
+                self._worker.start()
+
+    def _collect(self) -> list:
+        """Wait for the first item, then for more until the batch is full, complete or out of time"""
+        with self._condition:
+            while not self._pending:
+                self._condition.wait()
+            deadline = self._pending[0][2] + self.max_wait
+            while len(self._pending) < min(self.max_batch_size, self._arriving):
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+
+            size = min(len(self._pending), self.max_batch_size)
+            batch = [self._pending.popleft() for _ in range(size)]
+            self._arriving -= size
+            return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            for _, _, queued_at in batch:
+                self.queue_wait.record(started - queued_at)
+            self.batch_sizes.record(len(batch))
+            self.stats['batches'] += 1
+            self.stats['items'] += len(batch)
+
+            try:
+                results = self.process_batch([item for item, _, _ in batch])
+                if len(results) != len(batch):
+                    raise ValueError(f"process_batch returned {len(results)} results for {len(batch)} items")
+            except Exception as e:
+                self.stats['errors'] += 1
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+
+            for (_, future, _), result in zip(batch, results):
+                future.set_result(result)
+
+    def get_stats(self) -> dict:
+        """Counters, batch-size distribution and queue-wait latency (seconds)"""
+        batches = self.stats['batches']
+        return {
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000,
+            'counters': dict(self.stats),
+            'mean_batch_size': self.stats['items'] / batches if batches else None,
+            'batch_size': self.batch_sizes.snapshot(),
+            'queue_wait': self.queue_wait.snapshot(),
+        }
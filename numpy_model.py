@@ -0,0 +1,177 @@
+"""
+TensorFlow-free inference for the intent classifier
+
+train_chatbot.py exports the Dense layers of the trained Keras model to
+chatbot_model.npz. NumpyMLP runs the same forward pass with plain NumPy, so
+serving the classifier never imports TensorFlow.
+
+Convert an existing Keras model and check that both give the same outputs
+(exits with status 1, without leaving the weights file, if they do not):
+    python numpy_model.py chatbot_model.h5 chatbot_model.npz
+"""
+import os
+import sys
+
+import numpy as np
+
+
+# Largest acceptable |keras - numpy| output difference (float32 round-off stays far below it)
+PARITY_TOLERANCE = 1e-4
+
+
+class ParityError(Exception):
+    """Raised when the exported NumPy model's outputs differ from the Keras model's"""
+
+
+def _relu(x):
+    return np.maximum(x, 0, out=x)
+
+
+def _softmax(x):
+    x -= x.max(axis=1, keepdims=True)
+    np.exp(x, out=x)
+    x /= x.sum(axis=1, keepdims=True)
+    return x
+
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+ACTIVATIONS = {
+    'relu': _relu,
+    'softmax': _softmax,
+    'sigmoid': _sigmoid,
+    'tanh': np.tanh,
+    'linear': lambda x: x,
+}
+
+
+class NumpyMLP:
+    """Stack of Dense layers evaluated with NumPy (Dropout is a no-op at inference)"""
+
+    def __init__(self, kernels, biases, activations):
+        """
+        Initialize the model
+
+        Args:
+            kernels: Weight matrices, one (inputs, units) array per layer
+            biases: Bias vectors, one per layer
+            activations: Activation name per layer (see ACTIVATIONS)
+        """
+        self.kernels = [np.ascontiguousarray(k, dtype=np.float32) for k in kernels]
+        self.biases = [np.asarray(b, dtype=np.float32) for b in biases]
+        self.activations = [ACTIVATIONS[name] for name in activations]
+        self.activation_names = list(activations)
+
+    @property
+    def input_size(self) -> int:
+        return self.kernels[0].shape[0]
+
+    @property
+    def output_size(self) -> int:
+        return self.kernels[-1].shape[1]
+
+    @classmethod
+    def load(cls, path: str) -> 'NumpyMLP':
+        """Load weights written by export_keras_model()"""
+        with np.load(path, allow_pickle=False) as data:
+            layers = int(data['layers'])
+            return cls(
+                [data[f'kernel_{i}'] for i in range(layers)],
+                [data[f'bias_{i}'] for i in range(layers)],
+                [str(name) for name in data['activations']],
+            )
+
+    def save(self, path: str) -> None:
+        arrays = {'layers': np.array(len(self.kernels)), 'activations': np.array(self.activation_names)}
+        for i, (kernel, bias) in enumerate(zip(self.kernels, self.biases)):
+            arrays[f'kernel_{i}'] = kernel
+            arrays[f'bias_{i}'] = bias
+        np.savez(path, **arrays)
+
+    def predict_on_batch(self, x) -> np.ndarray:
+        """Forward pass over a (batch, inputs) matrix; returns (batch, outputs) probabilities"""
+        x = np.asarray(x, dtype=np.float32)
+        for kernel, bias, activation in zip(self.kernels, self.biases, self.activations):
+            x = x @ kernel
+            x += bias
+            x = activation(x)
+        return x
+
+    def predict(self, x, verbose=0) -> np.ndarray:
+        """Keras-compatible alias of predict_on_batch"""
+        return self.predict_on_batch(x)
+
+
+def export_keras_model(model, path: str) -> NumpyMLP:
+    """
+    Export the Dense layers of a Keras Sequential model to a .npz file
+
+    Args:
+        model: Trained Keras model made of Dense (and Dropout) layers
+        path: Output .npz path
+
+    Returns:
+        The equivalent NumpyMLP
+    """
+    kernels, biases, activations = [], [], []
+    for layer in model.layers:
+        if layer.__class__.__name__ == 'Dropout':
+            continue
+        if layer.__class__.__name__ != 'Dense':
+            raise ValueError(f"Cannot export layer type {layer.__class__.__name__}")
+        kernel, bias = layer.get_weights()
+        kernels.append(kernel)
+        biases.append(bias)
+        activations.append(layer.get_config()['activation'])
+
+    mlp = NumpyMLP(kernels, biases, activations)
+    mlp.save(path)
+    return mlp
+
+
+def check_parity(keras_model, mlp: NumpyMLP, samples: int = 256, seed: int = 0) -> float:
+    """Largest absolute difference between Keras and NumPy outputs on random bag-of-words inputs"""
+    rng = np.random.default_rng(seed)
+    x = (rng.random((samples, mlp.input_size)) < 0.02).astype(np.float32)
+    expected = np.asarray(keras_model.predict_on_batch(x))
+    return float(np.abs(expected - mlp.predict_on_batch(x)).max())
+
+
+def assert_parity(keras_model, mlp: NumpyMLP, tolerance: float = PARITY_TOLERANCE) -> float:
+    """
+    Check that the NumPy model reproduces the Keras model's outputs
+
+    Returns:
+        The largest absolute difference found
+
+    Raises:
+        ParityError: The difference exceeds the tolerance
+    """
+    difference = check_parity(keras_model, mlp)
+    if not difference <= tolerance:
+        raise ParityError(f"Max |keras - numpy| = {difference:.2e} exceeds the tolerance of {tolerance:.0e}")
+    return difference
+
+
+def main():
+    source = sys.argv[1] if len(sys.argv) > 1 else 'chatbot_model.h5'
+    target = sys.argv[2] if len(sys.argv) > 2 else 'chatbot_model.npz'
+
+    from tensorflow.keras.models import load_model
+    keras_model = load_model(source)
+    mlp = export_keras_model(keras_model, target)
+    try:
+        difference = assert_parity(keras_model, mlp)
+    except ParityError as e:
+        # Without the weights file the server keeps using the Keras model
+        os.remove(target)
+        print(f"❌ Outputs differ more than expected, removed {target}: {e}")
+        sys.exit(1)
+    print(f"✅ Exported {source} -> {target} ({len(mlp.kernels)} Dense layers)")
+    print(f"Max |keras - numpy| over random inputs: {difference:.2e}")
+
+
+if __name__ == "__main__":
+    main()
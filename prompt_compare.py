@@ -0,0 +1,150 @@
+"""
+Offline comparison of the system prompt variants
+
+Sends the same health questions to the configured provider once per prompt
+variant (bypassing every cache) and reports latency, tokens, estimated cost
+and a rule-based quality score for the answers.
+
+Usage:
+    python prompt_compare.py                          # full vs. compact on the built-in questions
+    python prompt_compare.py --provider gemini --questions questions.txt --json results.json
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import time
+from typing import Dict, List
+
+from dotenv import load_dotenv
+
+from llm_chatbot import LLMHealthChatbot
+from token_accounting import TokenLedger, estimate_tokens
+
+SAMPLE_QUESTIONS = [
+    "I have knee pain after running",
+    "My eyes feel tired after working on the computer",
+    "What can I do about a sore throat?",
+    "I get headaches every afternoon",
+    "My stomach hurts after eating spicy food",
+    "I have a dry cough that won't go away",
+    "My lower back aches when I sit for long",
+    "What should I take for a mild fever?",
+    "I feel dizzy when I stand up quickly",
+    "Can you help me sleep better? I have insomnia",
+]
+
+DISCLAIMER = "I am an AI, not a doctor"
+SECTIONS = ("Potential Causes", "Home Remedies", "When to See a Doctor")
+# Prescription-only drug classes the prompt forbids recommending
+PRESCRIPTION_TERMS = re.compile(r'\b(antibiotic|amoxicillin|steroid|prednisone|opioid|codeine|oxycodone|tramadol)s?\b', re.I)
+
+
+def score_answer(answer: str) -> Dict[str, bool]:
+    """Rule-based quality checks for one answer"""
+    return {
+        'disclaimer': DISCLAIMER in answer,
+        'acknowledgment': 'I understand you are experiencing' in answer,
+        'sections': all(section in answer for section in SECTIONS),
+        'html': '<ul>' in answer and '<li>' in answer,
+        'no_prescription': not PRESCRIPTION_TERMS.search(answer) or 'never' in answer.lower(),
+    }
+
+
+def run_variant(provider: str, variant: str, questions: List[str], timeout: float) -> dict:
+    """Ask every question with one prompt variant and summarise the results"""
+    ledger = TokenLedger.from_env()
+    bot = LLMHealthChatbot(api_provider=provider, use_fallback=False, prompt_variant=variant, token_ledger=ledger)
+    rows = []
+    for question in questions:
+        started = time.perf_counter()
+        try:
+            answer = bot._call_provider(question, deadline=time.monotonic() + timeout)
+            error = None
+        except Exception as e:
+            answer, error = '', f"{type(e).__name__}: {e}"
+        latency = time.perf_counter() - started
+        usage = ledger.recent[-1] if ledger.recent and not error else {}
+        checks = score_answer(answer)
+        rows.append({
+            'question': question,
+            'latency_s': round(latency, 3),
+            'prompt_tokens': usage.get('prompt_tokens'),
+            'completion_tokens': usage.get('completion_tokens'),
+            'cost_usd': usage.get('cost_usd'),
+            'quality': round(sum(checks.values()) / len(checks), 2) if not error else 0.0,
+            'checks': checks,
+            'error': error,
+            'answer': answer,
+        })
+
+    ok = [row for row in rows if not row['error']]
+    latencies = sorted(row['latency_s'] for row in ok)
+
+    def mean(key):
+        values = [row[key] for row in ok if row[key] is not None]
+        return statistics.mean(values) if values else None
+
+    return {
+        'variant': variant,
+        'system_prompt_tokens_est': estimate_tokens(bot.system_prompt),
+        'answered': len(ok),
+        'errors': len(rows) - len(ok),
+        'latency_p50_s': statistics.median(latencies) if latencies else None,
+        'latency_max_s': latencies[-1] if latencies else None,
+        'mean_prompt_tokens': mean('prompt_tokens'),
+        'mean_completion_tokens': mean('completion_tokens'),
+        'mean_cost_usd': mean('cost_usd'),
+        'mean_quality': mean('quality'),
+        'disclaimer_rate': statistics.mean(row['checks']['disclaimer'] for row in ok) if ok else None,
+        'rows': rows,
+    }
+
+
+def _fmt(value, spec: str) -> str:
+    return format(value, spec) if value is not None else '-'
+
+
+def print_summary(results: List[dict]) -> None:
+    print(f"{'variant':>8} {'sys tok':>8} {'ok/err':>7} {'p50 s':>7} {'max s':>7} {'prompt':>8} "
+          f"{'compl.':>7} {'cost $':>9} {'quality':>8} {'discl.':>7}")
+    for result in results:
+        print(f"{result['variant']:>8} {result['system_prompt_tokens_est']:>8} "
+              f"{result['answered']:>3}/{result['errors']:<3} {_fmt(result['latency_p50_s'], '7.2f')} "
+              f"{_fmt(result['latency_max_s'], '7.2f')} {_fmt(result['mean_prompt_tokens'], '8.0f')} "
+              f"{_fmt(result['mean_completion_tokens'], '7.0f')} {_fmt(result['mean_cost_usd'], '9.6f')} "
+              f"{_fmt(result['mean_quality'], '8.2f')} {_fmt(result['disclaimer_rate'], '7.2f')}")
+
+
+def main(argv=None):
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Compare answer quality, latency and cost between prompt variants.")
+    parser.add_argument('--provider', default=os.getenv("LLM_PROVIDER", "openai"), choices=['openai', 'gemini'])
+    parser.add_argument('--variants', nargs='+', default=list(LLMHealthChatbot.SYSTEM_PROMPTS),
+                        choices=list(LLMHealthChatbot.SYSTEM_PROMPTS))
+    parser.add_argument('--questions', help="Text file with one question per line (default: built-in samples)")
+    parser.add_argument('--timeout', type=float, default=60.0, help="Seconds allowed per answer")
+    parser.add_argument('--json', help="Write every answer and measurement to this file")
+    args = parser.parse_args(argv)
+
+    questions = SAMPLE_QUESTIONS
+    if args.questions:
+        with open(args.questions, encoding='utf-8') as f:
+            questions = [line.strip() for line in f if line.strip()]
+
+    results = []
+    for variant in args.variants:
+        print(f"Asking {len(questions)} questions with the {variant} prompt ({args.provider})...")
+        results.append(run_variant(args.provider, variant, questions, args.timeout))
+    print()
+    print_summary(results)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n✅ Wrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
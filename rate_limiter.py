@@ -0,0 +1,274 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, NamedTuple, Optional, Tuple
+
+
+class RateLimitedError(Exception):
+    """Raised when an LLM-bound request is refused and the limiter is in reject mode"""
+
+    def __init__(self, retry_after: float, reason: str):
+        super().__init__(f"Rate limited ({reason}); retry after {retry_after:.1f}s")
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+def refill(tokens: float, updated_at: float, now: float, rate: float, burst: float) -> float:
+    """Tokens in a bucket at `now`, given its level at `updated_at`"""
+    return min(burst, tokens + max(0.0, now - updated_at) * rate)
+
+
+def take_tokens(tokens: float, rate: float, cost: float, max_debt: float) -> Tuple[bool, float, float]:
+    """
+    Token bucket decision on an already refilled level
+
+    The level may go negative by up to `max_debt` tokens: those are requests
+    queued for tokens that have not been refilled yet, each waiting its turn.
+
+    Returns:
+        (allowed, seconds, new_level): seconds is the wait before proceeding if
+        allowed, else how long until a retry could be admitted
+    """
+    remaining = tokens - cost
+    if remaining >= -max_debt:
+        return True, max(0.0, -remaining) / rate, remaining
+    return False, (cost - max_debt - tokens) / rate, tokens
+
+
+class MemoryBucketStore:
+    """Token buckets of this process"""
+
+    def __init__(self, max_buckets: int = 100000):
+        self.max_buckets = max_buckets
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def take(self, key: str, rate: float, burst: float, cost: float = 1.0,
+             max_debt: float = 0.0) -> Tuple[bool, float]:
+        """Take `cost` tokens from bucket `key` (a negative cost returns tokens); see take_tokens"""
+        now = time.time()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (burst, now))
+            tokens = refill(tokens, updated_at, now, rate, burst)
+            allowed, seconds, tokens = take_tokens(tokens, rate, cost, max_debt)
+            if len(self._buckets) >= self.max_buckets and key not in self._buckets:
+                self._prune(now, rate, burst)
+            self._buckets[key] = (min(burst, tokens), now)
+        return allowed, seconds
+
+    def _prune(self, now: float, rate: float, burst: float) -> None:
+        """Forget buckets that have refilled completely (they are equivalent to new ones)"""
+        full = [key for key, (tokens, updated_at) in self._buckets.items()
+                if refill(tokens, updated_at, now, rate, burst) >= burst]
+        for key in full:
+            del self._buckets[key]
+        if len(self._buckets) >= self.max_buckets:
+            self._buckets.clear()
+
+
+class SQLiteBucketStore:
+    """
+    Token buckets in a SQLite file, shared by every worker process on the host
+
+    Each take is one IMMEDIATE transaction, so workers see a single global
+    level. If the file cannot be used the buckets of this process are used
+    instead (the limiter degrades to per-worker limits rather than failing).
+    Idle buckets are purged at startup and every `purge_every` takes, so the
+    table holds the recently active clients rather than every client ever seen.
+    """
+
+    def __init__(self, db_path: str, idle_seconds: float = 3600.0, purge_every: int = 1000):
+        """
+        Initialize the store
+
+        Args:
+            db_path: SQLite file shared by the worker processes
+            idle_seconds: Buckets untouched for this long are dropped (they have long since refilled)
+            purge_every: Takes by this process between purges
+        """
+        self.db_path = db_path
+        self.idle_seconds = idle_seconds
+        self.purge_every = max(1, purge_every)
+        self._local = threading.local()
+        self._fallback = MemoryBucketStore()
+        self._lock = threading.Lock()
+        self._takes_since_purge = 0
+        self.errors = 0
+        try:
+            self._connection().execute(
+                "CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+            self.purge_idle()
+        except sqlite3.Error as e:
+            print(f"⚠️  Shared rate limit store unavailable, limiting per worker: {e}")
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.db_path, timeout=1.0, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def take(self, key: str, rate: float, burst: float, cost: float = 1.0,
+             max_debt: float = 0.0) -> Tuple[bool, float]:
+        try:
+            connection = self._connection()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                row = connection.execute("SELECT tokens, updated_at FROM buckets WHERE key = ?", (key,)).fetchone()
+                tokens = refill(row[0], row[1], now, rate, burst) if row else burst
+                allowed, seconds, tokens = take_tokens(tokens, rate, cost, max_debt)
+                connection.execute("INSERT OR REPLACE INTO buckets (key, tokens, updated_at) VALUES (?, ?, ?)",
+                                   (key, min(burst, tokens), now))
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+        except sqlite3.Error:
+            self.errors += 1
+            return self._fallback.take(key, rate, burst, cost, max_debt)
+
+        with self._lock:
+            self._takes_since_purge += 1
+            due = self._takes_since_purge >= self.purge_every
+            if due:
+                self._takes_since_purge = 0
+        if due:
+            self.purge_idle()
+        return allowed, seconds
+
+    def purge_idle(self, older_than: Optional[float] = None) -> None:
+        """Drop buckets untouched for `older_than` seconds (default idle_seconds)"""
+        cutoff = time.time() - (self.idle_seconds if older_than is None else older_than)
+        try:
+            self._connection().execute("DELETE FROM buckets WHERE updated_at < ?", (cutoff,))
+        except sqlite3.Error:
+            self.errors += 1
+
+
+class Admission(NamedTuple):
+    """Outcome of an admission check"""
+    allowed: bool
+    # Seconds to wait before calling the provider (allowed) or before retrying (refused)
+    wait: float
+    # 'admitted', 'queued', 'client_limit' or 'global_limit'
+    reason: str
+
+
+class AdmissionController:
+    """
+    Token-bucket admission for LLM-bound requests
+
+    Each request takes a token from its client's bucket and from the global
+    bucket. A client over its rate is refused at once. When the global bucket
+    is empty the request may queue: it reserves a future token and waits for
+    it, as long as at most `max_queue` requests are waiting and the wait stays
+    under `max_queue_seconds`. Otherwise it is refused, and the chatbot serves
+    the local fallback answer (or raises RateLimitedError in reject mode).
+    """
+
+    GLOBAL_KEY = 'global'
+
+    def __init__(self, global_rate: Optional[float] = None, global_burst: Optional[float] = None,
+                 client_rate: Optional[float] = None, client_burst: Optional[float] = None,
+                 max_queue: int = 0, max_queue_seconds: float = 0.0, store=None, reject: bool = False):
+        """
+        Initialize the controller
+
+        Args:
+            global_rate: Provider calls per second across all clients (None for no global limit)
+            global_burst: Global bucket size (defaults to one second of calls)
+            client_rate: Provider calls per second per client (None for no per-client limit)
+            client_burst: Per-client bucket size (defaults to 1 or one second of calls)
+            max_queue: Requests allowed to wait for a global token
+            max_queue_seconds: Longest a queued request may wait
+            store: Bucket store (MemoryBucketStore or SQLiteBucketStore; defaults to memory)
+            reject: If True, refused requests raise RateLimitedError instead of getting a fallback answer
+        """
+        self.global_rate = global_rate
+        self.global_burst = global_burst if global_burst is not None else max(1.0, global_rate or 0.0)
+        self.client_rate = client_rate
+        self.client_burst = client_burst if client_burst is not None else max(1.0, client_rate or 0.0)
+        self.max_queue = max_queue
+        self.max_queue_seconds = max_queue_seconds
+        self.store = store if store is not None else MemoryBucketStore()
+        self.reject = reject
+        self._lock = threading.Lock()
+        self.stats = {'admitted': 0, 'queued': 0, 'client_limit': 0, 'global_limit': 0}
+
+    @classmethod
+    def from_env(cls) -> Optional['AdmissionController']:
+        """
+        Controller configured from RATE_LIMIT_* environment variables
+
+        Returns:
+            None unless RATE_LIMIT_RPS or RATE_LIMIT_CLIENT_RPM is set
+        """
+        global_rps = os.getenv("RATE_LIMIT_RPS")
+        client_rpm = os.getenv("RATE_LIMIT_CLIENT_RPM")
+        if not global_rps and not client_rpm:
+            return None
+        db_path = os.getenv("RATE_LIMIT_DB")
+        return cls(
+            global_rate=float(global_rps) if global_rps else None,
+            global_burst=float(os.getenv("RATE_LIMIT_BURST")) if os.getenv("RATE_LIMIT_BURST") else None,
+            client_rate=float(client_rpm) / 60 if client_rpm else None,
+            client_burst=float(os.getenv("RATE_LIMIT_CLIENT_BURST")) if os.getenv("RATE_LIMIT_CLIENT_BURST") else None,
+            max_queue=int(os.getenv("RATE_LIMIT_QUEUE", "16")),
+            max_queue_seconds=float(os.getenv("RATE_LIMIT_QUEUE_SECONDS", "2")),
+            store=SQLiteBucketStore(db_path) if db_path else MemoryBucketStore(),
+            reject=os.getenv("RATE_LIMIT_MODE", "fallback").lower() == "reject",
+        )
+
+    def admit(self, client_id: Optional[str] = None) -> Admission:
+        """
+        Decide on one LLM-bound request (without waiting)
+
+        Args:
+            client_id: Client identity; requests without one share the 'anonymous' bucket
+
+        Returns:
+            Admission; when allowed, the caller sleeps `wait` seconds before the provider call
+        """
+        client_key = f"client:{client_id or 'anonymous'}"
+        if self.client_rate:
+            allowed, seconds = self.store.take(client_key, self.client_rate, self.client_burst)
+            if not allowed:
+                return self._count(Admission(False, seconds, 'client_limit'))
+
+        if self.global_rate:
+            max_debt = min(float(self.max_queue), self.max_queue_seconds * self.global_rate)
+            allowed, seconds = self.store.take(self.GLOBAL_KEY, self.global_rate, self.global_burst,
+                                               max_debt=max_debt)
+            if not allowed:
+                if self.client_rate:
+                    # The request never ran, so the client gets its token back
+                    self.store.take(client_key, self.client_rate, self.client_burst, cost=-1.0)
+                return self._count(Admission(False, seconds, 'global_limit'))
+            if seconds > 0:
+                return self._count(Admission(True, seconds, 'queued'))
+
+        return self._count(Admission(True, 0.0, 'admitted'))
+
+    def _count(self, admission: Admission) -> Admission:
+        with self._lock:
+            self.stats[admission.reason] += 1
+        return admission
+
+    def get_stats(self) -> dict:
+        """Decision counters and the configured limits"""
+        with self._lock:
+            counters = dict(self.stats)
+        return {
+            'counters': counters,
+            'global_rate': self.global_rate,
+            'client_rate': self.client_rate,
+            'max_queue': self.max_queue,
+            'max_queue_seconds': self.max_queue_seconds,
+            'mode': 'reject' if self.reject else 'fallback',
+            'shared': isinstance(self.store, SQLiteBucketStore),
+        }
@@ -0,0 +1,217 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+_WHITESPACE_RE = re.compile(r'\s+')
+_TRAILING_PUNCT_RE = re.compile(r'[\s?!.,;:]+$')
+
+
+def normalize_question(text: str) -> str:
+    """Normalize a user question so trivially different phrasings share a cache key"""
+    text = _WHITESPACE_RE.sub(' ', text.lower()).strip()
+    return _TRAILING_PUNCT_RE.sub('', text)
+
+
+def prompt_hash(prompt: str) -> str:
+    """Short, stable fingerprint of a system prompt"""
+    return hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:16]
+
+
+def make_cache_key(user_input: str, provider: str, model: str, system_prompt: str) -> str:
+    """
+    Build the cache key for an LLM answer
+
+    Editing the system prompt changes its hash, so stale answers are never
+    served after a prompt change.
+    """
+    raw = '\x1f'.join((normalize_question(user_input), provider, model, prompt_hash(system_prompt)))
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """Two-tier LLM response cache: in-process LRU with TTL plus an optional shared SQLite store"""
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 3600, db_path: Optional[str] = None,
+                 max_rows: int = 10000, purge_every: int = 100):
+        """
+        Initialize the cache
+
+        Args:
+            max_entries: Maximum number of entries kept in memory (0 disables the memory tier)
+            ttl_seconds: Time-to-live of an entry in both tiers
+            db_path: SQLite file shared by all worker processes (None disables the disk tier)
+            max_rows: Rows kept in the disk tier, oldest evicted first (0 = unbounded)
+            purge_every: Writes by this process between purges of the disk tier
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path
+        self.max_rows = max_rows
+        self.purge_every = max(1, purge_every)
+        self._writes_since_purge = 0
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.stats = {
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'expirations': 0,
+            'stores': 0,
+            'disk_evictions': 0,
+            'disk_errors': 0,
+        }
+
+        if self.db_path:
+            try:
+                self._connection().execute(
+                    "CREATE TABLE IF NOT EXISTS responses ("
+                    "key TEXT PRIMARY KEY, response TEXT NOT NULL, expires_at REAL NOT NULL)"
+                )
+                # Every entry has the same TTL, so the earliest expiry is also the oldest write
+                self._connection().execute(
+                    "CREATE INDEX IF NOT EXISTS responses_expires_at ON responses (expires_at)"
+                )
+                self.purge_expired()
+            except sqlite3.Error as e:
+                print(f"⚠️  Response cache disk tier disabled: {e}")
+                self.db_path = None
+
+    @classmethod
+    def from_env(cls) -> 'ResponseCache':
+        """Build a cache from RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL, RESPONSE_CACHE_DB and RESPONSE_CACHE_DB_ROWS"""
+        return cls(
+            max_entries=int(os.getenv("RESPONSE_CACHE_SIZE", "1024")),
+            ttl_seconds=float(os.getenv("RESPONSE_CACHE_TTL", "3600")),
+            db_path=os.getenv("RESPONSE_CACHE_DB") or None,
+            max_rows=int(os.getenv("RESPONSE_CACHE_DB_ROWS", "10000")),
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        """One SQLite connection per thread; WAL lets many workers read concurrently"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.db_path, timeout=1.0, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def _count(self, stat: str) -> None:
+        with self._lock:
+            self.stats[stat] += 1
+
+    def _remember(self, key: str, response: str, expires_at: float) -> None:
+        """Insert into the memory tier, evicting the least recently used entries"""
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (response, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look up a cached response
+
+        Args:
+            key: Key from make_cache_key()
+
+        Returns:
+            The cached response, or None on a miss
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._entries.move_to_end(key)
+                    self.stats['memory_hits'] += 1
+                    return entry[0]
+                del self._entries[key]
+                self.stats['expirations'] += 1
+
+        if self.db_path:
+            try:
+                row = self._connection().execute(
+                    "SELECT response, expires_at FROM responses WHERE key = ? AND expires_at > ?",
+                    (key, now)
+                ).fetchone()
+            except sqlite3.Error:
+                row = None
+                self._count('disk_errors')
+            if row:
+                self._remember(key, row[0], row[1])
+                self._count('disk_hits')
+                return row[0]
+
+        self._count('misses')
+        return None
+
+    def set(self, key: str, response: str) -> None:
+        """Store a response in both tiers"""
+        expires_at = time.time() + self.ttl_seconds
+        self._remember(key, response, expires_at)
+        self._count('stores')
+
+        if self.db_path:
+            try:
+                self._connection().execute(
+                    "INSERT OR REPLACE INTO responses (key, response, expires_at) VALUES (?, ?, ?)",
+                    (key, response, expires_at)
+                )
+            except sqlite3.Error:
+                self._count('disk_errors')
+                return
+            with self._lock:
+                self._writes_since_purge += 1
+                due = self._writes_since_purge >= self.purge_every
+                if due:
+                    self._writes_since_purge = 0
+            if due:
+                self.purge_expired()
+
+    def purge_expired(self) -> None:
+        """
+        Drop expired rows from the disk tier, then the oldest rows beyond max_rows
+
+        Runs at startup and every purge_every writes, so between purges the
+        table can briefly exceed max_rows by the writes of every worker.
+        """
+        if self.db_path:
+            try:
+                connection = self._connection()
+                connection.execute("DELETE FROM responses WHERE expires_at <= ?", (time.time(),))
+                if self.max_rows > 0:
+                    evicted = connection.execute(
+                        "DELETE FROM responses WHERE key IN ("
+                        "SELECT key FROM responses ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+                        (self.max_rows,)
+                    ).rowcount
+                    if evicted > 0:
+                        with self._lock:
+                            self.stats['disk_evictions'] += evicted
+            except sqlite3.Error:
+                self._count('disk_errors')
+
+    def clear(self) -> None:
+        """Remove every entry from both tiers"""
+        with self._lock:
+            self._entries.clear()
+        if self.db_path:
+            self._connection().execute("DELETE FROM responses")
+
+    def get_stats(self) -> Dict[str, int]:
+        """Snapshot of the hit/miss/eviction counters"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['memory_entries'] = len(self._entries)
+        return stats
@@ -0,0 +1,272 @@
+import os
+import re
+import threading
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Words that carry no meaning for matching health questions
+STOP_WORDS = frozenset("""
+a an the i im i'm ive i've me my mine we our you your it its is am are was were be been being
+have has had do does did can could should would will shall may might must to of in on at for
+with and or but so if then than that this these those there here what which who whom how why
+when where very really lot lots bit little quite just too much many some any bad badly feel
+feeling felt get getting got since about from by as up down out now today
+""".split())
+
+# Paraphrases collapsed onto one canonical token before hashing
+SYNONYMS = {
+    'hurt': 'pain', 'hurts': 'pain', 'hurting': 'pain', 'ache': 'pain', 'aches': 'pain',
+    'aching': 'pain', 'painful': 'pain', 'sore': 'pain', 'pains': 'pain',
+    'belly': 'stomach', 'tummy': 'stomach', 'abdominal': 'stomach', 'abdomen': 'stomach',
+    'migraine': 'headache', 'lightheaded': 'dizzy', 'dizziness': 'dizzy', 'vertigo': 'dizzy',
+    'reduce': 'relieve', 'ease': 'relieve', 'treat': 'relieve', 'cure': 'relieve',
+    'tired': 'fatigue', 'exhausted': 'fatigue', 'sleepy': 'fatigue',
+}
+
+_TOKEN_RE = re.compile(r"[a-z][a-z']*")
+
+
+class HashingVectorizer:
+    """Offline text embedder: lemmatized unigrams and bigrams hashed into a fixed-size vector"""
+
+    def __init__(self, dim: int = 512):
+        """
+        Initialize the vectorizer
+
+        Args:
+            dim: Number of hash buckets (vector dimension)
+        """
+        self.dim = dim
+        self._lemmatize = self._load_lemmatizer()
+
+    @staticmethod
+    def _load_lemmatizer():
+        """Use the same WordNet lemmatizer as healthcare_chatbot.py when NLTK data is installed"""
+        try:
+            from nltk.stem import WordNetLemmatizer
+            lemmatizer = WordNetLemmatizer()
+            lemmatizer.lemmatize('eyes')
+            return lemmatizer.lemmatize
+        except Exception:
+            return lambda word: word[:-1] if len(word) > 3 and word.endswith('s') and not word.endswith('ss') else word
+
+    def tokens(self, text: str) -> List[str]:
+        """Lowercase, drop stop words, lemmatize and canonicalize synonyms"""
+        result = []
+        for word in _TOKEN_RE.findall(text.lower()):
+            if word in STOP_WORDS:
+                continue
+            word = SYNONYMS.get(word, word)
+            word = self._lemmatize(word)
+            result.append(SYNONYMS.get(word, word))
+        return result
+
+    def features(self, text: str) -> Dict[int, float]:
+        """Sparse features: 32-bit gram hash -> weight (unigrams 1.0, bigrams 0.5)"""
+        words = self.tokens(text)
+        grams = [(word, 1.0) for word in words]
+        grams += [(f"{a} {b}", 0.5) for a, b in zip(words, words[1:])]
+
+        features: Dict[int, float] = {}
+        for gram, weight in grams:
+            digest = zlib.crc32(gram.encode('utf-8'))
+            features[digest] = features.get(digest, 0.0) + weight
+        return features
+
+    def to_vector(self, features: Dict[int, float]) -> np.ndarray:
+        """Fold features into `dim` signed buckets and L2-normalize"""
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for digest, weight in features.items():
+            sign = 1.0 if (digest >> 31) & 1 == 0 else -1.0
+            vector[digest % self.dim] += sign * weight
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return vector
+
+
+class SemanticCache:
+    """
+    Near-duplicate LLM answer cache backed by a NumPy embedding matrix
+
+    Rows live in a fixed-capacity ring buffer (the oldest entry is overwritten
+    once full). An inverted index from gram hash to rows narrows each lookup
+    to the entries sharing one of the question's rarer features, which keeps
+    thresholded search sub-millisecond even with 100k entries.
+    """
+
+    def __init__(self, capacity: int = 10000, threshold: float = 0.85, dim: int = 512,
+                 vectorizer: Optional[HashingVectorizer] = None):
+        """
+        Initialize the cache
+
+        Args:
+            capacity: Maximum number of cached questions
+            threshold: Minimum cosine similarity for a cache hit
+            dim: Embedding dimension (ignored if a vectorizer is given)
+            vectorizer: Custom vectorizer instance
+        """
+        self.capacity = capacity
+        self.threshold = threshold
+        self.vectorizer = vectorizer or HashingVectorizer(dim)
+        self._matrix = np.zeros((min(capacity, 1024), self.vectorizer.dim), dtype=np.float32)
+        self._answers: List[Optional[str]] = []
+        self._namespace_ids: Dict[str, int] = {}
+        self._row_namespace = np.zeros(self._matrix.shape[0], dtype=np.int32)
+        self._row_features: List[Tuple[int, ...]] = []
+        self._postings: Dict[int, set] = {}
+        self._next_row = 0
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+
+    @classmethod
+    def from_env(cls) -> Optional['SemanticCache']:
+        """Build a cache if SEMANTIC_CACHE is enabled; reads SEMANTIC_CACHE_SIZE/THRESHOLD/DIM"""
+        if os.getenv("SEMANTIC_CACHE", "").lower() not in ("1", "true", "yes"):
+            return None
+        return cls(
+            capacity=int(os.getenv("SEMANTIC_CACHE_SIZE", "10000")),
+            threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.85")),
+            dim=int(os.getenv("SEMANTIC_CACHE_DIM", "512")),
+        )
+
+    def __len__(self) -> int:
+        return len(self._answers)
+
+    def _ensure_capacity(self, rows: int) -> None:
+        """Grow the matrix geometrically up to the configured capacity"""
+        if rows <= self._matrix.shape[0]:
+            return
+        new_rows = min(self.capacity, max(rows, self._matrix.shape[0] * 2))
+        grown = np.zeros((new_rows, self._matrix.shape[1]), dtype=np.float32)
+        grown[:self._matrix.shape[0]] = self._matrix
+        self._matrix = grown
+        self._row_namespace = np.resize(self._row_namespace, new_rows)
+
+    def _candidates(self, features: Dict[int, float], query: np.ndarray,
+                    min_similarity: Optional[float]) -> set:
+        """
+        Rows that can possibly reach min_similarity (prefix filtering)
+
+        A row sharing none of the query's grams in a set P has similarity at most
+        ||query outside P||, so when that norm is below min_similarity only the
+        postings of P need to be scanned. P is built from the rarest grams.
+        (Bucket collisions in the dense vector make the bound approximate.)
+        """
+        grams = sorted(features, key=lambda gram: len(self._postings.get(gram, ())))
+        if min_similarity is not None:
+            total = sum(weight * weight for weight in features.values())
+            limit = min_similarity * min_similarity * total
+            remaining = 0.0
+            # Drop the most common grams while their combined mass stays below the bound
+            while grams:
+                weight = features[grams[-1]] ** 2
+                if remaining + weight >= limit:
+                    break
+                remaining += weight
+                grams.pop()
+
+        candidates = set()
+        for gram in grams:
+            candidates.update(self._postings.get(gram, ()))
+        return candidates
+
+    def search(self, question: str, namespace: str = '', k: int = 1,
+               min_similarity: Optional[float] = None) -> List[Tuple[float, str]]:
+        """
+        Find the k most similar cached questions
+
+        Args:
+            question: The user's message
+            namespace: Only entries stored under this namespace are considered
+            k: Number of results
+            min_similarity: If set, entries below this similarity may be skipped
+
+        Returns:
+            List of (similarity, answer), most similar first
+        """
+        features = self.vectorizer.features(question)
+        if not features:
+            return []
+        query = self.vectorizer.to_vector(features)
+
+        with self._lock:
+            namespace_id = self._namespace_ids.get(namespace)
+            if namespace_id is None:
+                return []
+            candidates = self._candidates(features, query, min_similarity)
+            if not candidates:
+                return []
+
+            rows = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+            rows = rows[self._row_namespace[rows] == namespace_id]
+            if len(rows) == 0:
+                return []
+
+            scores = self._matrix[rows] @ query
+            if len(rows) > k:
+                top = np.argpartition(-scores, k - 1)[:k]
+            else:
+                top = np.arange(len(rows))
+            top = top[np.argsort(-scores[top])]
+            return [(float(scores[i]), self._answers[rows[i]]) for i in top]
+
+    def get(self, question: str, namespace: str = '') -> Optional[str]:
+        """Return the cached answer for the closest question above the threshold"""
+        results = self.search(question, namespace, k=1, min_similarity=self.threshold)
+        with self._lock:
+            if results and results[0][0] >= self.threshold:
+                self.stats['hits'] += 1
+                return results[0][1]
+            self.stats['misses'] += 1
+        return None
+
+    def add(self, question: str, answer: str, namespace: str = '') -> None:
+        """
+        Insert a question/answer pair, overwriting the oldest entry when full
+
+        Args:
+            question: The user's message
+            answer: The generated LLM answer
+            namespace: Partition key (e.g. provider, model and prompt version)
+        """
+        features = self.vectorizer.features(question)
+        if not features:
+            return
+        vector = self.vectorizer.to_vector(features)
+
+        with self._lock:
+            namespace_id = self._namespace_ids.setdefault(namespace, len(self._namespace_ids))
+            row = self._next_row
+            self._next_row = (row + 1) % self.capacity
+
+            if row < len(self._answers):
+                # Ring buffer is full: evict the entry stored in this row
+                for gram in self._row_features[row]:
+                    postings = self._postings.get(gram)
+                    if postings is not None:
+                        postings.discard(row)
+                        if not postings:
+                            del self._postings[gram]
+                self._answers[row] = answer
+                self._row_features[row] = tuple(features)
+                self.stats['evictions'] += 1
+            else:
+                self._ensure_capacity(row + 1)
+                self._answers.append(answer)
+                self._row_features.append(tuple(features))
+
+            self._matrix[row] = vector
+            self._row_namespace[row] = namespace_id
+            for gram in features:
+                self._postings.setdefault(gram, set()).add(row)
+            self.stats['stores'] += 1
+
+    def get_stats(self) -> Dict[str, int]:
+        """Snapshot of the hit/miss/eviction counters"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['entries'] = len(self._answers)
+        return stats
@@ -0,0 +1,192 @@
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Deque, List, Optional, Tuple
+
+from token_accounting import estimate_tokens
+
+# (role, text) with role "user" or "assistant"
+Turn = Tuple[str, str]
+
+# Rough bookkeeping cost of a session beyond its text
+SESSION_OVERHEAD_BYTES = 512
+
+_TAG = re.compile(r'<[^>]+>')
+_SPACE = re.compile(r'\s+')
+
+
+def compact_text(text: str, max_chars: int) -> str:
+    """HTML-free, whitespace-collapsed text cut to max_chars (what is kept of a turn)"""
+    text = _SPACE.sub(' ', _TAG.sub(' ', text)).strip()
+    return text if len(text) <= max_chars else text[:max_chars - 1].rstrip() + '…'
+
+
+def truncate_history(turns: List[Turn], max_tokens: int) -> List[Turn]:
+    """
+    Most recent turns that fit in a token budget
+
+    Args:
+        turns: Turns in chronological order
+        max_tokens: Budget for the forwarded history
+
+    Returns:
+        The newest turns whose estimated tokens fit, in chronological order
+    """
+    kept = []
+    used = 0
+    for role, text in reversed(turns):
+        tokens = estimate_tokens(text) + 4  # per-message overhead
+        if used + tokens > max_tokens:
+            break
+        kept.append((role, text))
+        used += tokens
+    kept.reverse()
+    return kept
+
+
+class Session:
+    """Recent turns of one conversation"""
+
+    __slots__ = ('session_id', 'turns', 'last_decision', 'last_seen', 'size')
+
+    def __init__(self, session_id: str, max_turns: int):
+        self.session_id = session_id
+        self.turns: Deque[Turn] = deque(maxlen=max_turns)
+        # Route decision behind the previous answer (e.g. the bot asked for a city)
+        self.last_decision = None
+        self.last_seen = time.monotonic()
+        self.size = SESSION_OVERHEAD_BYTES
+
+
+class SessionStore:
+    """
+    In-memory conversation state with a global memory cap
+
+    Each session keeps its last `max_turns` turns (HTML stripped, each cut to
+    `max_turn_chars`) in a ring buffer. Sessions are kept in LRU order: idle
+    sessions expire after `idle_seconds`, and the least recently used ones are
+    evicted whenever the store exceeds `max_sessions` or `max_bytes`.
+    """
+
+    def __init__(self, max_sessions: int = 10000, max_turns: int = 10, max_bytes: int = 64 * 1024 * 1024,
+                 idle_seconds: float = 1800.0, max_turn_chars: int = 800, history_tokens: int = 1000):
+        """
+        Initialize an empty store
+
+        Args:
+            max_sessions: Most sessions kept
+            max_turns: Turns kept per session (user and assistant turns count separately)
+            max_bytes: Approximate memory cap for all sessions together
+            idle_seconds: Sessions unused for longer are dropped
+            max_turn_chars: Characters kept per turn
+            history_tokens: Token budget of the history forwarded to the LLM
+        """
+        self.max_sessions = max_sessions
+        self.max_turns = max_turns
+        self.max_bytes = max_bytes
+        self.idle_seconds = idle_seconds
+        self.max_turn_chars = max_turn_chars
+        self.history_tokens = history_tokens
+        self._sessions: 'OrderedDict[str, Session]' = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {'created': 0, 'evicted': 0, 'expired': 0}
+
+    @classmethod
+    def from_env(cls) -> Optional['SessionStore']:
+        """Store configured from SESSION_* environment variables (None if SESSION_MEMORY_MB=0)"""
+        memory_mb = float(os.getenv("SESSION_MEMORY_MB", "64"))
+        if memory_mb <= 0:
+            return None
+        return cls(
+            max_sessions=int(os.getenv("SESSION_MAX_SESSIONS", "10000")),
+            max_turns=int(os.getenv("SESSION_MAX_TURNS", "10")),
+            max_bytes=int(memory_mb * 1024 * 1024),
+            idle_seconds=float(os.getenv("SESSION_IDLE_SECONDS", "1800")),
+            history_tokens=int(os.getenv("SESSION_HISTORY_TOKENS", "1000")),
+        )
+
+    def _drop(self, session_id: str) -> None:
+        session = self._sessions.pop(session_id)
+        self._bytes -= session.size
+
+    def _evict(self) -> None:
+        """Expire idle sessions, then evict LRU sessions until under both caps"""
+        now = time.monotonic()
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if now - session.last_seen > self.idle_seconds:
+                self._drop(session_id)
+                self.stats['expired'] += 1
+            elif len(self._sessions) > self.max_sessions or self._bytes > self.max_bytes:
+                self._drop(session_id)
+                self.stats['evicted'] += 1
+            else:
+                break
+
+    def _touch(self, session_id: str, create: bool) -> Optional[Session]:
+        session = self._sessions.get(session_id)
+        now = time.monotonic()
+        if session is not None and now - session.last_seen > self.idle_seconds:
+            self._drop(session_id)
+            self.stats['expired'] += 1
+            session = None
+        if session is None:
+            if not create:
+                return None
+            session = Session(session_id, self.max_turns)
+            self._sessions[session_id] = session
+            self._bytes += session.size
+            self.stats['created'] += 1
+        else:
+            self._sessions.move_to_end(session_id)
+        session.last_seen = now
+        return session
+
+    def get(self, session_id: str) -> Optional[Session]:
+        """The session if it exists and has not expired"""
+        with self._lock:
+            return self._touch(session_id, create=False)
+
+    def history(self, session_id: str) -> List[Turn]:
+        """Recent turns of a session, truncated to the history token budget"""
+        with self._lock:
+            session = self._touch(session_id, create=False)
+            turns = list(session.turns) if session is not None else []
+        return truncate_history(turns, self.history_tokens)
+
+    def append(self, session_id: str, user_input: str, response: str, decision=None) -> None:
+        """
+        Record one exchange
+
+        Args:
+            session_id: Conversation id
+            user_input: The user's message
+            response: The bot's answer
+            decision: RouteDecision of a locally routed answer (None for LLM answers)
+        """
+        turns = [('user', compact_text(user_input, self.max_turn_chars)),
+                 ('assistant', compact_text(response, self.max_turn_chars))]
+        with self._lock:
+            session = self._touch(session_id, create=True)
+            for turn in turns:
+                if len(session.turns) == session.turns.maxlen:
+                    removed = session.turns[0]
+                    session.size -= len(removed[1])
+                    self._bytes -= len(removed[1])
+                session.turns.append(turn)
+                session.size += len(turn[1])
+                self._bytes += len(turn[1])
+            session.last_decision = decision
+            self._evict()
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                'sessions': len(self._sessions),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                **self.stats,
+            }
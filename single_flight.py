@@ -0,0 +1,323 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from metrics import COALESCED
+
+RUNNING = 'running'
+DONE = 'done'
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error', 'shared')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.shared = False
+
+
+class SQLiteFlightStore:
+    """
+    In-flight calls of every worker on the host, in a SQLite file
+
+    The first worker to claim a key runs the call and writes its result to the
+    row; the others poll the row until the result is there. A claim expires
+    after the call's time budget, so a worker that dies mid-call only delays
+    the others until then.
+    """
+
+    def __init__(self, db_path: str, result_seconds: float = 5.0, poll_seconds: float = 0.05):
+        """
+        Args:
+            db_path: SQLite file shared by the workers
+            result_seconds: How long a finished result stays readable for late followers
+            poll_seconds: Interval at which followers check for the result
+        """
+        self.db_path = db_path
+        self.result_seconds = result_seconds
+        self.poll_seconds = poll_seconds
+        self._local = threading.local()
+        self.errors = 0
+        try:
+            self._connection().execute(
+                "CREATE TABLE IF NOT EXISTS flights (key TEXT PRIMARY KEY, owner TEXT NOT NULL, status TEXT NOT NULL, "
+                "response TEXT, expires_at REAL NOT NULL)"
+            )
+            self._connection().execute("DELETE FROM flights WHERE expires_at <= ?", (time.time(),))
+        except sqlite3.Error as e:
+            print(f"⚠️  Cross-worker request coalescing disabled: {e}")
+            self.db_path = None
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.db_path, timeout=1.0, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def claim(self, key: str, ttl: float) -> Optional[str]:
+        """
+        Try to become the worker that runs the call for `key`
+
+        Returns:
+            An owner token if claimed (pass it to finish/abandon), None if another
+            worker's call is running or has just finished. Also returns a token
+            when the store is unusable, so the caller simply runs the call itself.
+        """
+        owner = uuid.uuid4().hex
+        if not self.db_path:
+            return owner
+        try:
+            connection = self._connection()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                row = connection.execute("SELECT expires_at FROM flights WHERE key = ?", (key,)).fetchone()
+                if row is not None and row[0] > now:
+                    connection.execute("COMMIT")
+                    return None
+                connection.execute(
+                    "INSERT OR REPLACE INTO flights (key, owner, status, response, expires_at) VALUES (?, ?, ?, NULL, ?)",
+                    (key, owner, RUNNING, now + ttl)
+                )
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+        except sqlite3.Error:
+            self.errors += 1
+        return owner
+
+    def finish(self, key: str, owner: str, response: str) -> None:
+        """Publish the result of a claimed call"""
+        self._execute("UPDATE flights SET status = ?, response = ?, expires_at = ? WHERE key = ? AND owner = ?",
+                      (DONE, response, time.time() + self.result_seconds, key, owner))
+
+    def abandon(self, key: str, owner: str) -> None:
+        """Release a claim whose call failed; waiting workers then make their own call"""
+        self._execute("DELETE FROM flights WHERE key = ? AND owner = ?", (key, owner))
+
+    def _execute(self, sql: str, params: tuple) -> None:
+        if not self.db_path:
+            return
+        try:
+            self._connection().execute(sql, params)
+        except sqlite3.Error:
+            self.errors += 1
+
+    def poll(self, key: str) -> Tuple[bool, Optional[str]]:
+        """
+        Check another worker's call
+
+        Returns:
+            (pending, response): pending is True while the call is still running;
+            response is its result once finished (None if it failed or expired)
+        """
+        try:
+            row = self._connection().execute(
+                "SELECT status, response, expires_at FROM flights WHERE key = ?", (key,)).fetchone()
+        except sqlite3.Error:
+            self.errors += 1
+            return False, None
+        if row is None or row[2] <= time.time():
+            return False, None
+        if row[0] == DONE:
+            return False, row[1]
+        return True, None
+
+
+class SingleFlight:
+    """
+    Collapses concurrent identical calls into one
+
+    The first caller for a key (the leader) runs the call; callers arriving
+    while it is in flight wait and receive the same result, or the same
+    exception. Threads and asyncio tasks are coalesced separately. With a
+    SQLiteFlightStore, leaders in different worker processes coalesce too:
+    one of them calls upstream and the others read its result.
+    """
+
+    def __init__(self, store: Optional[SQLiteFlightStore] = None):
+        self.store = store
+        self._calls: Dict[str, _Call] = {}
+        self._tasks: Dict[str, asyncio.Future] = {}
+        # Callers awaiting each async call
+        self._waiters: Dict[asyncio.Future, int] = {}
+        self._lock = threading.Lock()
+        self._saved_local = COALESCED.labels('local')
+        self._saved_shared = COALESCED.labels('cross_process')
+        self.stats = {'leaders': 0, 'followers': 0, 'cross_process_followers': 0}
+
+    @classmethod
+    def from_env(cls) -> Optional['SingleFlight']:
+        """
+        Coalescing configured from SINGLE_FLIGHT and SINGLE_FLIGHT_DB
+
+        Returns:
+            None if SINGLE_FLIGHT is "0"; across workers only when SINGLE_FLIGHT_DB is set
+        """
+        if os.getenv("SINGLE_FLIGHT", "1").lower() in ("0", "false", "no"):
+            return None
+        db_path = os.getenv("SINGLE_FLIGHT_DB")
+        return cls(SQLiteFlightStore(db_path) if db_path else None)
+
+    def _count(self, stat: str) -> None:
+        with self._lock:
+            self.stats[stat] += 1
+
+    def do(self, key: str, fn: Callable[[float], Any], timeout: float) -> Tuple[Any, bool]:
+        """
+        Run fn once for all concurrent callers with the same key
+
+        Args:
+            key: Identity of the call
+            fn: The call (run by the leader only), given the time.monotonic()
+                deadline by which it must finish
+            timeout: Time budget of the caller, shared by waiting and the call
+
+        Returns:
+            (result, shared): shared is True if another caller's call produced it
+
+        Raises:
+            TimeoutError: A follower gave up waiting, or the budget ran out
+                before the leader could make its own call
+        """
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.stats['leaders'] += 1
+
+        if not leader:
+            if not call.done.wait(timeout):
+                raise TimeoutError("Timed out waiting for a coalesced call")
+            self._count('followers')
+            self._saved_local.inc()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result, call.shared = self._lead(key, fn, deadline)
+            return call.result, call.shared
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def _lead(self, key: str, fn: Callable[[float], Any], deadline: float) -> Tuple[Any, bool]:
+        if self.store is None:
+            return fn(deadline), False
+        owner = self.store.claim(key, deadline - time.monotonic())
+        if owner is None:
+            while time.monotonic() < deadline:
+                pending, response = self.store.poll(key)
+                if response is not None:
+                    return self._shared(response)
+                if not pending:
+                    break
+                time.sleep(self.store.poll_seconds)
+            # The other worker failed or is too slow: make the call here, within what is left of the budget
+            self._check_budget(deadline)
+            return fn(deadline), False
+        return self._run_claimed(key, owner, fn, deadline), False
+
+    @staticmethod
+    def _check_budget(deadline: float) -> None:
+        if time.monotonic() >= deadline:
+            raise TimeoutError("Timed out waiting for another worker's call")
+
+    def _run_claimed(self, key: str, owner: str, fn: Callable[[float], Any], deadline: float) -> Any:
+        try:
+            result = fn(deadline)
+        except BaseException:
+            self.store.abandon(key, owner)
+            raise
+        self.store.finish(key, owner, result)
+        return result
+
+    def _shared(self, response: str) -> Tuple[str, bool]:
+        self._count('cross_process_followers')
+        self._saved_shared.inc()
+        return response, True
+
+    async def do_async(self, key: str, fn: Callable[[float], Awaitable[Any]], timeout: float) -> Tuple[Any, bool]:
+        """
+        Asyncio variant of do()
+
+        The call runs in its own task, so a leader cancelled by its client does
+        not cancel the call the followers are waiting for. Once every caller has
+        been cancelled or has given up, the call is cancelled too.
+        """
+        task = self._tasks.get(key)
+        if task is not None and not task.done() and task.get_loop() is asyncio.get_running_loop():
+            self._waiters[task] += 1
+            try:
+                result, _ = await asyncio.wait_for(asyncio.shield(task), timeout)
+            finally:
+                self._release(task)
+            self._count('followers')
+            self._saved_local.inc()
+            return result, True
+
+        self._count('leaders')
+        task = asyncio.ensure_future(self._lead_async(key, fn, time.monotonic() + timeout))
+        self._tasks[key] = task
+        self._waiters[task] = 1
+        task.add_done_callback(lambda done: self._tasks.pop(key, None) if self._tasks.get(key) is done else None)
+        try:
+            return await asyncio.shield(task)
+        finally:
+            self._release(task)
+
+    def _release(self, task: asyncio.Future) -> None:
+        """One caller stopped waiting for task; cancel it if nobody waits any more"""
+        self._waiters[task] -= 1
+        if not self._waiters[task]:
+            del self._waiters[task]
+            if not task.done():
+                task.cancel()
+
+    async def _lead_async(self, key: str, fn: Callable[[float], Awaitable[Any]],
+                          deadline: float) -> Tuple[Any, bool]:
+        if self.store is None:
+            return await fn(deadline), False
+        owner = self.store.claim(key, deadline - time.monotonic())
+        if owner is None:
+            while time.monotonic() < deadline:
+                pending, response = self.store.poll(key)
+                if response is not None:
+                    return self._shared(response)
+                if not pending:
+                    break
+                await asyncio.sleep(self.store.poll_seconds)
+            self._check_budget(deadline)
+            return await fn(deadline), False
+        try:
+            result = await fn(deadline)
+        except BaseException:
+            self.store.abandon(key, owner)
+            raise
+        self.store.finish(key, owner, result)
+        return result, False
+
+    def get_stats(self) -> dict:
+        """Leader and follower counts (followers = upstream calls saved) and calls in flight"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['in_flight'] = len(self._calls) + sum(not task.done() for task in list(self._tasks.values()))
+        stats['cross_process'] = self.store is not None and bool(self.store.db_path)
+        return stats
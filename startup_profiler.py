@@ -0,0 +1,125 @@
+"""
+Cold-start profiler for the entry points
+
+Each entry point is imported (and its chatbot constructed, where the module
+does not do that itself) in a fresh interpreter started with -X importtime.
+The report shows import and initialization time and the packages that
+account for most of the import time.
+
+Usage:
+    python startup_profiler.py                  # every entry point
+    python startup_profiler.py app asgi --top 15
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+# Entry point -> (module to import, class to construct after importing or None)
+ENTRY_POINTS: Dict[str, Tuple[str, Optional[str]]] = {
+    'app': ('app', None),
+    'asgi': ('asgi', None),
+    'web_chatbot': ('web_chatbot', None),
+    'llm_chatbot': ('llm_chatbot', 'LLMHealthChatbot'),
+    'healthcare_chatbot': ('healthcare_chatbot', 'HealthcareChatbot'),
+    'voice_chatbot': ('voice_chatbot', 'VoiceHealthcareChatbot'),
+}
+
+_SNIPPET = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+imported = time.perf_counter()
+error = None
+if {cls!r}:
+    try:
+        getattr({module}, {cls!r})()
+    except Exception as e:
+        error = f"{{type(e).__name__}}: {{e}}"
+finished = time.perf_counter()
+sys.stdout.flush()
+print({marker!r} + json.dumps({{'import': imported - started, 'init': finished - imported,
+                                'modules': len(sys.modules), 'error': error}}))
+"""
+
+_MARKER = '@@startup@@'
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    """(module, self_us, cumulative_us) for every line of -X importtime output"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def profile_entry_point(name: str) -> dict:
+    """
+    Measure one entry point in a fresh interpreter
+
+    Args:
+        name: Key of ENTRY_POINTS
+
+    Returns:
+        Wall times (seconds), loaded module count, initialization error if any,
+        and import self-time per top-level package (microseconds)
+    """
+    module, cls = ENTRY_POINTS[name]
+    code = _SNIPPET.format(module=module, cls=cls, marker=_MARKER)
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                            capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    lines = [line for line in result.stdout.splitlines() if line.startswith(_MARKER)]
+    if not lines:
+        tail = result.stderr.strip().splitlines()[-1:] or ['no output']
+        return {'name': name, 'failed': tail[0]}
+
+    report = json.loads(lines[-1][len(_MARKER):])
+    packages = defaultdict(int)
+    for module_name, self_us, _ in parse_importtime(result.stderr):
+        packages[module_name.split('.')[0]] += self_us
+    report.update(name=name, packages=dict(packages))
+    return report
+
+
+def print_report(report: dict, top: int) -> None:
+    print(f"=== {report['name']} ===")
+    if 'failed' in report:
+        print(f"❌ Could not import: {report['failed']}\n")
+        return
+    print(f"import {report['import'] * 1000:8.1f} ms   init {report['init'] * 1000:8.1f} ms   "
+          f"total {(report['import'] + report['init']) * 1000:8.1f} ms   modules {report['modules']}")
+    if report['error']:
+        print(f"⚠️  Initialization failed: {report['error']}")
+    heaviest = sorted(report['packages'].items(), key=lambda item: item[1], reverse=True)[:top]
+    for package, self_us in heaviest:
+        print(f"    {self_us / 1000:8.1f} ms  {package}")
+    print()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure cold-start import and initialization time.")
+    parser.add_argument('entry_points', nargs='*',
+                        help=f"Entry points to profile (default: all of {', '.join(ENTRY_POINTS)})")
+    parser.add_argument('--top', type=int, default=8, help="Packages listed per entry point")
+    parser.add_argument('--json', action='store_true', help="Print raw measurements as JSON")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.entry_points if name not in ENTRY_POINTS]
+    if unknown:
+        parser.error(f"unknown entry point(s): {', '.join(unknown)}")
+
+    reports = [profile_entry_point(name) for name in args.entry_points or ENTRY_POINTS]
+    if args.json:
+        print(json.dumps(reports, indent=2))
+        return
+    for report in reports:
+        print_report(report, args.top)
+
+
+if __name__ == "__main__":
+    main()
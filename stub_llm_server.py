@@ -0,0 +1,421 @@
+"""
+Offline stand-in for the OpenAI and Gemini APIs
+
+Speaks the subset of both APIs that LLMHealthChatbot uses: OpenAI chat
+completions (plain and streamed, with usage) and Gemini generateContent /
+streamGenerateContent over REST, plus the model listings used by
+check_models.py. Latency, error rate and token throughput are configurable, so
+load tests and benchmarks run hermetically without API keys or cost.
+
+Run with:
+    python stub_llm_server.py --port 8099 --latency-ms 800 --error-rate 0.02
+
+and point the chatbot at it:
+    LLM_BASE_URL=http://127.0.0.1:8099 OPENAI_API_KEY=stub python app.py
+    LLM_BASE_URL=http://127.0.0.1:8099 GEMINI_API_KEY=stub LLM_PROVIDER=gemini python app.py
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import threading
+import time
+import uuid
+from typing import List, Optional, Tuple
+from urllib.parse import parse_qs
+
+from token_accounting import estimate_tokens
+
+LATENCY_DISTRIBUTIONS = ('fixed', 'uniform', 'normal', 'lognormal', 'exponential')
+
+STUB_MODELS = ['gpt-3.5-turbo', 'gpt-4o-mini', 'gemini-flash-latest', 'gemini-1.5-flash']
+
+# Filler sentences for the answer body, repeated until the answer has the configured length
+_TIPS = [
+    "Rest and avoid activities that make the symptoms worse",
+    "Drink plenty of water throughout the day",
+    "Keep a short diary of when the symptoms appear",
+    "Eat regular, balanced meals",
+    "Get seven to nine hours of sleep",
+    "Take short breaks from screens and stretch",
+]
+
+
+class StubProfile:
+    """Latency, error and throughput behaviour of the stub"""
+
+    def __init__(self, latency_ms: float = 500.0, latency_dist: str = 'lognormal', latency_spread: float = 0.5,
+                 error_rate: float = 0.0, error_statuses: Tuple[int, ...] = (500, 503, 429),
+                 tokens_per_second: float = 80.0, answer_tokens: int = 250, chunk_tokens: int = 8,
+                 seed: Optional[int] = None):
+        """
+        Initialize a profile
+
+        Args:
+            latency_ms: Median time to the first token
+            latency_dist: One of LATENCY_DISTRIBUTIONS
+            latency_spread: Sigma for lognormal, relative +/- range for uniform,
+                relative standard deviation for normal (ignored for fixed/exponential)
+            error_rate: Fraction of requests answered with an error status
+            error_statuses: Statuses the errors are drawn from
+            tokens_per_second: Generation speed after the first token (0 = instant)
+            answer_tokens: Approximate length of every answer
+            chunk_tokens: Tokens per streamed chunk
+            seed: Random seed for reproducible runs
+        """
+        if latency_dist not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution '{latency_dist}'. Choose from: {', '.join(LATENCY_DISTRIBUTIONS)}")
+        self.latency_ms = latency_ms
+        self.latency_dist = latency_dist
+        self.latency_spread = latency_spread
+        self.error_rate = error_rate
+        self.error_statuses = tuple(error_statuses)
+        self.tokens_per_second = tokens_per_second
+        self.answer_tokens = answer_tokens
+        self.chunk_tokens = max(1, chunk_tokens)
+        self.random = random.Random(seed)
+
+    @classmethod
+    def from_env(cls) -> 'StubProfile':
+        """Profile configured from STUB_* environment variables"""
+        statuses = os.getenv("STUB_ERROR_STATUSES", "500,503,429")
+        seed = os.getenv("STUB_SEED")
+        return cls(
+            latency_ms=float(os.getenv("STUB_LATENCY_MS", "500")),
+            latency_dist=os.getenv("STUB_LATENCY_DIST", "lognormal"),
+            latency_spread=float(os.getenv("STUB_LATENCY_SPREAD", "0.5")),
+            error_rate=float(os.getenv("STUB_ERROR_RATE", "0")),
+            error_statuses=tuple(int(status) for status in statuses.split(',') if status.strip()),
+            tokens_per_second=float(os.getenv("STUB_TOKENS_PER_SECOND", "80")),
+            answer_tokens=int(os.getenv("STUB_ANSWER_TOKENS", "250")),
+            chunk_tokens=int(os.getenv("STUB_CHUNK_TOKENS", "8")),
+            seed=int(seed) if seed else None,
+        )
+
+    def first_token_delay(self) -> float:
+        """Seconds until the first token, drawn from the latency distribution"""
+        median = self.latency_ms / 1000
+        spread = self.latency_spread
+        if self.latency_dist == 'fixed' or median <= 0:
+            return max(0.0, median)
+        if self.latency_dist == 'uniform':
+            return max(0.0, self.random.uniform(median * (1 - spread), median * (1 + spread)))
+        if self.latency_dist == 'normal':
+            return max(0.0, self.random.gauss(median, median * spread))
+        if self.latency_dist == 'lognormal':
+            return self.random.lognormvariate(math.log(median), spread)
+        # exponential with the given median
+        return self.random.expovariate(math.log(2) / median)
+
+    def error_status(self) -> Optional[int]:
+        """Status of a simulated failure for this request, or None"""
+        if self.error_rate > 0 and self.random.random() < self.error_rate:
+            return self.random.choice(self.error_statuses)
+        return None
+
+    def generation_time(self, tokens: int) -> float:
+        return tokens / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+
+
+def stub_answer(question: str, tokens: int) -> str:
+    """HTML answer in the format the system prompt asks for, about `tokens` long"""
+    topic = ' '.join(question.split()[:12]) or 'your symptoms'
+    head = (f"I understand you are experiencing {topic}. That can be uncomfortable."
+            f"<br><br><strong>Potential Causes:</strong><ul><li>Strain or overuse</li><li>Stress or poor sleep</li></ul>"
+            f"<strong>Home Remedies:</strong><ul>")
+    tail = ("</ul><strong>When to See a Doctor:</strong><ul><li>If symptoms last more than a few days or get worse</li>"
+            "</ul><br><em>⚠️ I am an AI, not a doctor. Please consult a medical professional.</em>")
+    items = []
+    budget = tokens - estimate_tokens(head) - estimate_tokens(tail)
+    while budget > 0:
+        item = f"<li>{_TIPS[len(items) % len(_TIPS)]}.</li>"
+        items.append(item)
+        budget -= estimate_tokens(item)
+    return head + ''.join(items) + tail
+
+
+def split_chunks(text: str, chunk_tokens: int) -> List[str]:
+    """Split text into stream chunks of roughly chunk_tokens tokens"""
+    size = chunk_tokens * 4
+    return [text[i:i + size] for i in range(0, len(text), size)] or ['']
+
+
+def openai_prompt(body: dict) -> Tuple[str, int]:
+    """(last user message, estimated prompt tokens) of a chat-completions request"""
+    messages = body.get('messages') or []
+    question = next((m.get('content') or '' for m in reversed(messages) if m.get('role') == 'user'), '')
+    return question, sum(estimate_tokens(m.get('content') or '') + 4 for m in messages)
+
+
+def gemini_prompt(body: dict) -> Tuple[str, int]:
+    """(last user text, estimated prompt tokens) of a generateContent request"""
+    texts = [part.get('text', '') for content in body.get('contents') or [] for part in content.get('parts') or []]
+    system = body.get('systemInstruction') or body.get('system_instruction') or {}
+    system_tokens = sum(estimate_tokens(part.get('text', '')) for part in system.get('parts') or [])
+    # The chatbot sends "<history>User Question: <message>"
+    question = texts[-1].rsplit('User Question:', 1)[-1].strip() if texts else ''
+    return question, system_tokens + sum(estimate_tokens(text) for text in texts)
+
+
+class StubLLMServer:
+    """ASGI application emulating both providers with a StubProfile"""
+
+    def __init__(self, profile: Optional[StubProfile] = None):
+        self.profile = profile or StubProfile.from_env()
+        self.stats = {'requests': 0, 'errors': 0, 'in_flight': 0, 'max_in_flight': 0,
+                      'prompt_tokens': 0, 'completion_tokens': 0}
+        self._lock = threading.Lock()
+
+    def _begin(self) -> None:
+        with self._lock:
+            self.stats['requests'] += 1
+            self.stats['in_flight'] += 1
+            self.stats['max_in_flight'] = max(self.stats['max_in_flight'], self.stats['in_flight'])
+
+    def _end(self, prompt_tokens: int = 0, completion_tokens: int = 0, error: bool = False) -> None:
+        with self._lock:
+            self.stats['in_flight'] -= 1
+            self.stats['prompt_tokens'] += prompt_tokens
+            self.stats['completion_tokens'] += completion_tokens
+            self.stats['errors'] += int(error)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return dict(self.stats)
+
+    @staticmethod
+    async def _read_json(receive) -> dict:
+        body = b''
+        more_body = True
+        while more_body:
+            message = await receive()
+            body += message.get('body', b'')
+            more_body = message.get('more_body', False)
+        try:
+            return json.loads(body or b'{}')
+        except ValueError:
+            return {}
+
+    @staticmethod
+    async def _send_json(send, data, status: int = 200) -> None:
+        payload = json.dumps(data).encode('utf-8')
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(payload)).encode())],
+        })
+        await send({'type': 'http.response.body', 'body': payload})
+
+    @staticmethod
+    async def _start_stream(send, content_type: bytes) -> None:
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [(b'content-type', content_type), (b'cache-control', b'no-cache')],
+        })
+
+    async def _fail(self, send, provider: str, status: int) -> None:
+        """Error response in the provider's format"""
+        message = f"Simulated error {status} from the stub server"
+        if provider == 'openai':
+            error = {'error': {'message': message, 'type': 'rate_limit_error' if status == 429 else 'server_error',
+                               'code': None}}
+        else:
+            names = {429: 'RESOURCE_EXHAUSTED', 503: 'UNAVAILABLE'}
+            error = {'error': {'code': status, 'message': message, 'status': names.get(status, 'INTERNAL')}}
+        await self._send_json(send, error, status)
+
+    async def openai_chat(self, scope, receive, send) -> None:
+        """POST /v1/chat/completions"""
+        body = await self._read_json(receive)
+        question, prompt_tokens = openai_prompt(body)
+        model = body.get('model', 'gpt-3.5-turbo')
+        self._begin()
+        await asyncio.sleep(self.profile.first_token_delay())
+        status = self.profile.error_status()
+        if status:
+            self._end(prompt_tokens, error=True)
+            return await self._fail(send, 'openai', status)
+
+        answer = stub_answer(question, self.profile.answer_tokens)
+        completion_tokens = estimate_tokens(answer)
+        usage = {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                 'total_tokens': prompt_tokens + completion_tokens,
+                 'prompt_tokens_details': {'cached_tokens': 0}}
+        completion_id = f"chatcmpl-stub-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+        try:
+            if not body.get('stream'):
+                await asyncio.sleep(self.profile.generation_time(completion_tokens))
+                return await self._send_json(send, {
+                    'id': completion_id, 'object': 'chat.completion', 'created': created, 'model': model,
+                    'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': answer},
+                                 'finish_reason': 'stop'}],
+                    'usage': usage,
+                })
+
+            def event(choices, usage_data=None) -> bytes:
+                chunk = {'id': completion_id, 'object': 'chat.completion.chunk', 'created': created,
+                         'model': model, 'choices': choices}
+                if usage_data is not None:
+                    chunk['usage'] = usage_data
+                return f"data: {json.dumps(chunk)}\n\n".encode('utf-8')
+
+            await self._start_stream(send, b'text/event-stream')
+            chunks = split_chunks(answer, self.profile.chunk_tokens)
+            for i, text in enumerate(chunks):
+                if i:
+                    await asyncio.sleep(self.profile.generation_time(self.profile.chunk_tokens))
+                delta = {'content': text} if i else {'role': 'assistant', 'content': text}
+                await send({'type': 'http.response.body', 'body': event([{'index': 0, 'delta': delta,
+                                                                          'finish_reason': None}]),
+                            'more_body': True})
+            tail = event([{'index': 0, 'delta': {}, 'finish_reason': 'stop'}])
+            if (body.get('stream_options') or {}).get('include_usage'):
+                tail += event([], usage)
+            await send({'type': 'http.response.body', 'body': tail + b"data: [DONE]\n\n"})
+        finally:
+            self._end(prompt_tokens, completion_tokens)
+
+    async def gemini_generate(self, scope, receive, send, model: str, stream: bool) -> None:
+        """POST /v1beta/models/{model}:generateContent and :streamGenerateContent"""
+        body = await self._read_json(receive)
+        question, prompt_tokens = gemini_prompt(body)
+        self._begin()
+        await asyncio.sleep(self.profile.first_token_delay())
+        status = self.profile.error_status()
+        if status:
+            self._end(prompt_tokens, error=True)
+            return await self._fail(send, 'gemini', status)
+
+        answer = stub_answer(question, self.profile.answer_tokens)
+        completion_tokens = estimate_tokens(answer)
+        usage = {'promptTokenCount': prompt_tokens, 'candidatesTokenCount': completion_tokens,
+                 'totalTokenCount': prompt_tokens + completion_tokens}
+
+        def response(text: str, finished: bool) -> dict:
+            candidate = {'content': {'parts': [{'text': text}], 'role': 'model'}, 'index': 0}
+            if finished:
+                candidate['finishReason'] = 'STOP'
+            return {'candidates': [candidate], 'usageMetadata': usage, 'modelVersion': model}
+
+        try:
+            if not stream:
+                await asyncio.sleep(self.profile.generation_time(completion_tokens))
+                return await self._send_json(send, response(answer, True))
+
+            # The REST transport reads a streamed JSON array; alt=sse asks for server-sent events
+            query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+            sse = 'sse' in query.get('alt', []) or 'sse' in query.get('$alt', [])
+            await self._start_stream(send, b'text/event-stream' if sse else b'application/json')
+            chunks = split_chunks(answer, self.profile.chunk_tokens)
+            for i, text in enumerate(chunks):
+                if i:
+                    await asyncio.sleep(self.profile.generation_time(self.profile.chunk_tokens))
+                data = json.dumps(response(text, i == len(chunks) - 1))
+                if sse:
+                    payload = f"data: {data}\r\n\r\n"
+                else:
+                    payload = ('[' if i == 0 else ',\r\n') + data
+                await send({'type': 'http.response.body', 'body': payload.encode('utf-8'), 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b'' if sse else b']'})
+        finally:
+            self._end(prompt_tokens, completion_tokens)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            while True:
+                message = await receive()
+                if message['type'] == 'lifespan.startup':
+                    await send({'type': 'lifespan.startup.complete'})
+                elif message['type'] == 'lifespan.shutdown':
+                    await send({'type': 'lifespan.shutdown.complete'})
+                    return
+
+        method, path = scope.get('method'), scope.get('path', '')
+        if method == 'POST' and path in ('/v1/chat/completions', '/chat/completions'):
+            return await self.openai_chat(scope, receive, send)
+        if method == 'POST' and path.startswith('/v1beta/models/') and ':' in path:
+            model, action = path[len('/v1beta/models/'):].rsplit(':', 1)
+            if action in ('generateContent', 'streamGenerateContent'):
+                return await self.gemini_generate(scope, receive, send, model, action == 'streamGenerateContent')
+        if method == 'GET' and path in ('/v1/models', '/models'):
+            return await self._send_json(send, {'object': 'list', 'data': [
+                {'id': name, 'object': 'model', 'owned_by': 'stub'} for name in STUB_MODELS]})
+        if method == 'GET' and path == '/v1beta/models':
+            return await self._send_json(send, {'models': [
+                {'name': f"models/{name}", 'supportedGenerationMethods': ['generateContent', 'countTokens']}
+                for name in STUB_MODELS if name.startswith('gemini')]})
+        if method == 'GET' and path == '/stub/stats':
+            return await self._send_json(send, self.get_stats())
+        await self._send_json(send, {'error': {'code': 404, 'message': f"{method} {path} is not emulated",
+                                               'status': 'NOT_FOUND'}}, 404)
+
+
+def serve_in_background(server: StubLLMServer, host: str = '127.0.0.1', port: int = 0):
+    """
+    Run the stub on a background thread
+
+    Args:
+        server: The stub application
+        host: Interface to bind
+        port: Port to bind (0 picks a free one)
+
+    Returns:
+        (base_url, stop) where stop() shuts the server down
+    """
+    import uvicorn
+
+    config = uvicorn.Config(server, host=host, port=port, log_level='warning', lifespan='on')
+    uvicorn_server = uvicorn.Server(config)
+    thread = threading.Thread(target=uvicorn_server.run, name='stub-llm-server', daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 10
+    while not uvicorn_server.started:
+        if not thread.is_alive() or time.monotonic() > deadline:
+            raise RuntimeError("Stub LLM server failed to start")
+        time.sleep(0.01)
+    bound_port = uvicorn_server.servers[0].sockets[0].getsockname()[1]
+
+    def stop():
+        uvicorn_server.should_exit = True
+        thread.join(timeout=5)
+
+    return f"http://{host}:{bound_port}", stop
+
+
+def main(argv=None):
+    defaults = StubProfile.from_env()
+    parser = argparse.ArgumentParser(description="Offline OpenAI/Gemini-compatible stub server for load testing.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=int(os.getenv("STUB_PORT", "8099")))
+    parser.add_argument('--latency-ms', type=float, default=defaults.latency_ms, help="Median time to first token")
+    parser.add_argument('--latency-dist', default=defaults.latency_dist, choices=LATENCY_DISTRIBUTIONS)
+    parser.add_argument('--latency-spread', type=float, default=defaults.latency_spread)
+    parser.add_argument('--error-rate', type=float, default=defaults.error_rate)
+    parser.add_argument('--error-statuses', default=','.join(map(str, defaults.error_statuses)))
+    parser.add_argument('--tokens-per-second', type=float, default=defaults.tokens_per_second)
+    parser.add_argument('--answer-tokens', type=int, default=defaults.answer_tokens)
+    parser.add_argument('--chunk-tokens', type=int, default=defaults.chunk_tokens)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    profile = StubProfile(
+        latency_ms=args.latency_ms, latency_dist=args.latency_dist, latency_spread=args.latency_spread,
+        error_rate=args.error_rate, error_statuses=tuple(int(s) for s in args.error_statuses.split(',') if s.strip()),
+        tokens_per_second=args.tokens_per_second, answer_tokens=args.answer_tokens,
+        chunk_tokens=args.chunk_tokens, seed=args.seed,
+    )
+    print(f"🧪 Stub LLM server on http://{args.host}:{args.port} "
+          f"({profile.latency_dist} {profile.latency_ms:.0f} ms to first token, "
+          f"{profile.tokens_per_second:.0f} tok/s, {profile.error_rate:.1%} errors)")
+    print(f"   Point the chatbot at it with LLM_BASE_URL=http://{args.host}:{args.port}")
+
+    import uvicorn
+    uvicorn.run(StubLLMServer(profile), host=args.host, port=args.port, log_level='warning')
+
+
+if __name__ == "__main__":
+    main()
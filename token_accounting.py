@@ -0,0 +1,128 @@
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, NamedTuple, Optional, Tuple
+
+# USD per million tokens: (input, output, cached input)
+DEFAULT_PRICES: Dict[str, Tuple[float, float, float]] = {
+    'gpt-3.5-turbo': (0.50, 1.50, 0.50),
+    'gpt-4': (30.00, 60.00, 30.00),
+    'gpt-4o': (2.50, 10.00, 1.25),
+    'gpt-4o-mini': (0.15, 0.60, 0.075),
+    'gemini-flash-latest': (0.30, 2.50, 0.075),
+    'gemini-1.5-flash': (0.075, 0.30, 0.01875),
+}
+
+
+class TokenUsage(NamedTuple):
+    """Tokens billed for one provider call"""
+    prompt_tokens: int
+    completion_tokens: int
+    # Prompt tokens served from the provider's context/prompt cache
+    cached_tokens: int = 0
+    # True when the provider did not report usage and it was estimated from text length
+    estimated: bool = False
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for English text)"""
+    return max(1, round(len(text) / 4)) if text else 0
+
+
+def openai_usage(usage) -> Optional[TokenUsage]:
+    """TokenUsage from an OpenAI `usage` object (None if absent)"""
+    if usage is None:
+        return None
+    details = getattr(usage, 'prompt_tokens_details', None)
+    return TokenUsage(usage.prompt_tokens or 0, usage.completion_tokens or 0,
+                      getattr(details, 'cached_tokens', 0) or 0)
+
+
+def gemini_usage(metadata) -> Optional[TokenUsage]:
+    """TokenUsage from a Gemini `usage_metadata` object (None if absent)"""
+    if metadata is None or not getattr(metadata, 'prompt_token_count', 0):
+        return None
+    return TokenUsage(metadata.prompt_token_count, getattr(metadata, 'candidates_token_count', 0) or 0,
+                      getattr(metadata, 'cached_content_token_count', 0) or 0)
+
+
+class TokenLedger:
+    """
+    Token and cost accounting for provider calls
+
+    Totals are kept per provider, model and prompt variant, and the most
+    recent calls are kept individually for inspection.
+    """
+
+    def __init__(self, prices: Optional[Dict[str, Tuple[float, float, float]]] = None, recent: int = 50):
+        """
+        Initialize an empty ledger
+
+        Args:
+            prices: USD per million tokens (input, output, cached input) per model
+            recent: Number of individual calls to keep
+        """
+        self.prices = dict(DEFAULT_PRICES if prices is None else prices)
+        self.totals: Dict[str, dict] = {}
+        self.recent = deque(maxlen=recent)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> 'TokenLedger':
+        """Default prices, overridden for every model by LLM_PRICE_INPUT/OUTPUT/CACHED if set"""
+        ledger = cls()
+        if os.getenv("LLM_PRICE_INPUT") or os.getenv("LLM_PRICE_OUTPUT"):
+            price_in = float(os.getenv("LLM_PRICE_INPUT", "0"))
+            price_out = float(os.getenv("LLM_PRICE_OUTPUT", "0"))
+            price_cached = float(os.getenv("LLM_PRICE_CACHED", str(price_in)))
+            ledger.prices = {'*': (price_in, price_out, price_cached)}
+        return ledger
+
+    def cost(self, model: str, usage: TokenUsage) -> Optional[float]:
+        """Estimated cost in USD, or None if the model has no known price"""
+        price = self.prices.get(model) or self.prices.get('*')
+        if price is None:
+            return None
+        price_in, price_out, price_cached = price
+        uncached = usage.prompt_tokens - usage.cached_tokens
+        return (uncached * price_in + usage.cached_tokens * price_cached + usage.completion_tokens * price_out) / 1e6
+
+    def record(self, provider: str, model: str, usage: TokenUsage, prompt_variant: str = 'full') -> dict:
+        """
+        Account for one provider call
+
+        Returns:
+            The per-request record (tokens and estimated cost)
+        """
+        cost = self.cost(model, usage)
+        entry = {
+            'time': time.time(),
+            'provider': provider,
+            'model': model,
+            'prompt_variant': prompt_variant,
+            'prompt_tokens': usage.prompt_tokens,
+            'completion_tokens': usage.completion_tokens,
+            'cached_tokens': usage.cached_tokens,
+            'estimated': usage.estimated,
+            'cost_usd': cost,
+        }
+        key = f"{provider}:{model}:{prompt_variant}"
+        with self._lock:
+            totals = self.totals.setdefault(key, {'requests': 0, 'prompt_tokens': 0, 'completion_tokens': 0,
+                                                  'cached_tokens': 0, 'cost_usd': 0.0})
+            totals['requests'] += 1
+            totals['prompt_tokens'] += usage.prompt_tokens
+            totals['completion_tokens'] += usage.completion_tokens
+            totals['cached_tokens'] += usage.cached_tokens
+            totals['cost_usd'] += cost or 0.0
+            self.recent.append(entry)
+        return entry
+
+    def get_stats(self) -> dict:
+        """Totals per provider:model:prompt_variant and the most recent calls"""
+        with self._lock:
+            return {
+                'totals': {key: dict(totals) for key, totals in self.totals.items()},
+                'recent': list(self.recent)[-10:],
+            }
@@ -0,0 +1,368 @@
+"""
+Per-request tracing
+
+Every traced stage opens a span (`with tracer.span('precheck') as span:`) that
+records its duration, outcome attributes and parent. The current span lives in
+a context variable, so spans nest across function calls, worker threads started
+with a copied context, and asyncio tasks. When the outermost span of a request
+ends, the whole trace goes to the configured sinks:
+
+    memory            ring buffer of recent traces (served at /debug/traces)
+    jsonl:<path>      one JSON object per span, appended to a file
+    otlp[:<url>]      OTLP/HTTP JSON export to an OpenTelemetry collector
+
+TRACING selects the sinks (comma-separated, e.g. "memory,jsonl:traces.jsonl").
+Tracing is off when it is unset; span() then returns a shared no-op span, so
+instrumented code pays one attribute check per stage.
+"""
+import json
+import os
+import queue
+import random
+import threading
+import time
+import urllib.request
+from collections import deque
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+_current: ContextVar[Optional['Span']] = ContextVar('current_span', default=None)
+
+
+class _NoopSpan:
+    """Stands in for a span when tracing is off or the request is not sampled"""
+
+    __slots__ = ()
+
+    def __enter__(self) -> '_NoopSpan':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        return False
+
+    def set(self, key: str, value: Any) -> None:
+        pass
+
+    def annotate(self, **attributes) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class _UnsampledRoot(_NoopSpan):
+    """Root of a request that was not sampled: marks the context so nested stages stay no-ops"""
+
+    __slots__ = ('_token',)
+
+    def __enter__(self) -> '_UnsampledRoot':
+        self._token = _current.set(NOOP_SPAN)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        _reset(self._token)
+        return False
+
+
+def _reset(token) -> None:
+    try:
+        _current.reset(token)
+    except ValueError:
+        # A generator closed from another context; the span itself is already finished
+        pass
+
+
+class _Trace:
+    __slots__ = ('trace_id', 'spans', 'root')
+
+    def __init__(self):
+        self.trace_id = f"{random.getrandbits(128):032x}"
+        self.spans: List['Span'] = []
+        self.root: Optional['Span'] = None
+
+
+class Span:
+    """One timed stage of a request"""
+
+    __slots__ = ('tracer', 'trace', 'span_id', 'parent_id', 'name', 'start', 'duration', 'attributes', 'status',
+                 '_started', '_token')
+
+    def __init__(self, tracer: 'Tracer', trace: _Trace, parent: Optional['Span'], name: str,
+                 attributes: Dict[str, Any]):
+        self.tracer = tracer
+        self.trace = trace
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent.span_id if parent is not None else None
+        self.name = name
+        self.attributes = attributes
+        self.status = 'ok'
+        self.start = 0.0
+        self.duration = 0.0
+
+    def __enter__(self) -> 'Span':
+        self.start = time.time()
+        self._started = time.perf_counter()
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self.duration = time.perf_counter() - self._started
+        if exc_type is not None:
+            self.status = 'error'
+            self.attributes.setdefault('error', exc_type.__name__)
+        _reset(self._token)
+        self.trace.spans.append(self)
+        if self.trace.root is self:
+            self.tracer._export(self.trace)
+        return False
+
+    def set(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def annotate(self, **attributes) -> None:
+        self.attributes.update(attributes)
+
+    def to_dict(self) -> dict:
+        return {
+            'trace_id': self.trace.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'start': self.start,
+            'duration_ms': round(self.duration * 1000, 3),
+            'status': self.status,
+            'attributes': dict(self.attributes),
+        }
+
+
+def trace_to_dict(trace: _Trace) -> dict:
+    """A finished trace with its spans in start order and offsets from the request start"""
+    root = trace.root
+    spans = sorted(trace.spans, key=lambda span: span.start)
+    return {
+        'trace_id': trace.trace_id,
+        'name': root.name,
+        'start': root.start,
+        'duration_ms': round(root.duration * 1000, 3),
+        'status': root.status,
+        'attributes': dict(root.attributes),
+        'spans': [{**span.to_dict(), 'offset_ms': round((span.start - root.start) * 1000, 3)} for span in spans],
+    }
+
+
+class RingBufferSink:
+    """Keeps the most recent traces in memory"""
+
+    def __init__(self, capacity: int = 200):
+        self.traces = deque(maxlen=capacity)
+
+    def export(self, trace: _Trace) -> None:
+        self.traces.append(trace)
+
+    def recent(self, limit: int = 20) -> List[dict]:
+        return [trace_to_dict(trace) for trace in list(self.traces)[-limit:][::-1]]
+
+    def slowest(self, limit: int = 20) -> List[dict]:
+        traces = sorted(list(self.traces), key=lambda trace: trace.root.duration, reverse=True)
+        return [trace_to_dict(trace) for trace in traces[:limit]]
+
+
+class _BackgroundSink:
+    """Exports traces from a worker thread so file and network I/O stay off the request path"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.dropped = 0
+        self._queue: 'queue.Queue[_Trace]' = queue.Queue(maxsize=10000)
+        self._worker = None
+        self._worker_pid = None
+        self._start_lock = threading.Lock()
+
+    def export(self, trace: _Trace) -> None:
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            self.dropped += 1
+
+    def _ensure_worker(self) -> None:
+        # Threads do not survive fork, so pre-forking servers get a worker per process
+        if self._worker is not None and self._worker_pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._worker is None or self._worker_pid != os.getpid():
+                self._worker = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._worker_pid = os.getpid()
+                self._worker.start()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < 100:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self.write(batch)
+            except Exception as e:
+                self.dropped += len(batch)
+                print(f"⚠️  Trace export to {self.name} failed: {e}")
+
+    def write(self, traces: List[_Trace]) -> None:
+        raise NotImplementedError
+
+
+class JsonlSink(_BackgroundSink):
+    """Appends every span as one JSON line"""
+
+    def __init__(self, path: str):
+        super().__init__(f"trace-jsonl:{path}")
+        self.path = path
+
+    def write(self, traces: List[_Trace]) -> None:
+        with open(self.path, 'a', encoding='utf-8') as f:
+            for trace in traces:
+                for span in trace.spans:
+                    f.write(json.dumps(span.to_dict()) + '\n')
+
+
+def _otlp_value(value: Any) -> dict:
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+class OTLPSink(_BackgroundSink):
+    """Posts traces to an OpenTelemetry collector (OTLP/HTTP with JSON encoding)"""
+
+    def __init__(self, endpoint: str, service_name: str = 'health-chatbot', timeout: float = 5.0):
+        super().__init__(f"trace-otlp:{endpoint}")
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.timeout = timeout
+
+    def payload(self, traces: List[_Trace]) -> dict:
+        spans = []
+        for trace in traces:
+            for span in trace.spans:
+                start_ns = int(span.start * 1e9)
+                item = {
+                    'traceId': trace.trace_id,
+                    'spanId': span.span_id,
+                    'name': span.name,
+                    'kind': 1,  # SPAN_KIND_INTERNAL
+                    'startTimeUnixNano': str(start_ns),
+                    'endTimeUnixNano': str(start_ns + int(span.duration * 1e9)),
+                    'attributes': [{'key': key, 'value': _otlp_value(value)} for key, value in span.attributes.items()],
+                    'status': {'code': 2 if span.status == 'error' else 1},
+                }
+                if span.parent_id:
+                    item['parentSpanId'] = span.parent_id
+                spans.append(item)
+        return {'resourceSpans': [{
+            'resource': {'attributes': [{'key': 'service.name', 'value': {'stringValue': self.service_name}}]},
+            'scopeSpans': [{'scope': {'name': 'health-chatbot'}, 'spans': spans}],
+        }]}
+
+    def write(self, traces: List[_Trace]) -> None:
+        request = urllib.request.Request(self.endpoint, data=json.dumps(self.payload(traces)).encode('utf-8'),
+                                         headers={'Content-Type': 'application/json'}, method='POST')
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+class Tracer:
+    """Creates spans and hands finished traces to the sinks"""
+
+    def __init__(self, sinks: Optional[List[Any]] = None, sample_rate: float = 1.0):
+        """
+        Initialize a tracer
+
+        Args:
+            sinks: Objects with export(trace); tracing is disabled if empty
+            sample_rate: Fraction of requests traced (decided at the request's first span)
+        """
+        self.sinks = list(sinks or [])
+        self.enabled = bool(self.sinks)
+        self.sample_rate = sample_rate
+        # The in-memory sink behind /debug/traces, if any
+        self.buffer: Optional[RingBufferSink] = next(
+            (sink for sink in self.sinks if isinstance(sink, RingBufferSink)), None)
+
+    @classmethod
+    def from_env(cls) -> 'Tracer':
+        """Tracer configured from TRACING, TRACE_SAMPLE_RATE and TRACE_BUFFER_SIZE"""
+        spec = os.getenv("TRACING", "").strip()
+        if not spec or spec.lower() in ('0', 'off', 'false', 'no'):
+            return cls()
+        # The in-memory buffer is always kept, so /debug/traces works with every sink
+        sinks: List[Any] = [RingBufferSink(int(os.getenv("TRACE_BUFFER_SIZE", "200")))]
+        for item in spec.split(','):
+            kind, _, target = item.strip().partition(':')
+            if kind == 'memory' or kind in ('1', 'on', 'true'):
+                continue
+            if kind == 'jsonl':
+                sinks.append(JsonlSink(target or 'traces.jsonl'))
+            elif kind == 'otlp':
+                endpoint = target or os.getenv("OTEL_EXPORTER_OTLP_TRACES_ENDPOINT",
+                                               "http://localhost:4318/v1/traces")
+                sinks.append(OTLPSink(endpoint, os.getenv("OTEL_SERVICE_NAME", "health-chatbot")))
+            else:
+                print(f"⚠️  Unknown trace sink '{item}' (use memory, jsonl:<path> or otlp[:<url>])")
+        return cls(sinks, float(os.getenv("TRACE_SAMPLE_RATE", "1")))
+
+    def span(self, name: str, **attributes):
+        """
+        Context manager timing one stage
+
+        Nested inside another span it joins that request's trace; otherwise it
+        starts a new trace (subject to sampling).
+        """
+        if not self.enabled:
+            return NOOP_SPAN
+        parent = _current.get()
+        if parent is NOOP_SPAN:
+            return NOOP_SPAN
+        if parent is None:
+            if self.sample_rate < 1 and random.random() >= self.sample_rate:
+                return _UnsampledRoot()
+            trace = _Trace()
+            span = Span(self, trace, None, name, attributes)
+            trace.root = span
+            return span
+        return Span(self, parent.trace, parent, name, attributes)
+
+    @property
+    def recording(self) -> bool:
+        """True inside a sampled trace (use to skip work that only feeds spans)"""
+        return self.enabled and isinstance(_current.get(), Span)
+
+    def annotate(self, **attributes) -> None:
+        """Add attributes to the current span (no-op when not recording)"""
+        if self.enabled:
+            span = _current.get()
+            if isinstance(span, Span):
+                span.attributes.update(attributes)
+
+    def _export(self, trace: _Trace) -> None:
+        for sink in self.sinks:
+            sink.export(trace)
+
+
+_default_tracer: Optional[Tracer] = None
+_default_lock = threading.Lock()
+
+
+def default_tracer() -> Tracer:
+    """Process-wide tracer configured from the environment (shared by every chatbot instance)"""
+    global _default_tracer
+    if _default_tracer is None:
+        with _default_lock:
+            if _default_tracer is None:
+                _default_tracer = Tracer.from_env()
+    return _default_tracer
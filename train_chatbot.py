@@ -1,114 +1,377 @@
-import random
+"""
+Train the intent classifier
+
+Preprocessing is vectorized: each distinct pattern is tokenized and each
+distinct token lemmatized once (patterns seen in earlier runs come from
+token_cache.pkl), labels are looked up in a class index map, and the
+bag-of-words matrix is filled with a single NumPy scatter. Corpora too large
+for a dense matrix are fed to Keras as sparse batches.
+
+Training is seeded and stops once the loss has not improved for --patience
+epochs, keeping the best weights. The time of each phase is reported.
+
+Usage:
+    python train_chatbot.py
+    python train_chatbot.py --seed 7 --batch-size 64 --patience 10
+"""
+import argparse
+import itertools
 import json
+import os
 import pickle
-import nltk
-from nltk.stem import WordNetLemmatizer
-from tensorflow.keras.models import Sequential
-from tensorflow.keras.layers import Dense, Dropout
-from tensorflow.keras.optimizers import SGD
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence, Tuple
+
 import numpy as np
 
-# Download required NLTK data
-print("Downloading NLTK data...")
-try:
-    nltk.download('punkt_tab', quiet=True)
-    nltk.download('punkt', quiet=True)
-    nltk.download('wordnet', quiet=True)
-    nltk.download('omw-1.4', quiet=True)
-    nltk.download('averaged_perceptron_tagger', quiet=True)
-    print("NLTK data downloaded successfully!")
-except Exception as e:
-    print(f"NLTK download warning: {e}")
-
-# Initialize lemmatizer
-lemmatizer = WordNetLemmatizer()
-
-# Load intents file
-intents = json.loads(open("intents.json").read())
-
-words = []
-classes = []
-documents = []
-ignore_letters = ["?", "!", ".", ","]
-
-# Process the intents file
-print("Processing intents...")
-for intent in intents["intents"]:
-    for pattern in intent["patterns"]:
-        word_list = nltk.word_tokenize(pattern)
-        words.extend(word_list)
-        documents.append((word_list, intent["tag"]))
-        
-    if intent["tag"] not in classes:
-        classes.append(intent["tag"])
-
-# Lemmatize and sort words
-words = [lemmatizer.lemmatize(word.lower()) for word in words if word not in ignore_letters]
-words = sorted(set(words))
-classes = sorted(set(classes))
-
-print(f"Found {len(words)} unique words and {len(classes)} classes")
-
-# Save words and classes
-pickle.dump(words, open('words.pkl', 'wb'))
-pickle.dump(classes, open('classes.pkl', 'wb'))
-
-# Prepare training data
-print("Preparing training data...")
-training = []
-template = [0] * len(classes)
-
-for document in documents:
-    bag = []
-    word_patterns = document[0]
-    word_patterns = [lemmatizer.lemmatize(word.lower()) for word in word_patterns]
-    
-    for word in words:
-        bag.append(1) if word in word_patterns else bag.append(0)
-    
-    output_row = list(template)
-    output_row[classes.index(document[1])] = 1
-    training.append([bag, output_row])
-
-# Shuffle training data
-random.shuffle(training)
-
-# ✅ FIX: Separate features and labels BEFORE creating numpy arrays
-train_x = [item[0] for item in training]  # Extract feature vectors
-train_y = [item[1] for item in training]  # Extract output vectors
-
-# Convert to numpy arrays (this will work now!)
-train_x = np.array(train_x)
-train_y = np.array(train_y)
-
-print(f"Training data shape: X={train_x.shape}, Y={train_y.shape}")
-
-# Create the neural network model
-print("Creating neural network model...")
-model = Sequential()
-model.add(Dense(256, input_shape=(len(train_x[0]),), activation='relu'))
-model.add(Dropout(0.5))
-model.add(Dense(128, activation='relu'))
-model.add(Dropout(0.5))
-model.add(Dense(len(train_y[0]), activation='softmax'))
-
-# Compile the model
-sgd = SGD(learning_rate=0.01, momentum=0.9, nesterov=True)
-model.compile(loss='categorical_crossentropy', optimizer=sgd, metrics=['accuracy'])
-
-# Train the model
-print("Training the model...")
-hist = model.fit(train_x, train_y, epochs=200, batch_size=5, verbose=1)
-
-# Save the model
-model.save("chatbot_model.h5")
-
-print("\n" + "="*60)
-print("🎉 TRAINING COMPLETED SUCCESSFULLY! 🎉")
-print("="*60)
-print("Files created:")
-print("✅ chatbot_model.h5")
-print("✅ words.pkl") 
-print("✅ classes.pkl")
-print("\nNow you can run: python web_chatbot.py")
-print("="*60)
+from numpy_model import ParityError, assert_parity, export_keras_model
+
+IGNORE_LETTERS = frozenset(["?", "!", ".", ","])
+
+# NLTK resources used for tokenizing and lemmatizing, by their data path
+NLTK_RESOURCES = {
+    'punkt_tab': 'tokenizers/punkt_tab',
+    'punkt': 'tokenizers/punkt',
+    'wordnet': 'corpora/wordnet',
+    'omw-1.4': 'corpora/omw-1.4',
+}
+
+# Above this many matrix cells (float32), training batches are densified from a sparse matrix
+DENSE_LIMIT = 50_000_000
+
+# Written together at the end of training (see publish)
+ARTIFACT_PATHS = ('words.pkl', 'classes.pkl', 'chatbot_model.h5', 'chatbot_model.npz')
+
+# Token cache entries are only reused with the NLTK version that produced them
+TOKEN_CACHE_VERSION = 1
+
+
+class PhaseTimer:
+    """Wall-clock time of each training phase"""
+
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+
+    @contextmanager
+    def phase(self, name: str):
+        print(f"⏳ {name}...")
+        started = time.perf_counter()
+        yield
+        self.phases[name] = time.perf_counter() - started
+        print(f"   {name} took {self.phases[name]:.2f}s")
+
+    def report(self) -> None:
+        total = sum(self.phases.values())
+        print(f"\n{'phase':<14} {'seconds':>9} {'share':>7}")
+        for name, seconds in self.phases.items():
+            print(f"{name:<14} {seconds:>9.2f} {seconds / total:>7.1%}")
+        print(f"{'total':<14} {total:>9.2f}")
+
+
+def ensure_nltk_data() -> List[str]:
+    """Download the NLTK resources that are not installed yet; returns the ones downloaded"""
+    import nltk
+    missing = []
+    for package, path in NLTK_RESOURCES.items():
+        try:
+            nltk.data.find(path)
+        except LookupError:
+            missing.append(package)
+    for package in missing:
+        try:
+            nltk.download(package, quiet=True)
+        except Exception as e:
+            print(f"NLTK download warning ({package}): {e}")
+    return missing
+
+
+def load_documents(path: str = "intents.json") -> Tuple[List[str], List[str]]:
+    """(patterns, tags): one entry per training pattern"""
+    with open(path, encoding='utf-8') as f:
+        intents = json.load(f)
+    patterns, tags = [], []
+    for intent in intents["intents"]:
+        patterns.extend(intent["patterns"])
+        tags.extend([intent["tag"]] * len(intent["patterns"]))
+    return patterns, tags
+
+
+def load_token_cache(path: Optional[str]) -> Dict[str, List[str]]:
+    """Pattern -> lemmatized tokens from an earlier run (empty if missing or from another NLTK version)"""
+    if not path or not os.path.exists(path):
+        return {}
+    import nltk
+    try:
+        with open(path, 'rb') as f:
+            cache = pickle.load(f)
+    except Exception as e:
+        print(f"⚠️  Ignoring unreadable token cache {path}: {e}")
+        return {}
+    if cache.get('version') != (TOKEN_CACHE_VERSION, nltk.__version__):
+        return {}
+    return cache['tokens']
+
+
+def save_token_cache(path: Optional[str], tokens: Dict[str, List[str]]) -> None:
+    if not path:
+        return
+    import nltk
+    with open(path, 'wb') as f:
+        pickle.dump({'version': (TOKEN_CACHE_VERSION, nltk.__version__), 'tokens': tokens}, f)
+
+
+def tokenize_patterns(patterns: Sequence[str], cache: Dict[str, List[str]]) -> Tuple[List[List[str]], int]:
+    """
+    Lower-cased, lemmatized tokens of every pattern
+
+    Each distinct pattern is tokenized once and each distinct token lemmatized
+    once; results are added to `cache`.
+
+    Returns:
+        (tokens per pattern, number of patterns that had to be tokenized)
+    """
+    import nltk
+    from nltk.stem import WordNetLemmatizer
+    lemmatizer = WordNetLemmatizer()
+    lemmas: Dict[str, str] = {}
+    documents = []
+    tokenized = 0
+    for pattern in patterns:
+        tokens = cache.get(pattern)
+        if tokens is None:
+            tokens = []
+            for word in nltk.word_tokenize(pattern):
+                lower = word.lower()
+                lemma = lemmas.get(lower)
+                if lemma is None:
+                    lemma = lemmas[lower] = lemmatizer.lemmatize(lower)
+                tokens.append(lemma)
+            cache[pattern] = tokens
+            tokenized += 1
+        documents.append(tokens)
+    return documents, tokenized
+
+
+def build_vocabulary(documents: Sequence[Sequence[str]]) -> List[str]:
+    """Sorted distinct lemmas, without punctuation"""
+    return sorted(set(itertools.chain.from_iterable(documents)) - IGNORE_LETTERS)
+
+
+def document_columns(documents: Sequence[Sequence[str]], words: Sequence[str]) -> List[np.ndarray]:
+    """Vocabulary columns present in each document (the non-zero entries of its bag of words)"""
+    word_index = {word: i for i, word in enumerate(words)}
+    return [np.fromiter({word_index[token] for token in tokens if token in word_index}, dtype=np.int64)
+            for tokens in documents]
+
+
+def coordinates(columns: Sequence[np.ndarray], doc_ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """(row, column) of every non-zero entry of the bag-of-words matrix of the given documents"""
+    selected = [columns[i] for i in doc_ids]
+    lengths = np.fromiter(map(len, selected), dtype=np.int64, count=len(selected))
+    rows = np.repeat(np.arange(len(selected)), lengths)
+    cols = np.concatenate(selected) if selected else np.zeros(0, dtype=np.int64)
+    return rows, cols
+
+
+def dense_matrix(columns: Sequence[np.ndarray], doc_ids: np.ndarray, vocab_size: int) -> np.ndarray:
+    """Bag-of-words matrix of the given documents, filled in one scatter"""
+    rows, cols = coordinates(columns, doc_ids)
+    matrix = np.zeros((len(doc_ids), vocab_size), dtype=np.float32)
+    matrix[rows, cols] = 1.0
+    return matrix
+
+
+def label_vector(tags: Sequence[str], classes: Sequence[str]) -> np.ndarray:
+    """Class index of every document"""
+    class_index = {tag: i for i, tag in enumerate(classes)}
+    return np.fromiter((class_index[tag] for tag in tags), dtype=np.int32, count=len(tags))
+
+
+def stratified_split(labels: np.ndarray, fraction: float, rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Shuffled (train, validation) document indexes
+
+    Each class gives floor(fraction * its size) documents to validation, so
+    classes with few patterns keep all of them for training.
+    """
+    order = rng.permutation(len(labels))
+    if fraction <= 0:
+        return order, order[:0]
+    # Group the shuffled documents by class and number them within their class
+    grouped = order[np.argsort(labels[order], kind='stable')]
+    counts = np.bincount(labels, minlength=labels.max() + 1)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    rank = np.arange(len(grouped)) - starts[labels[grouped]]
+    validation = rank < np.floor(counts[labels[grouped]] * fraction)
+    train, held_out = grouped[~validation], grouped[validation]
+    return rng.permutation(train), held_out
+
+
+def sparse_dataset(columns, doc_ids: np.ndarray, labels: np.ndarray, vocab_size: int, batch_size: int,
+                   seed: int, shuffle: bool):
+    """tf.data pipeline that densifies one batch of the sparse bag-of-words matrix at a time"""
+    import tensorflow as tf
+    rows, cols = coordinates(columns, doc_ids)
+    matrix = tf.sparse.reorder(tf.sparse.SparseTensor(
+        indices=np.stack([rows, cols], axis=1), values=np.ones(len(rows), dtype=np.float32),
+        dense_shape=(len(doc_ids), vocab_size)))
+    dataset = tf.data.Dataset.from_tensor_slices((matrix, labels[doc_ids]))
+    if shuffle:
+        dataset = dataset.shuffle(len(doc_ids), seed=seed, reshuffle_each_iteration=True)
+    return (dataset.batch(batch_size)
+            .map(lambda x, y: (tf.sparse.to_dense(x), y), num_parallel_calls=tf.data.AUTOTUNE)
+            .prefetch(tf.data.AUTOTUNE))
+
+
+def staging_path(path: str) -> str:
+    """Temporary file next to `path`, with the same extension (Keras and NumPy go by it)"""
+    root, extension = os.path.splitext(path)
+    return f"{root}.tmp-{os.getpid()}{extension}"
+
+
+def publish(staged: Dict[str, str]) -> None:
+    """
+    Move the staged artifacts over the live ones
+
+    Each file is replaced atomically and all of them within milliseconds, so a
+    server hot-reloading the artifacts never reads a partial file or pairs the
+    new vocabulary with the old model for longer than its settle interval.
+    """
+    for path, temporary in staged.items():
+        os.replace(temporary, path)
+
+
+def discard(staged: Dict[str, str]) -> None:
+    """Remove the staged artifacts, leaving the live ones in place"""
+    for temporary in staged.values():
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+
+def build_model(input_size: int, num_classes: int, learning_rate: float):
+    from tensorflow.keras.layers import Dense, Dropout, Input
+    from tensorflow.keras.models import Sequential
+    from tensorflow.keras.optimizers import SGD
+    model = Sequential([
+        Input(shape=(input_size,)),
+        Dense(256, activation='relu'),
+        Dropout(0.5),
+        Dense(128, activation='relu'),
+        Dropout(0.5),
+        Dense(num_classes, activation='softmax'),
+    ])
+    sgd = SGD(learning_rate=learning_rate, momentum=0.9, nesterov=True)
+    # Integer class labels: no one-hot label matrix is ever built
+    model.compile(loss='sparse_categorical_crossentropy', optimizer=sgd, metrics=['accuracy'])
+    return model
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Train the intent classifier")
+    parser.add_argument('--intents', default='intents.json')
+    parser.add_argument('--seed', type=int, default=42, help="Seed for shuffling, weight init and dropout")
+    parser.add_argument('--epochs', type=int, default=1000, help="Upper bound on epochs (early stopping ends sooner)")
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--learning-rate', type=float, default=0.01)
+    parser.add_argument('--patience', type=int, default=20, help="Epochs without improvement before stopping")
+    parser.add_argument('--validation-split', type=float, default=None,
+                        help="Fraction of each intent held out to monitor (default 0.1 from 1000 patterns, else 0)")
+    parser.add_argument('--token-cache', default='token_cache.pkl', help="Tokenization cache file ('' to disable)")
+    parser.add_argument('--verbose', type=int, default=2, help="Keras fit verbosity")
+    args = parser.parse_args(argv)
+
+    timer = PhaseTimer()
+
+    with timer.phase('nltk data'):
+        downloaded = ensure_nltk_data()
+        if downloaded:
+            print(f"   Downloaded {', '.join(downloaded)}")
+
+    with timer.phase('tokenize'):
+        patterns, tags = load_documents(args.intents)
+        cache = load_token_cache(args.token_cache)
+        documents, tokenized = tokenize_patterns(patterns, cache)
+        if tokenized:
+            save_token_cache(args.token_cache, cache)
+        print(f"   {len(patterns)} patterns, {len(patterns) - tokenized} from the token cache")
+
+    with timer.phase('vocabulary'):
+        words = build_vocabulary(documents)
+        classes = sorted(set(tags))
+        print(f"   Found {len(words)} unique words and {len(classes)} classes")
+
+    with timer.phase('tensorflow'):
+        import tensorflow as tf
+        # Seeds Python, NumPy and TensorFlow: reruns give the same weights
+        tf.keras.utils.set_random_seed(args.seed)
+        tf.config.experimental.enable_op_determinism()
+
+    with timer.phase('matrix'):
+        labels = label_vector(tags, classes)
+        columns = document_columns(documents, words)
+        fraction = args.validation_split
+        if fraction is None:
+            fraction = 0.1 if len(patterns) >= 1000 else 0.0
+        train_ids, validation_ids = stratified_split(labels, fraction, np.random.default_rng(args.seed))
+        sparse = len(patterns) * len(words) > DENSE_LIMIT
+        if sparse:
+            train_data = sparse_dataset(columns, train_ids, labels, len(words), args.batch_size, args.seed, True)
+            validation_data = (sparse_dataset(columns, validation_ids, labels, len(words), args.batch_size,
+                                              args.seed, False) if len(validation_ids) else None)
+        else:
+            train_x, train_y = dense_matrix(columns, train_ids, len(words)), labels[train_ids]
+            validation_data = ((dense_matrix(columns, validation_ids, len(words)), labels[validation_ids])
+                               if len(validation_ids) else None)
+        print(f"   {len(train_ids)} training and {len(validation_ids)} validation rows x {len(words)} words"
+              f" ({'sparse batches' if sparse else 'dense'})")
+
+    with timer.phase('train'):
+        monitor = 'val_loss' if validation_data is not None else 'loss'
+        early_stopping = tf.keras.callbacks.EarlyStopping(monitor=monitor, patience=args.patience, min_delta=1e-4,
+                                                          restore_best_weights=True)
+        model = build_model(len(words), len(classes), args.learning_rate)
+        fit_options = dict(epochs=args.epochs, validation_data=validation_data, callbacks=[early_stopping],
+                           verbose=args.verbose)
+        if sparse:
+            hist = model.fit(train_data, **fit_options)
+        else:
+            hist = model.fit(train_x, train_y, batch_size=args.batch_size, shuffle=True, **fit_options)
+        epochs_run = len(hist.history['loss'])
+        best = min(hist.history[monitor])
+        print(f"   Stopped after {epochs_run} epochs (best {monitor} {best:.4f},"
+              f" final accuracy {hist.history['accuracy'][-1]:.3f})")
+
+    with timer.phase('export'):
+        staged = {path: staging_path(path) for path in ARTIFACT_PATHS}
+        with open(staged['words.pkl'], 'wb') as f:
+            pickle.dump(words, f)
+        with open(staged['classes.pkl'], 'wb') as f:
+            pickle.dump(classes, f)
+        model.save(staged['chatbot_model.h5'])
+        # Export the weights for TensorFlow-free inference
+        numpy_model = export_keras_model(model, staged['chatbot_model.npz'])
+        try:
+            difference = assert_parity(model, numpy_model)
+        except ParityError as e:
+            discard(staged)
+            raise SystemExit(f"❌ Not publishing the new artifacts: {e}")
+        print(f"   Exported NumPy weights (max |keras - numpy| = {difference:.2e})")
+        publish(staged)
+
+    timer.report()
+
+    print("\n" + "="*60)
+    print("🎉 TRAINING COMPLETED SUCCESSFULLY! 🎉")
+    print("="*60)
+    print("Files created:")
+    print("✅ chatbot_model.h5")
+    print("✅ chatbot_model.npz")
+    print("✅ words.pkl")
+    print("✅ classes.pkl")
+    print("\nNow you can run: python web_chatbot.py")
+    print("="*60)
+
+
+if __name__ == "__main__":
+    main()